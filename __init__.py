@@ -1,3 +0,0 @@
-from apidjango.database import SessionLocal
-from apidjango.models import Invoice, InvoiceItem
-from apidjango.pdf_parser import parse_invoice_pdf
\ No newline at end of file
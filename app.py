@@ -1,7 +1,10 @@
+import os
+
 from flask import Flask
 from flask_cors import CORS
 
-from database import engine
+from config import DB_PREWARM_CONNECTIONS
+from database import close_db, engine, prewarm_pool
 from routes.upload import upload_bp
 from routes.stock import stock_bp
 from routes.admin import admin_bp
@@ -9,20 +12,16 @@ from routes.seller import seller_bp
 from routes.auth import auth_bp
 from routes.sell_report import sell_report_bp
 from routes.sell_finance import sell_finance_bp
-from services.db_migrations import (
-    ensure_invoice_totals_tax_columns,
-    ensure_sell_finance_outside_income_support,
-    ensure_user_brand_aliases_support,
-    ensure_user_brand_sort_preferences_support,
-)
+from services.upload_jobs import resume_upload_jobs
+from services.audit_archive import start_audit_retention
+from services.stock_service import start_stock_summary_checker
+from services.db_migrations import run_migrations
 
 app = Flask(__name__)
 CORS(app)
+app.teardown_appcontext(close_db)
 
-ensure_invoice_totals_tax_columns(engine)
-ensure_sell_finance_outside_income_support(engine)
-ensure_user_brand_aliases_support(engine)
-ensure_user_brand_sort_preferences_support(engine)
+run_migrations(engine)
 
 app.register_blueprint(upload_bp)
 app.register_blueprint(stock_bp)
@@ -32,5 +31,34 @@ app.register_blueprint(auth_bp)
 app.register_blueprint(sell_report_bp)
 app.register_blueprint(sell_finance_bp)
 
+prewarm_pool(DB_PREWARM_CONNECTIONS)
+
+DEBUG = True
+
+
+def start_background_work():
+    """
+    Work that belongs to the process serving requests, run once at
+    startup: resuming upload jobs and the audit retention and stock
+    summary threads.
+    """
+    resume_upload_jobs()
+    start_audit_retention()
+    start_stock_summary_checker()
+
+
+def _is_serving_process():
+    # `python app.py` runs the debug reloader: this module is imported by
+    # the file watcher and again by the child that serves requests, which
+    # werkzeug marks with WERKZEUG_RUN_MAIN. Imported by a WSGI server,
+    # there is no reloader.
+    if __name__ == "__main__" and DEBUG:
+        return os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    return True
+
+
+if _is_serving_process():
+    start_background_work()
+
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000, debug=True)
+    app.run(host="0.0.0.0", port=5000, debug=DEBUG)
@@ -0,0 +1,168 @@
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import AuditLog
+from services import audit_archive
+from services.audit_archive import archive_audit_logs
+from services.audit_query import AUDIT_DEFAULT_LIMIT, audit_log_page
+from services.db_migrations import ensure_audit_log_filter_indexes, ensure_hot_query_indexes
+from services.pagination import decode_cursor
+
+USERS = [("owner", "owner"), ("supervisor", "supervisor")] + [(f"staff{i}", "staff") for i in range(40)]
+ACTIONS = ["login", "api_access", "upload_invoice", "create_sell_report", "edit_sell_report",
+           "create_sell_finance", "DELETE_INVOICE", "EDIT_INVOICE"]
+ENTITY_TYPES = ["auth", "admin_route", "invoice", "sell_report", "sell_finance"]
+# Actions that only appear in recent history, so the archive holds none.
+RECENT_ONLY_ACTIONS = ["DELETE_INVOICE"]
+INSERT_CHUNK = 50000
+RUNS = 20
+TARGET_MS = 50.0
+
+
+def seed(engine, rows, days, start=datetime(2020, 1, 1), actions=ACTIONS):
+    step = days * 86400 / rows
+    rng = random.Random(7)
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        for offset in range(0, rows, INSERT_CHUNK):
+            batch = []
+            for n in range(offset, min(rows, offset + INSERT_CHUNK)):
+                username, role = rng.choice(USERS)
+                created_at = start + timedelta(seconds=int(n * step))
+                batch.append((
+                    username, role, rng.choice(actions), rng.choice(ENTITY_TYPES), str(n),
+                    "", created_at.strftime("%Y-%m-%d %H:%M:%S"),
+                ))
+            cur.executemany(
+                "INSERT INTO audit_logs (username, role, action, entity_type, entity_id, details, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                batch,
+            )
+        conn.commit()
+    finally:
+        conn.close()
+    return start, start + timedelta(days=days)
+
+
+def scenarios(db, first_day, last_day, limit):
+    mid = first_day + (last_day - first_day) / 2
+    _, next_cursor = audit_log_page(db, {}, limit)
+    # Cursor pointing half-way back through history, as reached by paging.
+    mid_row = db.execute(text(
+        "SELECT created_at, id FROM audit_logs WHERE created_at <= :mid ORDER BY created_at DESC, id DESC LIMIT 1"
+    ), {"mid": mid.strftime("%Y-%m-%d %H:%M:%S")}).fetchone()
+    mid_cursor = [mid_row[0], mid_row[1]] if mid_row else None
+    month = date(mid.year, mid.month, 1)
+    return [
+        ("latest page", {}, None),
+        ("second page", {}, decode_cursor(next_cursor, 2)),
+        ("mid-history page", {}, mid_cursor),
+        ("username", {"username": "staff7"}, None),
+        ("username, mid-history", {"username": "staff7"}, mid_cursor),
+        ("role=owner", {"role": "owner"}, None),
+        ("action", {"action": "upload_invoice"}, None),
+        ("entity_type + month", {"entity_type": "invoice", "date_from": month, "date_to": month + timedelta(days=30)}, None),
+        ("username + action", {"username": "owner", "action": "EDIT_INVOICE"}, None),
+        ("date range only", {"date_from": month, "date_to": month + timedelta(days=6)}, None),
+    ]
+
+
+def archive_scenarios(db, archive_start, first_day):
+    # Cursor on the oldest row left in the table: the next page comes
+    # from the archive.
+    oldest = db.execute(text(
+        "SELECT created_at, id FROM audit_logs ORDER BY created_at, id LIMIT 1"
+    )).fetchone()
+    edge = [oldest[0], oldest[1]]
+    mid = (archive_start + (first_day - archive_start) / 2).date()
+    return [
+        ("archive: next page", {}, edge),
+        ("archive: username", {"username": "staff7"}, edge),
+        ("archive: user + action", {"username": "owner", "action": "EDIT_INVOICE"}, edge),
+        ("archive: absent action", {"action": RECENT_ONLY_ACTIONS[0]}, edge),
+        ("archive: unknown user", {"username": "nobody"}, None),
+        ("archive: date range", {"date_from": mid, "date_to": mid + timedelta(days=6)}, None),
+        ("archive: week + action", {"action": "login", "date_from": mid, "date_to": mid + timedelta(days=6)}, None),
+    ]
+
+
+def measure(db, filters, cursor, limit):
+    # The first run starts with no decompressed archive days cached.
+    audit_archive.clear_day_cache()
+    timings = []
+    count = 0
+    for _ in range(RUNS):
+        started = time.perf_counter()
+        rows, _ = audit_log_page(db, filters, limit, cursor)
+        timings.append((time.perf_counter() - started) * 1000)
+        count = len(rows)
+    first = timings[0]
+    timings.sort()
+    return count, first, statistics.median(timings), timings[int(len(timings) * 0.95) - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time audit-log pages on a synthetic audit_logs table.")
+    parser.add_argument("--rows", type=int, default=2000000)
+    parser.add_argument("--days", type=int, default=5 * 365)
+    parser.add_argument("--limit", type=int, default=AUDIT_DEFAULT_LIMIT)
+    parser.add_argument("--archived-days", type=int, default=200,
+                        help="days of older history moved to archive files first (0 to skip)")
+    parser.add_argument("--archived-rows-per-day", type=int, default=10000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The archive goes to the temp dir, not the app's output folder.
+        audit_archive.AUDIT_ARCHIVE_FOLDER = os.path.join(tmp, "audit_archive")
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine, tables=[AuditLog.__table__])
+        ensure_hot_query_indexes(engine)
+        ensure_audit_log_filter_indexes(engine)
+        start = datetime(2020, 1, 1)
+
+        archive_start = None
+        if args.archived_days > 0:
+            started = time.perf_counter()
+            archive_start = start - timedelta(days=args.archived_days)
+            archived_rows = args.archived_days * args.archived_rows_per_day
+            old_actions = [a for a in ACTIONS if a not in RECENT_ONLY_ACTIONS]
+            seed(engine, archived_rows, args.archived_days, start=archive_start, actions=old_actions)
+            result = archive_audit_logs(retention_days=1, now=start + timedelta(days=1), bind=engine)
+            print(f"archived {result['archived']} rows over {len(result['days'])} days "
+                  f"in {time.perf_counter() - started:.1f}s")
+
+        started = time.perf_counter()
+        first_day, last_day = seed(engine, args.rows, args.days, start=start)
+        print(f"seeded {args.rows} rows in {time.perf_counter() - started:.1f}s")
+
+        db = sessionmaker(bind=engine, autoflush=False)()
+        slow = 0
+        try:
+            cases = scenarios(db, first_day, last_day, args.limit)
+            if archive_start is not None:
+                cases += archive_scenarios(db, archive_start, first_day)
+            print(f"{'scenario':<24} {'rows':>5} {'first ms':>8} {'p50 ms':>8} {'p95 ms':>8}")
+            for name, filters, cursor in cases:
+                count, first, p50, p95 = measure(db, filters, cursor, args.limit)
+                flag = "" if p95 <= TARGET_MS else "  SLOW"
+                slow += bool(flag)
+                print(f"{name:<24} {count:>5} {first:>8.2f} {p50:>8.2f} {p95:>8.2f}{flag}")
+        finally:
+            db.close()
+            engine.dispose()
+    if slow:
+        raise SystemExit(f"{slow} scenarios over {TARGET_MS:.0f} ms at p95")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import Invoice, InvoiceItem, PresentStockDetail, SellReport
+from services.sales_utils import (
+    compute_opening_and_additions,
+    get_last_reports_by_stock,
+    invoice_additions_by_stock,
+)
+from services.sql_metrics import count_statements
+
+INVOICES = 6
+REPORT_AFTER_INVOICE = 3
+
+
+def seed(db, skus):
+    base_dt = datetime(2025, 1, 1, 9, 0, 0)
+    stocks = []
+    for i in range(skus):
+        stocks.append({
+            "id": i + 1,
+            "brand_number": f"{1000 + i // 3}",
+            "brand_name": f"BRAND {i // 3}",
+            "pack_size_case": 12,
+            "pack_size_quantity_ml": (180, 375, 750)[i % 3],
+            "total_cases": 10,
+            "total_bottles": 0,
+        })
+    db.bulk_insert_mappings(PresentStockDetail, stocks)
+
+    items = []
+    invoices = []
+    for n in range(INVOICES):
+        invoice_number = f"ICDC{n:06d}"
+        invoices.append({
+            "invoice_number": invoice_number,
+            "invoice_date": (base_dt + timedelta(days=n)).strftime("%d-%b-%Y"),
+            "created_at": base_dt + timedelta(days=n),
+        })
+        for s in stocks:
+            items.append({
+                "invoice_number": invoice_number,
+                "brand_number": s["brand_number"],
+                "pack_size_case": s["pack_size_case"],
+                "pack_size_quantity_ml": s["pack_size_quantity_ml"],
+                "cases_delivered": 2,
+                "bottles_delivered": 1,
+            })
+    db.bulk_insert_mappings(Invoice, invoices)
+    db.bulk_insert_mappings(InvoiceItem, items)
+
+    report_dt = base_dt + timedelta(days=REPORT_AFTER_INVOICE - 1, hours=12)
+    db.bulk_insert_mappings(SellReport, [{
+        "stock_id": s["id"],
+        "brand_number": s["brand_number"],
+        "pack_size_case": s["pack_size_case"],
+        "pack_size_quantity_ml": s["pack_size_quantity_ml"],
+        "closing_cases": 5,
+        "closing_bottles": 0,
+        "report_date": report_dt.strftime("%Y-%m-%d"),
+        "created_at": report_dt,
+    } for s in stocks if s["id"] % 4])
+    db.commit()
+
+
+def run_per_stock(db, stocks, last_reports):
+    return [compute_opening_and_additions(db, s, last_reports.get(s.id)) for s in stocks]
+
+
+def run_grouped(db, stocks, last_reports):
+    additions = invoice_additions_by_stock(db, stocks, last_reports)
+    return [compute_opening_and_additions(db, s, last_reports.get(s.id), additions.get(s.id)) for s in stocks]
+
+
+def measure(fn, db, stocks, last_reports):
+    with count_statements() as counter:
+        started = time.perf_counter()
+        result = fn(db, stocks, last_reports)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    return result, counter["statements"], elapsed_ms
+
+
+def bench(skus):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite:///{os.path.join(tmp, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+        db = Session()
+        try:
+            seed(db, skus)
+            stocks = db.query(PresentStockDetail).all()
+            last_reports = get_last_reports_by_stock(db)
+            old, old_queries, old_ms = measure(run_per_stock, db, stocks, last_reports)
+            new, new_queries, new_ms = measure(run_grouped, db, stocks, last_reports)
+            if old != new:
+                raise AssertionError(f"grouped additions differ from per-stock additions at {skus} SKUs")
+        finally:
+            db.close()
+            engine.dispose()
+    return old_queries, old_ms, new_queries, new_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-stock and grouped invoice additions.")
+    parser.add_argument("--skus", default="50,200,800", help="comma separated SKU counts")
+    args = parser.parse_args()
+
+    print(f"{'skus':>6} {'per-stock q':>12} {'per-stock ms':>13} {'grouped q':>10} {'grouped ms':>11}")
+    for skus in [int(v) for v in args.skus.split(",") if v.strip()]:
+        old_q, old_ms, new_q, new_ms = bench(skus)
+        print(f"{skus:>6} {old_q:>12} {old_ms:>13.1f} {new_q:>10} {new_ms:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
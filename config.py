@@ -17,3 +17,39 @@ OWNER_USER = os.getenv("OWNER_USER", "owner")
 OWNER_PASS = os.getenv("OWNER_PASS", "owner6060")
 SUPERVISOR_USER = os.getenv("SUPERVISOR_USER", "supervisor")
 SUPERVISOR_PASS = os.getenv("SUPERVISOR_PASS", "super6060")
+
+EXPECTED_RETAILER_CODE = os.getenv("EXPECTED_RETAILER_CODE", "2500552")
+UPLOAD_PARSE_WORKERS = int(os.getenv("UPLOAD_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+UPLOAD_JOB_WORKERS = int(os.getenv("UPLOAD_JOB_WORKERS", "2"))
+UPLOAD_JOBS_FOLDER = os.path.join("output", "jobs")
+UPLOAD_JOB_STALE_SECONDS = float(os.getenv("UPLOAD_JOB_STALE_SECONDS", "600"))
+PARSE_CACHE_FOLDER = os.path.join("output", "parse_cache")
+PARSE_CACHE_MAX_ENTRIES = int(os.getenv("PARSE_CACHE_MAX_ENTRIES", "500"))
+REQUESTED_PDF_FOLDER = "requested_pdf"
+DASHBOARD_CACHE_SECONDS = float(os.getenv("DASHBOARD_CACHE_SECONDS", "30"))
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_INTERVAL_SECONDS = float(os.getenv("AUDIT_FLUSH_INTERVAL_SECONDS", "1.0"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "8"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_PREWARM_CONNECTIONS = int(os.getenv("DB_PREWARM_CONNECTIONS", "4"))
+DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "4"))
+DB_READ_MAX_OVERFLOW = int(os.getenv("DB_READ_MAX_OVERFLOW", "8"))
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_TEMP_STORE = os.getenv("SQLITE_TEMP_STORE", "MEMORY")
+
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "500"))
+PAGE_MAX_LIMIT = int(os.getenv("PAGE_MAX_LIMIT", "500"))
+
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+AUDIT_ARCHIVE_FOLDER = os.path.join("output", "audit_archive")
+AUDIT_ARCHIVE_CHUNK_SIZE = int(os.getenv("AUDIT_ARCHIVE_CHUNK_SIZE", "5000"))
+AUDIT_RETENTION_INTERVAL_SECONDS = float(os.getenv("AUDIT_RETENTION_INTERVAL_SECONDS", str(24 * 3600)))
+AUDIT_ARCHIVE_CACHE_MB = int(os.getenv("AUDIT_ARCHIVE_CACHE_MB", "64"))
+
+STOCK_SUMMARY_CHECK_INTERVAL_SECONDS = float(os.getenv("STOCK_SUMMARY_CHECK_INTERVAL_SECONDS", "3600"))
+STOCK_SUMMARY_AMOUNT_TOLERANCE = float(os.getenv("STOCK_SUMMARY_AMOUNT_TOLERANCE", "0.01"))
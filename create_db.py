@@ -16,20 +16,16 @@ from models import (
     UserBrandAlias,
     UserLogin,
     UserBrandSortPreference,
+    UploadJob,
+    CacheVersion,
+    DashboardSnapshot,
+    SchemaVersion,
 )
-from services.db_migrations import (
-    ensure_invoice_totals_tax_columns,
-    ensure_user_brand_aliases_support,
-    ensure_sell_finance_outside_income_support,
-    ensure_user_brand_sort_preferences_support,
-)
+from services.db_migrations import run_migrations
 
 def create_tables():
     Base.metadata.create_all(bind=engine)
-    ensure_invoice_totals_tax_columns(engine)
-    ensure_sell_finance_outside_income_support(engine)
-    ensure_user_brand_aliases_support(engine)
-    ensure_user_brand_sort_preferences_support(engine)
+    run_migrations(engine)
     print("Database created successfully")
 
 if __name__ == "__main__":
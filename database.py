@@ -1,18 +1,114 @@
-from sqlalchemy import create_engine, event
+import threading
+import time
+from functools import wraps
+
+from flask import g
+from sqlalchemy import create_engine, event, exc
 from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy.pool import QueuePool
+
+from config import (
+    DB_MAX_OVERFLOW,
+    DB_POOL_SIZE,
+    DB_POOL_TIMEOUT,
+    DB_READ_MAX_OVERFLOW,
+    DB_READ_POOL_SIZE,
+    SQLITE_CACHE_SIZE,
+    SQLITE_MMAP_SIZE,
+    SQLITE_SYNCHRONOUS,
+    SQLITE_TEMP_STORE,
+)
 
 DATABASE_URL = "sqlite:///inventory.db"
+READ_ONLY_DATABASE_URL = "sqlite:///file:inventory.db?mode=ro&uri=true"
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long callers wait to check out a connection."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "checkouts": 0,
+            "timeouts": 0,
+            "wait_ms_total": 0.0,
+            "wait_ms_max": 0.0,
+        }
+
+    def connect(self):
+        t0 = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self._stats["timeouts"] += 1
+            raise
+        finally:
+            wait_ms = (time.perf_counter() - t0) * 1000
+            with self._stats_lock:
+                self._stats["checkouts"] += 1
+                self._stats["wait_ms_total"] += wait_ms
+                self._stats["wait_ms_max"] = max(self._stats["wait_ms_max"], wait_ms)
+
+    def metrics(self):
+        with self._stats_lock:
+            stats = dict(self._stats)
+        checkouts = stats["checkouts"]
+        stats["wait_ms_avg"] = round(stats["wait_ms_total"] / checkouts, 3) if checkouts else 0.0
+        stats["wait_ms_total"] = round(stats["wait_ms_total"], 3)
+        stats["wait_ms_max"] = round(stats["wait_ms_max"], 3)
+        stats.update({
+            "size": self.size(),
+            "checked_in": self.checkedin(),
+            "checked_out": self.checkedout(),
+            "overflow": self.overflow(),
+        })
+        return stats
+
 
 engine = create_engine(
     DATABASE_URL,
-    connect_args={"check_same_thread": False, "timeout": 30}
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=MeteredQueuePool,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
 )
 
+# Separate pool of read-only connections for report endpoints, so long
+# reads never hold a writer connection.
+read_engine = create_engine(
+    READ_ONLY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": 30},
+    poolclass=MeteredQueuePool,
+    pool_size=DB_READ_POOL_SIZE,
+    max_overflow=DB_READ_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+)
+
+
+def _set_common_pragmas(cursor):
+    cursor.execute("PRAGMA busy_timeout=30000;")
+    cursor.execute(f"PRAGMA cache_size={int(SQLITE_CACHE_SIZE)};")
+    cursor.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)};")
+    cursor.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE};")
+
+
 @event.listens_for(engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, _):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA journal_mode=WAL;")
-    cursor.execute("PRAGMA busy_timeout=30000;")
+    cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS};")
+    _set_common_pragmas(cursor)
+    cursor.close()
+
+
+@event.listens_for(read_engine, "connect")
+def _set_read_only_pragma(dbapi_connection, _):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON;")
+    _set_common_pragmas(cursor)
     cursor.close()
 
 SessionLocal = sessionmaker(
@@ -21,4 +117,64 @@ SessionLocal = sessionmaker(
     bind=engine
 )
 
+ReadSessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_engine
+)
+
 Base = declarative_base()
+
+
+def get_db():
+    """
+    Session for the current request. It is created on first use and closed
+    by close_db when the app context tears down. Handlers wrapped in
+    read_only_db get a session on the read-only engine instead.
+    """
+    if g.get("db_read_only"):
+        if "read_db" not in g:
+            g.read_db = ReadSessionLocal()
+        return g.read_db
+    if "db" not in g:
+        g.db = SessionLocal()
+    return g.db
+
+
+def read_only_db(fn):
+    """Routes get_db() to the read-only engine for the wrapped handler."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        g.db_read_only = True
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+def close_db(error=None):
+    for key in ("db", "read_db"):
+        db = g.pop(key, None)
+        if db is None:
+            continue
+        if error is not None:
+            db.rollback()
+        db.close()
+
+
+def prewarm_pool(count):
+    """Opens count pooled connections up front so first requests skip connect + PRAGMAs."""
+    conns = []
+    try:
+        for _ in range(min(count, DB_POOL_SIZE)):
+            conns.append(engine.connect())
+        for _ in range(min(count, DB_READ_POOL_SIZE)):
+            conns.append(read_engine.connect())
+    finally:
+        for conn in conns:
+            conn.close()
+
+
+def pool_metrics():
+    return {
+        "writer": engine.pool.metrics(),
+        "reader": read_engine.pool.metrics(),
+    }
@@ -2,6 +2,7 @@ import json
 
 from database import SessionLocal
 from models import PriceListItem
+from services.price_index import bump_price_list_version
 
 JSON_PATH = r"mrp_with_size.json"
 
@@ -69,6 +70,7 @@ def main():
             else:
                 db.add(PriceListItem(**item))
                 inserted += 1
+        bump_price_list_version(db)
         db.commit()
     finally:
         db.close()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, Date, DateTime, Index, UniqueConstraint
 from sqlalchemy.sql import func
 from database import Base
 
@@ -15,7 +15,7 @@ class Invoice(Base):
     uploaded_by = Column(String)
     uploaded_at = Column(DateTime, server_default=func.now())
 
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now(), index=True)
 
 class InvoiceTotals(Base):
     __tablename__ = "invoice_totals"
@@ -38,6 +38,9 @@ class InvoiceTotals(Base):
 
 class InvoiceItem(Base):
     __tablename__ = "invoice_items"
+    __table_args__ = (
+        Index("ix_invoice_items_sku", "brand_number", "pack_size_case", "pack_size_quantity_ml"),
+    )
 
     id = Column(Integer, primary_key=True)
     invoice_number = Column(String, index=True)
@@ -83,6 +86,50 @@ class PresentStockDetail(Base):
     last_updated_item_name = Column(String)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
+class StockMovement(Base):
+    __tablename__ = "stock_movements"
+    __table_args__ = (
+        Index(
+            "ix_stock_movements_sku_date",
+            "brand_number", "pack_size_case", "pack_size_quantity_ml", "movement_date",
+        ),
+        Index("ix_stock_movements_reference_kind", "reference", "kind"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    movement_date = Column(Date, index=True)
+    kind = Column(String)
+    reference = Column(String)
+
+    brand_number = Column(String)
+    pack_size_case = Column(Integer)
+    pack_size_quantity_ml = Column(Integer)
+
+    cases_delta = Column(Integer)
+    bottles_delta = Column(Integer)
+    amount_delta = Column(Float)
+
+    created_by = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+
+class StockSnapshot(Base):
+    __tablename__ = "stock_snapshots"
+
+    id = Column(Integer, primary_key=True)
+    snapshot_date = Column(Date, index=True)
+    # Ledger movements up to this id are included in the snapshot.
+    last_movement_id = Column(Integer)
+
+    brand_number = Column(String)
+    pack_size_case = Column(Integer)
+    pack_size_quantity_ml = Column(Integer)
+
+    total_cases = Column(Integer)
+    total_bottles = Column(Integer)
+    total_amount = Column(Float)
+
+    created_at = Column(DateTime, server_default=func.now())
+
 class StockSummary(Base):
     __tablename__ = "stock_summary"
 
@@ -94,6 +141,9 @@ class StockSummary(Base):
 
 class SellReport(Base):
     __tablename__ = "sell_reports"
+    __table_args__ = (
+        Index("ix_sell_reports_stock_id_created_at", "stock_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True)
     stock_id = Column(Integer, index=True)
@@ -121,17 +171,18 @@ class SellReport(Base):
     unit_rate_per_bottle = Column(Float)
     sell_amount = Column(Float)
 
-    report_date = Column(String)
+    report_date = Column(String, index=True)
     created_by = Column(String)
     edited_by = Column(String)
     edited_at = Column(DateTime)
     edit_count = Column(Integer, default=0)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now(), index=True)
 
 class PriceListItem(Base):
     __tablename__ = "price_list"
     __table_args__ = (
         UniqueConstraint("brand_number", "size_code", "pack_type", "volume_ml", name="uq_price_list_item"),
+        Index("ix_price_list_brand_pack_volume", "brand_number", "pack_type", "volume_ml"),
     )
 
     id = Column(Integer, primary_key=True)
@@ -164,7 +215,7 @@ class SellFinance(Base):
     final_balance = Column(Float)
     created_by = Column(String)
     updated_by = Column(String)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now(), index=True)
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
 
 class SellFinanceExpense(Base):
@@ -205,15 +256,23 @@ class SellFinanceOutsideIncome(Base):
 
 class AuditLog(Base):
     __tablename__ = "audit_logs"
+    # SQLite appends the rowid (id) to every index entry, so each of these
+    # serves its filter, the created_at range and the (created_at, id) keyset.
+    __table_args__ = (
+        Index("ix_audit_logs_username_created_at", "username", "created_at"),
+        Index("ix_audit_logs_role_created_at", "role", "created_at"),
+        Index("ix_audit_logs_action_created_at", "action", "created_at"),
+        Index("ix_audit_logs_entity_type_created_at", "entity_type", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True)
-    username = Column(String, index=True)
-    role = Column(String, index=True)
-    action = Column(String, index=True)
+    username = Column(String)
+    role = Column(String)
+    action = Column(String)
     entity_type = Column(String)
     entity_id = Column(String)
     details = Column(String)
-    created_at = Column(DateTime, server_default=func.now())
+    created_at = Column(DateTime, server_default=func.now(), index=True)
 
 class UserLogin(Base):
     __tablename__ = "user_logins"
@@ -247,3 +306,54 @@ class UserBrandAlias(Base):
     short_name = Column(String(20))
     created_at = Column(DateTime, server_default=func.now())
     updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class UploadJob(Base):
+    __tablename__ = "upload_jobs"
+
+    id = Column(String, primary_key=True)
+    status = Column(String, index=True)
+    stage = Column(String)
+    file_path = Column(String)
+    original_filename = Column(String)
+    username = Column(String)
+    role = Column(String)
+    invoice_number = Column(String)
+    invoice_id = Column(Integer)
+    timings = Column(String)
+    result = Column(String)
+    error = Column(String)
+    http_status = Column(Integer)
+    worker = Column(String)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+class CacheVersion(Base):
+    __tablename__ = "cache_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, default=0)
+
+class SchemaVersion(Base):
+    __tablename__ = "schema_version"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String)
+    applied_at = Column(DateTime, server_default=func.now())
+
+class DashboardSnapshot(Base):
+    __tablename__ = "dashboard_snapshot"
+
+    id = Column(Integer, primary_key=True)
+    last_uncleared_amount = Column(Float)
+    last_invoice_date = Column(String)
+    last_invoice_number = Column(String)
+    last_invoice_net_value = Column(Float)
+    last_invoice_total_value = Column(Float)
+    last_invoice_retailer_credit_balance = Column(Float)
+    total_present_stock = Column(Integer)
+    present_stock_mrp_value = Column(Float)
+    stock_summary_value = Column(Float)
+    price_list_version = Column(Integer)
+    last_sell_report_date = Column(String)
+    last_sell_report_value = Column(Float)
+    updated_at = Column(DateTime)
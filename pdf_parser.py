@@ -2,6 +2,7 @@ import pdfplumber
 import json
 import re
 import os
+import time
 
 
 # ---------------- CLEAN HELPERS ----------------
@@ -40,16 +41,41 @@ def extract_amount_by_label(label, text):
     return clean_amount(match.group(1)) if match else 0.0
 
 
+# ---------------- PAGE EXTRACTION ----------------
+def extract_pages(pdf, timings=None):
+    """
+    Runs pdfplumber text and table extraction once per page.
+    The meta, items and totals stages all read from the returned list,
+    so no page is extracted twice.
+    """
+    pages = []
+    text_seconds = 0.0
+    table_seconds = 0.0
+    for page in pdf.pages:
+        t0 = time.perf_counter()
+        page_text = page.extract_text() or ""
+        t1 = time.perf_counter()
+        page_table = page.extract_table()
+        t2 = time.perf_counter()
+        text_seconds += t1 - t0
+        table_seconds += t2 - t1
+        pages.append({"text": page_text, "table": page_table})
+
+    if timings is not None:
+        timings["text_ms"] = round(text_seconds * 1000, 2)
+        timings["tables_ms"] = round(table_seconds * 1000, 2)
+    return pages
+
+
 # ---------------- INVOICE VALUES FROM TABLE ----------------
-def extract_invoice_values_from_table(pdf, text=None):
+def extract_invoice_values_from_table(tables, text=None):
     values = {
         "invoice_value": 0.0,
         "mrp_round_off": 0.0,
         "net_invoice_value": 0.0
     }
 
-    for page in pdf.pages:
-        table = page.extract_table()
+    for table in tables:
         if not table:
             continue
 
@@ -167,6 +193,17 @@ def extract_totals_block(text):
 
 # ---------------- MAIN PARSER FUNCTION ----------------
 def parse_invoice_pdf(pdf_path: str):
+    invoice, _ = parse_invoice_pdf_with_timings(pdf_path)
+    return invoice
+
+
+def parse_invoice_pdf_with_timings(pdf_path: str):
+    """
+    Same as parse_invoice_pdf, but also returns a per-stage timing
+    breakdown in milliseconds.
+    """
+    timings = {}
+    started = time.perf_counter()
 
     invoice = {
         "invoice_meta": {},
@@ -177,87 +214,97 @@ def parse_invoice_pdf(pdf_path: str):
     }
 
     with pdfplumber.open(pdf_path) as pdf:
+        t0 = time.perf_counter()
+        pages = extract_pages(pdf, timings)
+        timings["extract_ms"] = round((time.perf_counter() - t0) * 1000, 2)
 
-        text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+    t0 = time.perf_counter()
+    text = "\n".join(p["text"] for p in pages)
+    tables = [p["table"] for p in pages]
 
-        # -------- META --------
-        m = re.search(r"ICDC\d+", text)
-        invoice["invoice_meta"]["invoice_number"] = m.group() if m else ""
+    # -------- META --------
+    m = re.search(r"ICDC\d+", text)
+    invoice["invoice_meta"]["invoice_number"] = m.group() if m else ""
 
-        m = re.search(r"Invoice Date:\s*(.*)", text)
-        invoice["invoice_meta"]["invoice_date"] = m.group(1) if m else ""
+    m = re.search(r"Invoice Date:\s*(.*)", text)
+    invoice["invoice_meta"]["invoice_date"] = m.group(1) if m else ""
 
-        # -------- RETAILER --------
-        m = re.search(r"Name:\s*(.*?)\s*Code", text, re.DOTALL)
-        invoice["retailer"]["name"] = m.group(1).strip() if m else ""
+    # -------- RETAILER --------
+    m = re.search(r"Name:\s*(.*?)\s*Code", text, re.DOTALL)
+    invoice["retailer"]["name"] = m.group(1).strip() if m else ""
 
-        m = re.search(r"Code:\s*(\d+)", text)
-        invoice["retailer"]["code"] = m.group(1) if m else ""
+    m = re.search(r"Code:\s*(\d+)", text)
+    invoice["retailer"]["code"] = m.group(1) if m else ""
 
-        # -------- LICENSEE --------
-        m = re.search(r"PAN:\s*(\w+)", text)
-        invoice["licensee"]["pan"] = m.group(1) if m else ""
+    # -------- LICENSEE --------
+    m = re.search(r"PAN:\s*(\w+)", text)
+    invoice["licensee"]["pan"] = m.group(1) if m else ""
+    timings["meta_ms"] = round((time.perf_counter() - t0) * 1000, 2)
 
-        # -------- ITEMS --------
-        for page in pdf.pages:
-            table = page.extract_table()
-            if not table:
-                continue
-
-            for row in table:
-                if not row or not row[0] or not row[0].strip().isdigit():
-                    continue
+    # -------- ITEMS --------
+    t0 = time.perf_counter()
+    for table in tables:
+        if not table:
+            continue
 
-                row = [c.replace("\n", " ").strip() for c in row if c and c.strip()]
+        for row in table:
+            if not row or not row[0] or not row[0].strip().isdigit():
+                continue
 
-                if len(row) < 6:
-                    continue
-                pack_case, pack_qty = parse_pack_size(row[5])
-                item = {
-                    "sl_no": safe_int(row[0]),
-                    "brand_number": row[1],
-                    "brand_name": row[2],
-                    "product_type": row[3],
-                    "pack_type": row[4],
-                    "pack_size_case": pack_case,
-                    "pack_size_quantity_ml": pack_qty,
-                    "cases_delivered": 0,
-                    "bottles_delivered": 0,
-                    "rate_per_case": 0.0,
-                    "unit_rate_per_bottle": 0.0,
-                    "total_amount": clean_amount(row[-1])
-                }
-
-                for i, val in enumerate(row):
-                    if re.search(r"/\s*\d+\s*ml", val.lower()):
-                        if i + 1 < len(row):
-                            item["cases_delivered"] = safe_int(row[i + 1])
-                        if i + 2 < len(row):
-                            item["bottles_delivered"] = safe_int(row[i + 2])
-                        break
+            row = [c.replace("\n", " ").strip() for c in row if c and c.strip()]
 
-                for val in row:
-                    rates = re.findall(r"([\d,]+\.\d{2})", val)
-                    if len(rates) >= 2:
-                        item["rate_per_case"] = clean_amount(rates[0])
-                        item["unit_rate_per_bottle"] = clean_amount(rates[1])
-
-                item["total_amount"] = clean_amount(row[-1])
-
-                invoice["items"].append(item)
-
-        # -------- TOTALS --------
-        invoice["totals"] = extract_totals_block(text)
-        invoice["totals"].update(extract_invoice_values_from_table(pdf, text))
-        invoice["totals"]["total_invoice_value"] = (
-            float(invoice["totals"].get("net_invoice_value", 0.0))
-            + float(invoice["totals"].get("special_excise_cess", 0.0))
-            + float(invoice["totals"].get("tcs", 0.0))
-            + float(invoice["totals"].get("new_retailer_professional_tax", 0.0))
-            + float(invoice["totals"].get("retail_shop_excise_turnover_tax", 0.0))
-        )
+            if len(row) < 6:
+                continue
+            pack_case, pack_qty = parse_pack_size(row[5])
+            item = {
+                "sl_no": safe_int(row[0]),
+                "brand_number": row[1],
+                "brand_name": row[2],
+                "product_type": row[3],
+                "pack_type": row[4],
+                "pack_size_case": pack_case,
+                "pack_size_quantity_ml": pack_qty,
+                "cases_delivered": 0,
+                "bottles_delivered": 0,
+                "rate_per_case": 0.0,
+                "unit_rate_per_bottle": 0.0,
+                "total_amount": clean_amount(row[-1])
+            }
+
+            for i, val in enumerate(row):
+                if re.search(r"/\s*\d+\s*ml", val.lower()):
+                    if i + 1 < len(row):
+                        item["cases_delivered"] = safe_int(row[i + 1])
+                    if i + 2 < len(row):
+                        item["bottles_delivered"] = safe_int(row[i + 2])
+                    break
+
+            for val in row:
+                rates = re.findall(r"([\d,]+\.\d{2})", val)
+                if len(rates) >= 2:
+                    item["rate_per_case"] = clean_amount(rates[0])
+                    item["unit_rate_per_bottle"] = clean_amount(rates[1])
+
+            item["total_amount"] = clean_amount(row[-1])
+
+            invoice["items"].append(item)
+    timings["items_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+    # -------- TOTALS --------
+    t0 = time.perf_counter()
+    invoice["totals"] = extract_totals_block(text)
+    invoice["totals"].update(extract_invoice_values_from_table(tables, text))
+    invoice["totals"]["total_invoice_value"] = (
+        float(invoice["totals"].get("net_invoice_value", 0.0))
+        + float(invoice["totals"].get("special_excise_cess", 0.0))
+        + float(invoice["totals"].get("tcs", 0.0))
+        + float(invoice["totals"].get("new_retailer_professional_tax", 0.0))
+        + float(invoice["totals"].get("retail_shop_excise_turnover_tax", 0.0))
+    )
+    timings["totals_ms"] = round((time.perf_counter() - t0) * 1000, 2)
 
     # -------- SAVE JSON FILE --------
+    t0 = time.perf_counter()
     base = os.path.basename(pdf_path)
     json_name = base.replace(".pdf", ".json")
 
@@ -267,5 +314,8 @@ def parse_invoice_pdf(pdf_path: str):
 
     with open(json_path, "w", encoding="utf-8") as f:
         json.dump(invoice, f, indent=4)
+    timings["save_ms"] = round((time.perf_counter() - t0) * 1000, 2)
 
-    return invoice
+    timings["pages"] = len(pages)
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return invoice, timings
@@ -1,10 +1,9 @@
-from flask import Blueprint, jsonify, Response, send_file, request
+from flask import Blueprint, jsonify, Response, request
 from sqlalchemy import text, func
 import time
-import os
 import base64
 from functools import wraps
-from database import SessionLocal
+from database import get_db, pool_metrics, read_only_db
 from models import (
     Invoice,
     InvoiceItem,
@@ -17,19 +16,40 @@ from models import (
     SellFinancePhonePay,
     SellFinanceCash,
     SellFinanceOutsideIncome,
-    PriceListItem,
     AuditLog,
     UserLogin,
 )
 from auth import jwt_required
-from config import APP_START_TIME, ADMIN_USER, ADMIN_PASS
+from config import APP_START_TIME, ADMIN_USER, ADMIN_PASS, STREAM_BATCH_SIZE
+from services.pdf_cache import cached_pdf_response, pdf_content_digest
 from services.pdf_export import write_invoice_pdf, write_sell_report_pdf
-from services.audit import log_action, update_last_login
-from services.stock_service import recalc_stock_summary
-from models import PriceListItem
+from services.audit import audit_queue_stats, log_action, queue_action
+from services.audit_archive import audit_retention_status
+from services.audit_query import AUDIT_DEFAULT_LIMIT, audit_log_page, parse_audit_filters
+from services.invoice_upload import reverse_invoice
+from services.stock_ledger import ADJUSTMENT, INVOICE_DELETE, SALE_DELETE, set_movement_context
+from services.stock_service import rebuild_stock_from_invoices, stock_summary_check_status
+from services.dashboard import (
+    FINANCE,
+    INVOICE,
+    SELL_REPORT,
+    STOCK,
+    compute_dashboard_values,
+    dashboard_summary_payload,
+    get_dashboard_snapshot,
+    refresh_dashboard_snapshot,
+    snapshot_drift,
+    store_dashboard_snapshot,
+)
+from services.price_index import get_price_index
+from services.json_stream import json_stream_response
+from services.pagination import get_page_args, split_page
+from services.sales_utils import sell_report_batches_after, sell_report_batches_query, stored_datetime_iso
 
 admin_bp = Blueprint("admin", __name__)
 
+DESTRUCTIVE_METHODS = ("POST", "PATCH", "DELETE")
+
 def get_auth_from_header():
     auth_header = request.headers.get("Authorization", "")
     if not auth_header:
@@ -60,13 +80,7 @@ def admin_or_staff_required(fn):
             if username == ADMIN_USER and password == ADMIN_PASS:
                 request.user = {"username": username, "role": "admin"}
                 request.auth_mode = "basic"
-                db = SessionLocal()
-                try:
-                    update_last_login(db, request.user)
-                    log_action(db, request.user, "api_access", "admin_route", request.path)
-                    db.commit()
-                finally:
-                    db.close()
+                queue_action(request.user, "api_access", "admin_route", request.path, touch_login=True)
                 return fn(*args, **kwargs)
             return Response("Unauthorized", 401, {"WWW-Authenticate": 'Basic realm="Admin"'})
             
@@ -87,95 +101,27 @@ def admin_basic_required(fn):
             if username == ADMIN_USER and password == ADMIN_PASS:
                 request.user = {"username": username, "role": "admin"}
                 request.auth_mode = "basic"
-                db = SessionLocal()
                 try:
-                    update_last_login(db, request.user)
-                    log_action(db, request.user, "admin_action", "management", request.path)
-                    db.commit()
-                finally:
-                    db.close()
+                    queue_action(
+                        request.user, "admin_action", "management", request.path,
+                        touch_login=True, sync=request.method in DESTRUCTIVE_METHODS
+                    )
+                except Exception as e:
+                    return jsonify({"error": f"audit log write failed, action not performed: {e}"}), 503
                 return fn(*args, **kwargs)
         return Response("Unauthorized: Basic Auth Required", 401, {"WWW-Authenticate": 'Basic realm="Admin"'})
     return wrapper
 
 
-def _rebuild_stock_from_invoices(db):
-    # Rebuild present stock entirely from remaining invoice items
-    db.query(PresentStockDetail).delete()
-    summary = db.query(StockSummary).first()
-    if not summary:
-        summary = StockSummary(total_cases_all_items=0, total_price_all_items=0.0)
-        db.add(summary)
-        db.flush()
-    summary.total_cases_all_items = 0
-    summary.total_price_all_items = 0.0
-    summary.last_updated_item_name = ""
-
-    mrp_map = {}
-    for r in db.query(PriceListItem).all():
-        key = (str(r.brand_number or "").strip(), str(r.pack_type or "").strip(), int(r.volume_ml or 0))
-        if key not in mrp_map:
-            mrp_map[key] = float(r.mrp or 0.0)
-
-    invoices = db.query(Invoice).order_by(Invoice.id.asc()).all()
-    invoice_date_map = {inv.invoice_number: inv.invoice_date for inv in invoices}
-
-    items = db.query(InvoiceItem).order_by(InvoiceItem.id.asc()).all()
-    stock_map = {}
-    for it in items:
-        key = (it.brand_number, it.pack_size_case, it.pack_size_quantity_ml)
-        pack_size = int(it.pack_size_case or 0)
-        cases = int(it.cases_delivered or 0)
-        bottles = int(it.bottles_delivered or 0)
-        total_bottles = cases * pack_size + bottles
-
-        mrp_key = (str(it.brand_number or "").strip(), str(it.pack_type or "").strip(), int(it.pack_size_quantity_ml or 0))
-        mrp = mrp_map.get(mrp_key)
-        unit_rate = float(mrp) if mrp is not None else None
-        rate_per_case = float(mrp) * float(pack_size) if (mrp is not None and pack_size) else None
-        total_amount = float(mrp) * float(total_bottles) if mrp is not None else 0.0
-
-        if key not in stock_map:
-            stock_map[key] = {
-                "brand_number": it.brand_number,
-                "brand_name": it.brand_name,
-                "product_type": it.product_type,
-                "pack_type": it.pack_type,
-                "pack_size_case": it.pack_size_case,
-                "pack_size_quantity_ml": it.pack_size_quantity_ml,
-                "total_cases": 0,
-                "total_bottles": 0,
-                "rate_per_case": rate_per_case,
-                "unit_rate_per_bottle": unit_rate,
-                "total_amount": 0.0,
-                "last_invoice_date": invoice_date_map.get(it.invoice_number, ""),
-            }
-
-        entry = stock_map[key]
-        entry["total_cases"] += cases
-        entry["total_bottles"] += total_bottles
-        entry["total_amount"] += total_amount
-        entry["rate_per_case"] = rate_per_case or entry.get("rate_per_case")
-        entry["unit_rate_per_bottle"] = unit_rate or entry.get("unit_rate_per_bottle")
-        entry["last_invoice_date"] = invoice_date_map.get(it.invoice_number, entry["last_invoice_date"])
-
-        item_display = f"{it.brand_name or ''} {it.pack_size_quantity_ml or 0}ml/{it.pack_size_case or 0}"
-        entry["last_updated_item_name"] = item_display
-
-    for entry in stock_map.values():
-        db.add(PresentStockDetail(**entry))
-        summary.total_cases_all_items += entry["total_cases"] or 0
-        summary.total_price_all_items += entry["total_amount"] or 0.0
-        summary.last_updated_item_name = entry.get("last_updated_item_name") or summary.last_updated_item_name
-
 # --- Information Endpoints (Option 1 & 2) ---
 
 @admin_bp.route("/admin", methods=["GET"])
 @admin_or_staff_required
+@read_only_db
 def admin_dashboard():
     db_ok = False
     db_error = None
-    db = SessionLocal()
+    db = get_db()
     try:
         db.execute(text("SELECT 1"))
         db_ok = True
@@ -188,11 +134,7 @@ def admin_dashboard():
         invoice_rows = db.query(Invoice).order_by(Invoice.id.desc()).limit(50).all()
 
         # Calculate MRP value
-        mrp_map = {}
-        for r in db.query(PriceListItem).all():
-            key = (str(r.brand_number or "").strip(), str(r.pack_type or "").strip(), int(r.volume_ml or 0))
-            if key not in mrp_map:
-                mrp_map[key] = float(r.mrp or 0.0)
+        mrp_map = get_price_index(db).mrp_by_pack
         total_stock_mrp_value = 0.0
         stocks = db.query(PresentStockDetail).all()
         for s in stocks:
@@ -206,8 +148,6 @@ def admin_dashboard():
         invoice_count, item_count, stock_count, total_stock_mrp_value = 0, 0, 0, 0.0
         latest_invoice, summary = None, None
         invoice_rows = []
-    finally:
-        db.close()
 
     auth_mode = getattr(request, "auth_mode", "jwt")
     
@@ -425,112 +365,72 @@ def admin_status():
     return jsonify({
         "status": "ok",
         "server_time": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "uptime_seconds": int(time.time() - APP_START_TIME)
+        "uptime_seconds": int(time.time() - APP_START_TIME),
+        "audit_queue": audit_queue_stats(),
+        "audit_archive": audit_retention_status(),
+        "stock_summary_check": stock_summary_check_status(),
+        "db_pool": pool_metrics()
     })
 
 
 @admin_bp.route("/dashboard/summary", methods=["GET"])
 @admin_or_staff_required
 def dashboard_summary():
-    db = SessionLocal()
-    try:
-        last_finance = db.query(SellFinance).order_by(SellFinance.created_at.desc()).first()
-        last_uncleared_amount = float(last_finance.final_balance or 0.0) if last_finance else 0.0
-
-        last_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
-        last_invoice_date = last_invoice.invoice_date if last_invoice else ""
-        last_invoice_number = last_invoice.invoice_number if last_invoice else ""
-
-        last_invoice_value = 0.0
-        last_retailer_credit = 0.0
-        if last_invoice:
-            totals = db.query(InvoiceTotals).filter(
-                InvoiceTotals.invoice_number == last_invoice.invoice_number
-            ).first()
-            if totals:
-                last_invoice_value = float(totals.total_invoice_value or 0.0)
-                last_retailer_credit = float(totals.retailer_credit_balance or 0.0)
-
-        total_present_stock = db.query(
-            func.coalesce(func.sum(PresentStockDetail.total_cases), 0)
-        ).scalar()
-        total_present_stock = int(total_present_stock or 0)
-
-        summary = db.query(StockSummary).first()
-        total_present_stock_mrp_value = float(summary.total_price_all_items or 0.0) if summary else 0.0
-
-        last_report = db.query(SellReport).order_by(SellReport.created_at.desc()).first()
-        last_report_date = last_report.report_date if last_report else ""
-        last_sell_report_value = 0.0
-        if last_report_date:
-            last_sell_report_value = db.query(
-                func.coalesce(func.sum(SellReport.sell_amount), 0.0)
-            ).filter(SellReport.report_date == last_report_date).scalar()
-
-        return jsonify({
-            "last_uncleared_amount": last_uncleared_amount,
-            "last_invoice_date": last_invoice_date,
-            "last_invoice_number": last_invoice_number,
-            "last_invoice_value": last_invoice_value,
-            "last_invoice_retailer_credit_balance": last_retailer_credit,
-            "total_present_stock": total_present_stock,
-            "total_present_stock_mrp_value": total_present_stock_mrp_value,
-            "last_sell_report_date": last_report_date,
-            "last_sell_report_value": float(last_sell_report_value or 0.0)
-        })
-    finally:
-        db.close()
+    db = get_db()
+    snapshot = get_dashboard_snapshot(db)
+    if request.args.get("fresh") != "1":
+        return jsonify(dashboard_summary_payload(snapshot))
+
+    fresh = compute_dashboard_values(db)
+    drift = snapshot_drift(snapshot, fresh)
+    if drift:
+        store_dashboard_snapshot(db, fresh)
+        db.commit()
+    payload = dashboard_summary_payload(fresh)
+    payload["drift"] = drift
+    return jsonify(payload)
 
 # --- System Logs (Option 2 ONLY) ---
 
 @admin_bp.route("/admin/audit-logs", methods=["GET"])
 @admin_basic_required
+@read_only_db
 def get_audit_logs():
-    db = SessionLocal()
+    db = get_db()
     try:
-        rows = db.query(AuditLog).order_by(AuditLog.created_at.desc()).limit(200).all()
-        return jsonify({
-            "count": len(rows),
-            "items": [{
-                "username": r.username,
-                "role": r.role,
-                "action": r.action,
-                "entity_type": r.entity_type,
-                "entity_id": r.entity_id,
-                "details": r.details,
-                "created_at": r.created_at.isoformat() if r.created_at else None
-            } for r in rows]
-        })
-    finally:
-        db.close()
+        filters = parse_audit_filters(request.args)
+        limit, cursor = get_page_args(request.args, cursor_size=2, default_limit=AUDIT_DEFAULT_LIMIT)
+        items, next_cursor = audit_log_page(db, filters, limit, cursor)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    return jsonify({"count": len(items), "items": items, "next_cursor": next_cursor})
 
 @admin_bp.route("/admin/user-logins", methods=["GET"])
 @admin_basic_required
+@read_only_db
 def get_user_logins():
-    db = SessionLocal()
-    try:
-        rows = db.query(UserLogin).order_by(UserLogin.last_login_at.desc()).all()
-        return jsonify({
-            "count": len(rows),
-            "items": [{
-                "username": r.username,
-                "role": r.role,
-                "last_login_at": r.last_login_at.isoformat() if r.last_login_at else None
-            } for r in rows]
-        })
-    finally:
-        db.close()
+    db = get_db()
+    rows = db.query(UserLogin).order_by(UserLogin.last_login_at.desc()).all()
+    return jsonify({
+        "count": len(rows),
+        "items": [{
+            "username": r.username,
+            "role": r.role,
+            "last_login_at": r.last_login_at.isoformat() if r.last_login_at else None
+        } for r in rows]
+    })
 
 # --- Management Actions (Option 2 ONLY) ---
 
 @admin_bp.route("/admin/reports/sell-reports/<report_date>", methods=["DELETE"])
 @admin_basic_required
 def delete_sell_report(report_date):
-    db = SessionLocal()
+    db = get_db()
     try:
         rows = db.query(SellReport).filter(SellReport.report_date == report_date).all()
         if not rows:
             return {"error": "sell report not found"}, 404
+        set_movement_context(db, SALE_DELETE, report_date, username=request.user.get("username"))
         for r in rows:
             db.delete(r)
 
@@ -542,178 +442,192 @@ def delete_sell_report(report_date):
             db.query(SellFinanceCash).filter(SellFinanceCash.finance_id == fin.id).delete()
             db.delete(fin)
         log_action(db, request.user, "DELETE_SELL_REPORT", "sell_report", report_date)
-        _rebuild_stock_from_invoices(db)
+        rebuild = rebuild_stock_from_invoices(db)
+        refresh_dashboard_snapshot(db, SELL_REPORT, FINANCE, STOCK)
         db.commit()
-        return jsonify({"status": "ok", "message": f"Deleted report for {report_date}"})
+        return jsonify({"status": "ok", "message": f"Deleted report for {report_date}", "stock_rebuild": rebuild})
     except Exception as e:
         db.rollback()
         return jsonify({"error": str(e)}), 500
-    finally:
-        db.close()
 
 @admin_bp.route("/admin/invoices/<invoice_number>", methods=["DELETE"])
 @admin_basic_required
 def delete_invoice(invoice_number):
-    db = SessionLocal()
+    db = get_db()
     try:
         invoice_exists = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
         if not invoice_exists:
             return {"error": "invoice not found"}, 404
 
+        set_movement_context(db, INVOICE_DELETE, invoice_number, username=request.user.get("username"))
+        reversal = reverse_invoice(db, invoice_number)
         db.query(InvoiceItem).filter(InvoiceItem.invoice_number == invoice_number).delete()
         db.query(InvoiceTotals).filter(InvoiceTotals.invoice_number == invoice_number).delete()
         db.query(Invoice).filter(Invoice.invoice_number == invoice_number).delete()
         log_action(db, request.user, "DELETE_INVOICE", "invoice", invoice_number)
-        _rebuild_stock_from_invoices(db)
+        refresh_dashboard_snapshot(db, INVOICE, STOCK)
         db.commit()
-        return jsonify({"status": "ok"})
+        return jsonify({"status": "ok", "stock_reversal": reversal})
     except Exception as e:
         db.rollback()
         return jsonify({"error": str(e)}), 500
-    finally:
-        db.close()
 
 @admin_bp.route("/admin/sell-finance/<report_date>", methods=["DELETE"])
 @admin_basic_required
 def delete_sell_finance(report_date):
-    db = SessionLocal()
-    try:
-        fin = db.query(SellFinance).filter(SellFinance.report_date == report_date).first()
-        if not fin: return {"error": "not found"}, 404
-        db.query(SellFinanceExpense).filter(SellFinanceExpense.finance_id == fin.id).delete()
-        db.query(SellFinanceOutsideIncome).filter(SellFinanceOutsideIncome.finance_id == fin.id).delete()
-        db.query(SellFinancePhonePay).filter(SellFinancePhonePay.finance_id == fin.id).delete()
-        db.query(SellFinanceCash).filter(SellFinanceCash.finance_id == fin.id).delete()
-        db.delete(fin)
-        log_action(db, request.user, "DELETE_FINANCE", "sell_finance", report_date)
-        db.commit()
-        return jsonify({"status": "ok"})
-    finally:
-        db.close()
+    db = get_db()
+    fin = db.query(SellFinance).filter(SellFinance.report_date == report_date).first()
+    if not fin: return {"error": "not found"}, 404
+    db.query(SellFinanceExpense).filter(SellFinanceExpense.finance_id == fin.id).delete()
+    db.query(SellFinanceOutsideIncome).filter(SellFinanceOutsideIncome.finance_id == fin.id).delete()
+    db.query(SellFinancePhonePay).filter(SellFinancePhonePay.finance_id == fin.id).delete()
+    db.query(SellFinanceCash).filter(SellFinanceCash.finance_id == fin.id).delete()
+    db.delete(fin)
+    log_action(db, request.user, "DELETE_FINANCE", "sell_finance", report_date)
+    refresh_dashboard_snapshot(db, FINANCE)
+    db.commit()
+    return jsonify({"status": "ok"})
 
 @admin_bp.route("/admin/stock/<int:stock_id>", methods=["PATCH"])
 @admin_basic_required
 def update_stock(stock_id):
     payload = request.get_json(silent=True) or {}
-    db = SessionLocal()
-    try:
-        stock = db.query(PresentStockDetail).filter(PresentStockDetail.id == stock_id).first()
-        if not stock: return {"error": "stock not found"}, 404
-        for f in ["total_cases", "total_bottles", "rate_per_case", "unit_rate_per_bottle", "total_amount"]:
-            if f in payload: setattr(stock, f, payload.get(f))
-        log_action(db, request.user, "EDIT_STOCK", "stock", stock_id, details=str(payload))
-        db.commit()
-        return jsonify({"status": "ok"})
-    finally:
-        db.close()
+    db = get_db()
+    stock = db.query(PresentStockDetail).filter(PresentStockDetail.id == stock_id).first()
+    if not stock: return {"error": "stock not found"}, 404
+    set_movement_context(db, ADJUSTMENT, stock_id, username=request.user.get("username"))
+    for f in ["total_cases", "total_bottles", "rate_per_case", "unit_rate_per_bottle", "total_amount"]:
+        if f in payload: setattr(stock, f, payload.get(f))
+    log_action(db, request.user, "EDIT_STOCK", "stock", stock_id, details=str(payload))
+    refresh_dashboard_snapshot(db, STOCK)
+    db.commit()
+    return jsonify({"status": "ok"})
 
 # --- Standard Report List Endpoints (Option 1 & 2) ---
 
 @admin_bp.route("/reports/invoices", methods=["GET"])
 @admin_or_staff_required
+@read_only_db
 def list_invoices():
-    db = SessionLocal()
+    db = get_db()
     try:
-        rows = db.query(Invoice).order_by(Invoice.id.desc()).all()
-        return jsonify([{
-            "invoice_number": r.invoice_number,
-            "invoice_date": r.invoice_date,
-            "uploaded_by": r.uploaded_by or "unknown",
-            "uploaded_at": (r.uploaded_at.isoformat() if r.uploaded_at else (r.created_at.isoformat() if r.created_at else None)),
-            "retailer_code": r.retailer_code
-        } for r in rows])
-    finally:
-        db.close()
+        limit, cursor = get_page_args(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    q = db.query(Invoice).order_by(Invoice.id.desc())
+    if limit is None:
+        return json_stream_response(_invoice_row(r) for r in q.yield_per(STREAM_BATCH_SIZE))
+    if cursor:
+        q = q.filter(Invoice.id < cursor[0])
+    page, next_cursor = split_page(q.limit(limit + 1).all(), limit, lambda r: (r.id,))
+    return jsonify({"items": [_invoice_row(r) for r in page], "next_cursor": next_cursor})
+
+def _invoice_row(r):
+    return {
+        "invoice_number": r.invoice_number,
+        "invoice_date": r.invoice_date,
+        "uploaded_by": r.uploaded_by or "unknown",
+        "uploaded_at": (r.uploaded_at.isoformat() if r.uploaded_at else (r.created_at.isoformat() if r.created_at else None)),
+        "retailer_code": r.retailer_code
+    }
 
 @admin_bp.route("/reports/sell-reports", methods=["GET"])
 @admin_or_staff_required
+@read_only_db
 def list_sell_reports():
-    db = SessionLocal()
+    db = get_db()
     try:
-        rows = db.query(SellReport).order_by(SellReport.created_at.desc()).all()
-        finances = {f.report_date: f for f in db.query(SellFinance).all()}
-        summary = {}
-        for r in rows:
-            key = r.report_date
-            if key not in summary:
-                fin = finances.get(key)
-                summary[key] = {
-                    "report_date": r.report_date,
-                    "created_at": r.created_at.isoformat() if r.created_at else None,
-                    "created_by": r.created_by or "unknown",
-                    "total_items": 0,
-                    "edit_count": r.edit_count or 0,
-                    "finance": {
-                        "total_sell_amount": fin.total_sell_amount,
-                        "total_balance": fin.total_balance,
-                        "final_balance": fin.final_balance
-                    } if fin else None
-                }
-            summary[key]["total_items"] += 1
-        return jsonify(list(summary.values()))
-    finally:
-        db.close()
+        limit, cursor = get_page_args(request.args, cursor_size=2)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    q = sell_report_batches_query(
+        db,
+        SellFinance.id.label("finance_id"),
+        SellFinance.total_sell_amount.label("finance_total_sell_amount"),
+        SellFinance.total_balance,
+        SellFinance.final_balance,
+    ).outerjoin(SellFinance, SellFinance.report_date == SellReport.report_date)
+    if limit is None:
+        return json_stream_response(_sell_report_batch_row(r) for r in q.yield_per(STREAM_BATCH_SIZE))
+    if cursor:
+        q = sell_report_batches_after(q, *cursor)
+    page, next_cursor = split_page(
+        q.limit(limit + 1).all(), limit, lambda r: (r.last_created_at, r.report_date)
+    )
+    return jsonify({"items": [_sell_report_batch_row(r) for r in page], "next_cursor": next_cursor})
+
+def _sell_report_batch_row(r):
+    return {
+        "report_date": r.report_date,
+        "created_at": stored_datetime_iso(r.last_created_at),
+        "created_by": r.created_by or "unknown",
+        "total_items": r.total_items,
+        "edit_count": r.edit_count or 0,
+        "finance": {
+            "total_sell_amount": r.finance_total_sell_amount,
+            "total_balance": r.total_balance,
+            "final_balance": r.final_balance
+        } if r.finance_id is not None else None
+    }
 
 @admin_bp.route("/admin/invoices/<invoice_number>", methods=["PATCH"])
 @admin_basic_required
 def admin_update_invoice(invoice_number):
     payload = request.get_json(silent=True) or {}
-    db = SessionLocal()
-    try:
-        invoice = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
-        if not invoice: return {"error": "invoice not found"}, 404
-        
-        if "invoice_date" in payload: invoice.invoice_date = payload.get("invoice_date")
-        if "invoice_number" in payload: invoice.invoice_number = payload.get("invoice_number")
-        
-        log_action(db, request.user, "EDIT_INVOICE", "invoice", invoice_number, details=str(payload))
-        db.commit()
-        return jsonify({"status": "ok"})
-    finally:
-        db.close()
+    db = get_db()
+    invoice = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
+    if not invoice: return {"error": "invoice not found"}, 404
+    
+    if "invoice_date" in payload: invoice.invoice_date = payload.get("invoice_date")
+    if "invoice_number" in payload: invoice.invoice_number = payload.get("invoice_number")
+    
+    log_action(db, request.user, "EDIT_INVOICE", "invoice", invoice_number, details=str(payload))
+    refresh_dashboard_snapshot(db, INVOICE)
+    db.commit()
+    return jsonify({"status": "ok"})
 
 @admin_bp.route("/reports/invoices/<invoice_number>/pdf", methods=["GET"])
 @admin_or_staff_required
+@read_only_db
 def invoice_pdf(invoice_number):
-    db = SessionLocal()
-    try:
-        invoice = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
-        if not invoice: return {"error": "not found"}, 404
-        totals = db.query(InvoiceTotals).filter(InvoiceTotals.invoice_number == invoice_number).first()
-        items = db.query(InvoiceItem).filter(InvoiceItem.invoice_number == invoice_number).order_by(InvoiceItem.sl_no.asc()).all()
-        meta_rows = [["Invoice Number", invoice.invoice_number], ["Invoice Date", invoice.invoice_date], ["Retailer", f"{invoice.retailer_name} ({invoice.retailer_code})"]]
-        totals_rows = [[k, v] for k, v in [["Value", totals.invoice_value], ["Net", totals.net_invoice_value]]] if totals else []
-        items_rows = [["#", "Brand", "Pack", "Cases", "Bottles", "Total"]]
-        for it in items:
-            items_rows.append([it.sl_no, it.brand_name, f"{it.pack_size_case}/{it.pack_size_quantity_ml}ml", it.cases_delivered, it.bottles_delivered, it.total_amount])
-        out_dir = os.path.join("requested_pdf", "invoices")
-        os.makedirs(out_dir, exist_ok=True)
-        filename = f"{invoice.invoice_number}.pdf"
-        out_path = os.path.join(out_dir, filename)
-        write_invoice_pdf(out_path, meta_rows, items_rows, totals_rows, title="Invoice Report")
-        return send_file(out_path, as_attachment=True, download_name=filename)
-    finally:
-        db.close()
+    db = get_db()
+    invoice = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
+    if not invoice: return {"error": "not found"}, 404
+    totals = db.query(InvoiceTotals).filter(InvoiceTotals.invoice_number == invoice_number).first()
+    items = db.query(InvoiceItem).filter(InvoiceItem.invoice_number == invoice_number).order_by(InvoiceItem.sl_no.asc()).all()
+    meta_rows = [["Invoice Number", invoice.invoice_number], ["Invoice Date", invoice.invoice_date], ["Retailer", f"{invoice.retailer_name} ({invoice.retailer_code})"]]
+    totals_rows = [[k, v] for k, v in [["Value", totals.invoice_value], ["Net", totals.net_invoice_value]]] if totals else []
+    items_rows = [["#", "Brand", "Pack", "Cases", "Bottles", "Total"]]
+    for it in items:
+        items_rows.append([it.sl_no, it.brand_name, f"{it.pack_size_case}/{it.pack_size_quantity_ml}ml", it.cases_delivered, it.bottles_delivered, it.total_amount])
+    digest = pdf_content_digest("invoice", meta_rows, items_rows, totals_rows)
+    return cached_pdf_response(
+        "invoices",
+        invoice.invoice_number,
+        f"{invoice.invoice_number}.pdf",
+        digest,
+        lambda path: write_invoice_pdf(path, meta_rows, items_rows, totals_rows, title="Invoice Report"),
+    )
 
 @admin_bp.route("/reports/sell-reports/<report_date>/pdf", methods=["GET"])
 @admin_or_staff_required
+@read_only_db
 def sell_report_pdf(report_date):
-    db = SessionLocal()
-    try:
-        rows = db.query(SellReport).filter(SellReport.report_date == report_date).all()
-        if not rows: return {"error": "not found"}, 404
-        fin = db.query(SellFinance).filter(SellFinance.report_date == report_date).first()
-        meta_rows = [["Sell Report Date", report_date], ["Created By", rows[0].created_by]]
-        items_rows = [["Brand", "Size", "Sold(c)", "Sold(b)", "Amount"]]
-        for r in rows:
-            items_rows.append([r.brand_name, f"{r.pack_size_case}/{r.pack_size_quantity_ml}ml", r.sold_cases, r.sold_bottles, r.sell_amount])
-        finance_rows = [[k, v] for k, v in [["Total Sell", fin.total_sell_amount], ["Final Balance", fin.final_balance]]] if fin else []
-        out_dir = os.path.join("requested_pdf", "sellreport")
-        os.makedirs(out_dir, exist_ok=True)
-        safe_date = str(report_date).replace("/", "-")
-        filename = f"sell_report_{safe_date}.pdf"
-        out_path = os.path.join(out_dir, filename)
-        write_sell_report_pdf(out_path, meta_rows, items_rows, finance_rows, [], title="Sell Report")
-        return send_file(out_path, as_attachment=True, download_name=filename)
-    finally:
-        db.close()
+    db = get_db()
+    rows = db.query(SellReport).filter(SellReport.report_date == report_date).order_by(SellReport.id.asc()).all()
+    if not rows: return {"error": "not found"}, 404
+    fin = db.query(SellFinance).filter(SellFinance.report_date == report_date).first()
+    meta_rows = [["Sell Report Date", report_date], ["Created By", rows[0].created_by]]
+    items_rows = [["Brand", "Size", "Sold(c)", "Sold(b)", "Amount"]]
+    for r in rows:
+        items_rows.append([r.brand_name, f"{r.pack_size_case}/{r.pack_size_quantity_ml}ml", r.sold_cases, r.sold_bottles, r.sell_amount])
+    finance_rows = [[k, v] for k, v in [["Total Sell", fin.total_sell_amount], ["Final Balance", fin.final_balance]]] if fin else []
+    safe_date = str(report_date).replace("/", "-")
+    digest = pdf_content_digest("sell_report", meta_rows, items_rows, finance_rows)
+    return cached_pdf_response(
+        "sellreport",
+        f"sell_report_{safe_date}",
+        f"sell_report_{safe_date}.pdf",
+        digest,
+        lambda path: write_sell_report_pdf(path, meta_rows, items_rows, finance_rows, [], title="Sell Report"),
+    )
@@ -1,8 +1,9 @@
 from flask import Blueprint, jsonify, request
-from sqlalchemy import func
+from sqlalchemy import String, and_, func, or_, type_coerce
 
 from auth import auth_required
-from database import SessionLocal
+from config import STREAM_BATCH_SIZE
+from database import get_db, read_only_db
 from models import (
     Invoice,
     InvoiceTotals,
@@ -14,11 +15,17 @@ from models import (
     SellReport,
 )
 from services.audit import log_action
+from services.dashboard import FINANCE, refresh_dashboard_snapshot
+from services.json_stream import iter_chunks, json_stream_response
+from services.pagination import get_page_args, split_page
 from services.sales_utils import (
     get_last_finance_balance,
     get_total_sell_amount,
     normalize_money_entries,
     parse_report_date,
+    sell_report_batches_after,
+    sell_report_batches_query,
+    stored_datetime_iso,
 )
 
 sell_finance_bp = Blueprint("sell_finance", __name__)
@@ -47,198 +54,192 @@ def create_sell_finance():
     if not isinstance(cash_entries, list):
         return {"error": "cash_entries must be a list"}, 400
 
-    db = SessionLocal()
-    try:
-        SellFinancePhonePay.__table__.create(bind=db.get_bind(), checkfirst=True)
-        SellFinanceCash.__table__.create(bind=db.get_bind(), checkfirst=True)
-        SellFinanceOutsideIncome.__table__.create(bind=db.get_bind(), checkfirst=True)
-
-        latest_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
-        if not latest_invoice:
-            return {"error": "no invoices found"}, 400
-        latest_invoice_date = latest_invoice.invoice_date
-        latest_invoice_dt = parse_report_date(latest_invoice_date)
-        if not latest_invoice_dt:
-            return {"error": "invalid latest invoice date format"}, 400
-        report_dt = parse_report_date(report_date)
-        if not report_dt:
-            return {"error": "invalid report_date format"}, 400
-        if report_dt < latest_invoice_dt:
-            return {"error": "report_date must be on or after last invoice date"}, 400
-
-        sell_report_exists = db.query(SellReport).filter(
-            SellReport.report_date == report_date
-        ).first()
-        if not sell_report_exists:
-            return {"error": "sell report not found for this date"}, 404
-
-        finance = db.query(SellFinance).filter(
-            SellFinance.report_date == report_date
-        ).first()
-
-        previous_sell_report = db.query(SellReport).filter(
-            SellReport.report_date < report_date
-        ).order_by(SellReport.report_date.desc()).first()
-        min_allowed_dt = parse_report_date(previous_sell_report.report_date) if previous_sell_report else report_dt
-        if not min_allowed_dt:
-            min_allowed_dt = report_dt
-            min_allowed_label = "selected sell report date"
-        else:
-            min_allowed_label = "previous sell report date" if previous_sell_report else "selected sell report date"
-
-        last_balance_amount = get_last_finance_balance(db, finance.id if finance else None)
-        total_sell_amount = get_total_sell_amount(db, report_date)
-
-        if not phonepay_entries and (upi_phonepay not in (None, "", 0, 0.0, "0", "0.0")):
-            phonepay_entries = [{"date": report_date, "amount": upi_phonepay}]
-        if not cash_entries and (cash not in (None, "", 0, 0.0, "0", "0.0")):
-            cash_entries = [{"date": report_date, "amount": cash}]
-
-        cleaned_phonepay_entries, phonepay_total, phonepay_err = normalize_money_entries(
-            phonepay_entries,
-            "phonepay",
-            min_allowed_dt,
-            min_allowed_label,
-            report_dt,
-            "selected sell report date",
-        )
-        if phonepay_err:
-            return phonepay_err, 400
-        cleaned_cash_entries, cash_total, cash_err = normalize_money_entries(
-            cash_entries,
-            "cash",
-            min_allowed_dt,
-            min_allowed_label,
-            report_dt,
-            "selected sell report date",
+    db = get_db()
+    latest_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
+    if not latest_invoice:
+        return {"error": "no invoices found"}, 400
+    latest_invoice_date = latest_invoice.invoice_date
+    latest_invoice_dt = parse_report_date(latest_invoice_date)
+    if not latest_invoice_dt:
+        return {"error": "invalid latest invoice date format"}, 400
+    report_dt = parse_report_date(report_date)
+    if not report_dt:
+        return {"error": "invalid report_date format"}, 400
+    if report_dt < latest_invoice_dt:
+        return {"error": "report_date must be on or after last invoice date"}, 400
+
+    sell_report_exists = db.query(SellReport).filter(
+        SellReport.report_date == report_date
+    ).first()
+    if not sell_report_exists:
+        return {"error": "sell report not found for this date"}, 404
+
+    finance = db.query(SellFinance).filter(
+        SellFinance.report_date == report_date
+    ).first()
+
+    previous_sell_report = db.query(SellReport).filter(
+        SellReport.report_date < report_date
+    ).order_by(SellReport.report_date.desc()).first()
+    min_allowed_dt = parse_report_date(previous_sell_report.report_date) if previous_sell_report else report_dt
+    if not min_allowed_dt:
+        min_allowed_dt = report_dt
+        min_allowed_label = "selected sell report date"
+    else:
+        min_allowed_label = "previous sell report date" if previous_sell_report else "selected sell report date"
+
+    last_balance_amount = get_last_finance_balance(db, finance.id if finance else None)
+    total_sell_amount = get_total_sell_amount(db, report_date)
+
+    if not phonepay_entries and (upi_phonepay not in (None, "", 0, 0.0, "0", "0.0")):
+        phonepay_entries = [{"date": report_date, "amount": upi_phonepay}]
+    if not cash_entries and (cash not in (None, "", 0, 0.0, "0", "0.0")):
+        cash_entries = [{"date": report_date, "amount": cash}]
+
+    cleaned_phonepay_entries, phonepay_total, phonepay_err = normalize_money_entries(
+        phonepay_entries,
+        "phonepay",
+        min_allowed_dt,
+        min_allowed_label,
+        report_dt,
+        "selected sell report date",
+    )
+    if phonepay_err:
+        return phonepay_err, 400
+    cleaned_cash_entries, cash_total, cash_err = normalize_money_entries(
+        cash_entries,
+        "cash",
+        min_allowed_dt,
+        min_allowed_label,
+        report_dt,
+        "selected sell report date",
+    )
+    if cash_err:
+        return cash_err, 400
+
+    upi_phonepay = phonepay_total
+    cash = cash_total
+
+    total_amount = float(total_sell_amount) + float(last_balance_amount)
+    total_balance = float(upi_phonepay) + float(cash) - float(total_amount)
+
+    total_outside_income = 0.0
+    cleaned_outside_income = []
+    for inc in outside_income:
+        name = str(inc.get("name", "")).strip()
+        amount = inc.get("amount", 0)
+        if not name:
+            continue
+        try:
+            amount = float(amount or 0.0)
+        except Exception:
+            return {"error": "outside_income amount must be a number"}, 400
+        total_outside_income += amount
+        cleaned_outside_income.append({"name": name, "amount": amount})
+
+    total_expenses = 0.0
+    cleaned_expenses = []
+    for exp in expenses:
+        name = str(exp.get("name", "")).strip()
+        amount = exp.get("amount", 0)
+        if not name:
+            continue
+        try:
+            amount = float(amount or 0.0)
+        except Exception:
+            return {"error": "expense amount must be a number"}, 400
+        total_expenses += amount
+        cleaned_expenses.append({"name": name, "amount": amount})
+
+    final_balance = float(total_balance) + float(total_outside_income) - float(total_expenses)
+
+    if finance:
+        finance.total_sell_amount = total_sell_amount
+        finance.last_balance_amount = last_balance_amount
+        finance.total_amount = total_amount
+        finance.upi_phonepay = upi_phonepay
+        finance.cash = cash
+        finance.total_balance = total_balance
+        finance.total_outside_income = total_outside_income
+        finance.total_expenses = total_expenses
+        finance.final_balance = final_balance
+        finance.updated_by = request.user.get("username")
+
+        db.query(SellFinanceExpense).filter(
+            SellFinanceExpense.finance_id == finance.id
+        ).delete()
+        db.query(SellFinanceOutsideIncome).filter(
+            SellFinanceOutsideIncome.finance_id == finance.id
+        ).delete()
+        db.query(SellFinancePhonePay).filter(
+            SellFinancePhonePay.finance_id == finance.id
+        ).delete()
+        db.query(SellFinanceCash).filter(
+            SellFinanceCash.finance_id == finance.id
+        ).delete()
+    else:
+        finance = SellFinance(
+            report_date=report_date,
+            total_sell_amount=total_sell_amount,
+            last_balance_amount=last_balance_amount,
+            total_amount=total_amount,
+            upi_phonepay=upi_phonepay,
+            cash=cash,
+            total_balance=total_balance,
+            total_outside_income=total_outside_income,
+            total_expenses=total_expenses,
+            final_balance=final_balance,
+            created_by=request.user.get("username"),
+            updated_by=request.user.get("username")
         )
-        if cash_err:
-            return cash_err, 400
-
-        upi_phonepay = phonepay_total
-        cash = cash_total
-
-        total_amount = float(total_sell_amount) + float(last_balance_amount)
-        total_balance = float(upi_phonepay) + float(cash) - float(total_amount)
-
-        total_outside_income = 0.0
-        cleaned_outside_income = []
-        for inc in outside_income:
-            name = str(inc.get("name", "")).strip()
-            amount = inc.get("amount", 0)
-            if not name:
-                continue
-            try:
-                amount = float(amount or 0.0)
-            except Exception:
-                return {"error": "outside_income amount must be a number"}, 400
-            total_outside_income += amount
-            cleaned_outside_income.append({"name": name, "amount": amount})
-
-        total_expenses = 0.0
-        cleaned_expenses = []
-        for exp in expenses:
-            name = str(exp.get("name", "")).strip()
-            amount = exp.get("amount", 0)
-            if not name:
-                continue
-            try:
-                amount = float(amount or 0.0)
-            except Exception:
-                return {"error": "expense amount must be a number"}, 400
-            total_expenses += amount
-            cleaned_expenses.append({"name": name, "amount": amount})
-
-        final_balance = float(total_balance) + float(total_outside_income) - float(total_expenses)
-
-        if finance:
-            finance.total_sell_amount = total_sell_amount
-            finance.last_balance_amount = last_balance_amount
-            finance.total_amount = total_amount
-            finance.upi_phonepay = upi_phonepay
-            finance.cash = cash
-            finance.total_balance = total_balance
-            finance.total_outside_income = total_outside_income
-            finance.total_expenses = total_expenses
-            finance.final_balance = final_balance
-            finance.updated_by = request.user.get("username")
-
-            db.query(SellFinanceExpense).filter(
-                SellFinanceExpense.finance_id == finance.id
-            ).delete()
-            db.query(SellFinanceOutsideIncome).filter(
-                SellFinanceOutsideIncome.finance_id == finance.id
-            ).delete()
-            db.query(SellFinancePhonePay).filter(
-                SellFinancePhonePay.finance_id == finance.id
-            ).delete()
-            db.query(SellFinanceCash).filter(
-                SellFinanceCash.finance_id == finance.id
-            ).delete()
-        else:
-            finance = SellFinance(
-                report_date=report_date,
-                total_sell_amount=total_sell_amount,
-                last_balance_amount=last_balance_amount,
-                total_amount=total_amount,
-                upi_phonepay=upi_phonepay,
-                cash=cash,
-                total_balance=total_balance,
-                total_outside_income=total_outside_income,
-                total_expenses=total_expenses,
-                final_balance=final_balance,
-                created_by=request.user.get("username"),
-                updated_by=request.user.get("username")
-            )
-            db.add(finance)
-            db.flush()
-
-        for exp in cleaned_expenses:
-            db.add(SellFinanceExpense(
-                finance_id=finance.id,
-                name=exp["name"],
-                amount=exp["amount"]
-            ))
-        for inc in cleaned_outside_income:
-            db.add(SellFinanceOutsideIncome(
-                finance_id=finance.id,
-                name=inc["name"],
-                amount=inc["amount"]
-            ))
-        for entry in cleaned_phonepay_entries:
-            db.add(SellFinancePhonePay(
-                finance_id=finance.id,
-                txn_date=entry["date"],
-                amount=entry["amount"]
-            ))
-        for entry in cleaned_cash_entries:
-            db.add(SellFinanceCash(
-                finance_id=finance.id,
-                txn_date=entry["date"],
-                amount=entry["amount"]
-            ))
-
-        log_action(db, request.user, "create_sell_finance", "sell_finance", report_date)
-        db.commit()
-        return jsonify({
-            "status": "ok",
-            "report_date": report_date,
-            "total_sell_amount": total_sell_amount,
-            "last_balance_amount": last_balance_amount,
-            "total_amount": total_amount,
-            "upi_phonepay": upi_phonepay,
-            "cash": cash,
-            "total_balance": total_balance,
-            "total_outside_income": total_outside_income,
-            "total_expenses": total_expenses,
-            "final_balance": final_balance,
-            "phonepay_entries": cleaned_phonepay_entries,
-            "cash_entries": cleaned_cash_entries,
-            "outside_income": cleaned_outside_income,
-            "expenses": cleaned_expenses
-        })
-    finally:
-        db.close()
+        db.add(finance)
+        db.flush()
+
+    for exp in cleaned_expenses:
+        db.add(SellFinanceExpense(
+            finance_id=finance.id,
+            name=exp["name"],
+            amount=exp["amount"]
+        ))
+    for inc in cleaned_outside_income:
+        db.add(SellFinanceOutsideIncome(
+            finance_id=finance.id,
+            name=inc["name"],
+            amount=inc["amount"]
+        ))
+    for entry in cleaned_phonepay_entries:
+        db.add(SellFinancePhonePay(
+            finance_id=finance.id,
+            txn_date=entry["date"],
+            amount=entry["amount"]
+        ))
+    for entry in cleaned_cash_entries:
+        db.add(SellFinanceCash(
+            finance_id=finance.id,
+            txn_date=entry["date"],
+            amount=entry["amount"]
+        ))
+
+    log_action(db, request.user, "create_sell_finance", "sell_finance", report_date)
+    refresh_dashboard_snapshot(db, FINANCE)
+    db.commit()
+    return jsonify({
+        "status": "ok",
+        "report_date": report_date,
+        "total_sell_amount": total_sell_amount,
+        "last_balance_amount": last_balance_amount,
+        "total_amount": total_amount,
+        "upi_phonepay": upi_phonepay,
+        "cash": cash,
+        "total_balance": total_balance,
+        "total_outside_income": total_outside_income,
+        "total_expenses": total_expenses,
+        "final_balance": final_balance,
+        "phonepay_entries": cleaned_phonepay_entries,
+        "cash_entries": cleaned_cash_entries,
+        "outside_income": cleaned_outside_income,
+        "expenses": cleaned_expenses
+    })
 
 
 @sell_finance_bp.route("/seller/sell-finance/prepare", methods=["GET"])
@@ -248,130 +249,114 @@ def prepare_sell_finance():
     if not report_date:
         return {"error": "report_date is required"}, 400
 
-    db = SessionLocal()
-    try:
-        SellFinancePhonePay.__table__.create(bind=db.get_bind(), checkfirst=True)
-        SellFinanceCash.__table__.create(bind=db.get_bind(), checkfirst=True)
-        SellFinanceOutsideIncome.__table__.create(bind=db.get_bind(), checkfirst=True)
-
-        latest_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
-        latest_invoice_date = latest_invoice.invoice_date if latest_invoice else ""
-        report_dt = parse_report_date(report_date)
-        if not report_dt:
-            return {"error": "invalid report_date format"}, 400
-        sell_report_exists = db.query(SellReport).filter(
-            SellReport.report_date == report_date
-        ).first()
-        if not sell_report_exists:
-            return {"error": "sell report not found for this date"}, 404
-        previous_sell_report = db.query(SellReport).filter(
-            SellReport.report_date < report_date
-        ).order_by(SellReport.report_date.desc()).first()
-        min_allowed_date = previous_sell_report.report_date if previous_sell_report else report_date
-
-        finance = db.query(SellFinance).filter(
-            SellFinance.report_date == report_date
-        ).first()
-        phonepay_entries = []
-        cash_entries = []
-        if finance:
-            phonepay_rows = db.query(SellFinancePhonePay).filter(
-                SellFinancePhonePay.finance_id == finance.id
-            ).all()
-            phonepay_entries = [
-                {"date": r.txn_date, "amount": float(r.amount or 0.0)}
-                for r in phonepay_rows
-            ]
-            cash_rows = db.query(SellFinanceCash).filter(
-                SellFinanceCash.finance_id == finance.id
-            ).all()
-            cash_entries = [
-                {"date": r.txn_date, "amount": float(r.amount or 0.0)}
-                for r in cash_rows
-            ]
-            if not phonepay_entries and float(finance.upi_phonepay or 0.0) != 0.0:
-                phonepay_entries = [{"date": report_date, "amount": float(finance.upi_phonepay or 0.0)}]
-            if not cash_entries and float(finance.cash or 0.0) != 0.0:
-                cash_entries = [{"date": report_date, "amount": float(finance.cash or 0.0)}]
-
-        expenses = []
-        outside_income = []
-        if finance:
-            expense_rows = db.query(SellFinanceExpense).filter(
-                SellFinanceExpense.finance_id == finance.id
-            ).all()
-            expenses = [
-                {"name": r.name, "amount": float(r.amount or 0.0)}
-                for r in expense_rows
-            ]
-            outside_income_rows = db.query(SellFinanceOutsideIncome).filter(
-                SellFinanceOutsideIncome.finance_id == finance.id
-            ).all()
-            outside_income = [
-                {"name": r.name, "amount": float(r.amount or 0.0)}
-                for r in outside_income_rows
-            ]
-
-        last_balance_amount = get_last_finance_balance(db, finance.id if finance else None)
-        total_sell_amount = get_total_sell_amount(db, report_date)
-        total_amount = float(total_sell_amount) + float(last_balance_amount)
-
-        return jsonify({
-            "report_date": report_date,
-            "total_sell_amount": total_sell_amount,
-            "last_balance_amount": last_balance_amount,
-            "total_amount": total_amount,
-            "existing_finance": bool(finance),
-            "upi_phonepay": float(finance.upi_phonepay or 0.0) if finance else 0.0,
-            "cash": float(finance.cash or 0.0) if finance else 0.0,
-            "total_balance": float(finance.total_balance or 0.0) if finance else 0.0,
-            "total_outside_income": float(finance.total_outside_income or 0.0) if finance else 0.0,
-            "total_expenses": float(finance.total_expenses or 0.0) if finance else 0.0,
-            "final_balance": float(finance.final_balance or 0.0) if finance else 0.0,
-            "phonepay_entries": phonepay_entries,
-            "cash_entries": cash_entries,
-            "outside_income": outside_income,
-            "expenses": expenses,
-            "latest_invoice_date": latest_invoice_date,
-            "allowed_entry_date_from": min_allowed_date,
-            "allowed_entry_date_to": report_date
-        })
-    finally:
-        db.close()
-
-
-@sell_finance_bp.route("/seller/sell-finance/overview", methods=["GET"])
-@auth_required()
-def sell_finance_overview():
-    db = SessionLocal()
-    try:
-        latest_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
-        latest_invoice_totals = None
-        if latest_invoice and latest_invoice.invoice_number:
-            latest_invoice_totals = db.query(InvoiceTotals).filter(
-                InvoiceTotals.invoice_number == latest_invoice.invoice_number
-            ).first()
-        total_invoice_value_all = float(db.query(
-            func.coalesce(func.sum(InvoiceTotals.total_invoice_value), 0.0)
-        ).scalar() or 0.0)
-        total_net_invoice_value_all = float(db.query(
-            func.coalesce(func.sum(InvoiceTotals.net_invoice_value), 0.0)
-        ).scalar() or 0.0)
-        total_special_excise_cess_all = float(db.query(
-            func.coalesce(func.sum(InvoiceTotals.special_excise_cess), 0.0)
-        ).scalar() or 0.0)
-        total_tcs_all = float(db.query(
-            func.coalesce(func.sum(InvoiceTotals.tcs), 0.0)
-        ).scalar() or 0.0)
-        total_new_retailer_professional_tax_all = float(db.query(
-            func.coalesce(func.sum(InvoiceTotals.new_retailer_professional_tax), 0.0)
-        ).scalar() or 0.0)
-        total_retail_shop_excise_turnover_tax_all = float(db.query(
-            func.coalesce(func.sum(InvoiceTotals.retail_shop_excise_turnover_tax), 0.0)
-        ).scalar() or 0.0)
-
-        invoice_rows = db.query(Invoice).order_by(Invoice.id.desc()).all()
-        invoice_numbers = [i.invoice_number for i in invoice_rows if i.invoice_number]
+    db = get_db()
+    latest_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
+    latest_invoice_date = latest_invoice.invoice_date if latest_invoice else ""
+    report_dt = parse_report_date(report_date)
+    if not report_dt:
+        return {"error": "invalid report_date format"}, 400
+    sell_report_exists = db.query(SellReport).filter(
+        SellReport.report_date == report_date
+    ).first()
+    if not sell_report_exists:
+        return {"error": "sell report not found for this date"}, 404
+    previous_sell_report = db.query(SellReport).filter(
+        SellReport.report_date < report_date
+    ).order_by(SellReport.report_date.desc()).first()
+    min_allowed_date = previous_sell_report.report_date if previous_sell_report else report_date
+
+    finance = db.query(SellFinance).filter(
+        SellFinance.report_date == report_date
+    ).first()
+    phonepay_entries = []
+    cash_entries = []
+    if finance:
+        phonepay_rows = db.query(SellFinancePhonePay).filter(
+            SellFinancePhonePay.finance_id == finance.id
+        ).all()
+        phonepay_entries = [
+            {"date": r.txn_date, "amount": float(r.amount or 0.0)}
+            for r in phonepay_rows
+        ]
+        cash_rows = db.query(SellFinanceCash).filter(
+            SellFinanceCash.finance_id == finance.id
+        ).all()
+        cash_entries = [
+            {"date": r.txn_date, "amount": float(r.amount or 0.0)}
+            for r in cash_rows
+        ]
+        if not phonepay_entries and float(finance.upi_phonepay or 0.0) != 0.0:
+            phonepay_entries = [{"date": report_date, "amount": float(finance.upi_phonepay or 0.0)}]
+        if not cash_entries and float(finance.cash or 0.0) != 0.0:
+            cash_entries = [{"date": report_date, "amount": float(finance.cash or 0.0)}]
+
+    expenses = []
+    outside_income = []
+    if finance:
+        expense_rows = db.query(SellFinanceExpense).filter(
+            SellFinanceExpense.finance_id == finance.id
+        ).all()
+        expenses = [
+            {"name": r.name, "amount": float(r.amount or 0.0)}
+            for r in expense_rows
+        ]
+        outside_income_rows = db.query(SellFinanceOutsideIncome).filter(
+            SellFinanceOutsideIncome.finance_id == finance.id
+        ).all()
+        outside_income = [
+            {"name": r.name, "amount": float(r.amount or 0.0)}
+            for r in outside_income_rows
+        ]
+
+    last_balance_amount = get_last_finance_balance(db, finance.id if finance else None)
+    total_sell_amount = get_total_sell_amount(db, report_date)
+    total_amount = float(total_sell_amount) + float(last_balance_amount)
+
+    return jsonify({
+        "report_date": report_date,
+        "total_sell_amount": total_sell_amount,
+        "last_balance_amount": last_balance_amount,
+        "total_amount": total_amount,
+        "existing_finance": bool(finance),
+        "upi_phonepay": float(finance.upi_phonepay or 0.0) if finance else 0.0,
+        "cash": float(finance.cash or 0.0) if finance else 0.0,
+        "total_balance": float(finance.total_balance or 0.0) if finance else 0.0,
+        "total_outside_income": float(finance.total_outside_income or 0.0) if finance else 0.0,
+        "total_expenses": float(finance.total_expenses or 0.0) if finance else 0.0,
+        "final_balance": float(finance.final_balance or 0.0) if finance else 0.0,
+        "phonepay_entries": phonepay_entries,
+        "cash_entries": cash_entries,
+        "outside_income": outside_income,
+        "expenses": expenses,
+        "latest_invoice_date": latest_invoice_date,
+        "allowed_entry_date_from": min_allowed_date,
+        "allowed_entry_date_to": report_date
+    })
+
+
+OVERVIEW_SECTIONS = ("invoices", "sell_reports", "finance")
+
+
+def _overview_invoice_row(inv, tot):
+    return {
+        "invoice_number": inv.invoice_number,
+        "invoice_date": inv.invoice_date,
+        "uploaded_by": inv.uploaded_by or "",
+        "uploaded_at": inv.uploaded_at.isoformat() if inv.uploaded_at else "",
+        "net_invoice_value": float(tot.net_invoice_value or 0.0) if tot else 0.0,
+        "special_excise_cess": float(tot.special_excise_cess or 0.0) if tot else 0.0,
+        "tcs": float(tot.tcs or 0.0) if tot else 0.0,
+        "new_retailer_professional_tax": float(tot.new_retailer_professional_tax or 0.0) if tot else 0.0,
+        "retail_shop_excise_turnover_tax": float(tot.retail_shop_excise_turnover_tax or 0.0) if tot else 0.0,
+        "total_invoice_value": float(tot.total_invoice_value or 0.0) if tot else 0.0,
+        "retailer_credit_balance": float(tot.retailer_credit_balance or 0.0) if tot else 0.0
+    }
+
+
+def _overview_invoice_rows(db, invoices):
+    """Invoice rows with their totals, looked up one chunk of invoices at a time."""
+    for chunk in iter_chunks(invoices, STREAM_BATCH_SIZE):
+        invoice_numbers = [i.invoice_number for i in chunk if i.invoice_number]
         totals_map = {}
         if invoice_numbers:
             totals_rows = db.query(InvoiceTotals).filter(
@@ -379,86 +364,62 @@ def sell_finance_overview():
             ).all()
             for t in totals_rows:
                 totals_map[t.invoice_number] = t
+        for inv in chunk:
+            yield _overview_invoice_row(inv, totals_map.get(inv.invoice_number))
 
-        invoices_payload = []
-        for inv in invoice_rows:
-            tot = totals_map.get(inv.invoice_number)
-            invoices_payload.append({
-                "invoice_number": inv.invoice_number,
-                "invoice_date": inv.invoice_date,
-                "uploaded_by": inv.uploaded_by or "",
-                "uploaded_at": inv.uploaded_at.isoformat() if inv.uploaded_at else "",
-                "net_invoice_value": float(tot.net_invoice_value or 0.0) if tot else 0.0,
-                "special_excise_cess": float(tot.special_excise_cess or 0.0) if tot else 0.0,
-                "tcs": float(tot.tcs or 0.0) if tot else 0.0,
-                "new_retailer_professional_tax": float(tot.new_retailer_professional_tax or 0.0) if tot else 0.0,
-                "retail_shop_excise_turnover_tax": float(tot.retail_shop_excise_turnover_tax or 0.0) if tot else 0.0,
-                "total_invoice_value": float(tot.total_invoice_value or 0.0) if tot else 0.0,
-                "retailer_credit_balance": float(tot.retailer_credit_balance or 0.0) if tot else 0.0
-            })
 
-        latest_sell_report = db.query(SellReport).order_by(SellReport.created_at.desc()).first()
-        total_sell_amount_all = float(db.query(
-            func.coalesce(func.sum(SellReport.sell_amount), 0.0)
-        ).scalar() or 0.0)
-        latest_sell_report_total = 0.0
-        if latest_sell_report and latest_sell_report.report_date:
-            latest_sell_report_total = float(db.query(
-                func.coalesce(func.sum(SellReport.sell_amount), 0.0)
-            ).filter(
-                SellReport.report_date == latest_sell_report.report_date
-            ).scalar() or 0.0)
-        sell_report_rows = db.query(
-            SellReport.report_date,
-            func.count(SellReport.id),
-            func.coalesce(func.sum(SellReport.sell_amount), 0.0),
-            func.max(SellReport.created_at),
-        ).group_by(SellReport.report_date).order_by(func.max(SellReport.created_at).desc()).all()
-
-        finance_rows = db.query(SellFinance).order_by(SellFinance.created_at.desc()).all()
-        finance_ids = [f.id for f in finance_rows]
+def _overview_sell_report_row(r):
+    return {
+        "report_date": r.report_date,
+        "total_items": int(r.total_items or 0),
+        "total_sell_amount": float(r.total_sell_amount or 0.0),
+        "last_created_at": stored_datetime_iso(r.last_created_at)
+    }
+
 
+def _overview_finance_rows(db, finance_rows):
+    """Finance rows with their entry lists, loaded one chunk of finance ids at a time."""
+    for chunk in iter_chunks(finance_rows, STREAM_BATCH_SIZE):
+        finance_ids = [f.id for f in chunk]
         expenses_map = {}
         outside_income_map = {}
         phonepay_map = {}
         cash_map = {}
-        if finance_ids:
-            exp_rows = db.query(SellFinanceExpense).filter(
-                SellFinanceExpense.finance_id.in_(finance_ids)
-            ).all()
-            out_rows = db.query(SellFinanceOutsideIncome).filter(
-                SellFinanceOutsideIncome.finance_id.in_(finance_ids)
-            ).all()
-            pp_rows = db.query(SellFinancePhonePay).filter(
-                SellFinancePhonePay.finance_id.in_(finance_ids)
-            ).all()
-            cash_rows = db.query(SellFinanceCash).filter(
-                SellFinanceCash.finance_id.in_(finance_ids)
-            ).all()
+        exp_rows = db.query(SellFinanceExpense).filter(
+            SellFinanceExpense.finance_id.in_(finance_ids)
+        ).all()
+        out_rows = db.query(SellFinanceOutsideIncome).filter(
+            SellFinanceOutsideIncome.finance_id.in_(finance_ids)
+        ).all()
+        pp_rows = db.query(SellFinancePhonePay).filter(
+            SellFinancePhonePay.finance_id.in_(finance_ids)
+        ).all()
+        cash_rows = db.query(SellFinanceCash).filter(
+            SellFinanceCash.finance_id.in_(finance_ids)
+        ).all()
+
+        for r in exp_rows:
+            expenses_map.setdefault(r.finance_id, []).append({
+                "name": r.name,
+                "amount": float(r.amount or 0.0)
+            })
+        for r in out_rows:
+            outside_income_map.setdefault(r.finance_id, []).append({
+                "name": r.name,
+                "amount": float(r.amount or 0.0)
+            })
+        for r in pp_rows:
+            phonepay_map.setdefault(r.finance_id, []).append({
+                "date": r.txn_date,
+                "amount": float(r.amount or 0.0)
+            })
+        for r in cash_rows:
+            cash_map.setdefault(r.finance_id, []).append({
+                "date": r.txn_date,
+                "amount": float(r.amount or 0.0)
+            })
 
-            for r in exp_rows:
-                expenses_map.setdefault(r.finance_id, []).append({
-                    "name": r.name,
-                    "amount": float(r.amount or 0.0)
-                })
-            for r in out_rows:
-                outside_income_map.setdefault(r.finance_id, []).append({
-                    "name": r.name,
-                    "amount": float(r.amount or 0.0)
-                })
-            for r in pp_rows:
-                phonepay_map.setdefault(r.finance_id, []).append({
-                    "date": r.txn_date,
-                    "amount": float(r.amount or 0.0)
-                })
-            for r in cash_rows:
-                cash_map.setdefault(r.finance_id, []).append({
-                    "date": r.txn_date,
-                    "amount": float(r.amount or 0.0)
-                })
-
-        finance_payload = []
-        for f in finance_rows:
+        for f in chunk:
             phonepay_entries = phonepay_map.get(f.id, [])
             cash_entries = cash_map.get(f.id, [])
             if not phonepay_entries and float(f.upi_phonepay or 0.0) != 0.0:
@@ -466,7 +427,7 @@ def sell_finance_overview():
             if not cash_entries and float(f.cash or 0.0) != 0.0:
                 cash_entries = [{"date": f.report_date, "amount": float(f.cash or 0.0)}]
 
-            finance_payload.append({
+            yield {
                 "report_date": f.report_date,
                 "total_sell_amount": float(f.total_sell_amount or 0.0),
                 "last_balance_amount": float(f.last_balance_amount or 0.0),
@@ -485,49 +446,135 @@ def sell_finance_overview():
                 "cash_entries": cash_entries,
                 "outside_income": outside_income_map.get(f.id, []),
                 "expenses": expenses_map.get(f.id, []),
-            })
+            }
+
+
+def _overview_sell_report_rows(batches):
+    for r in batches:
+        yield _overview_sell_report_row(r)
+
+
+def _overview_page(db, section, limit, cursor):
+    if section == "invoices":
+        q = db.query(Invoice).order_by(Invoice.id.desc())
+        if cursor:
+            q = q.filter(Invoice.id < cursor[0])
+        page, next_cursor = split_page(q.limit(limit + 1).all(), limit, lambda r: (r.id,))
+        items = list(_overview_invoice_rows(db, page))
+    elif section == "sell_reports":
+        q = sell_report_batches_query(db)
+        if cursor:
+            q = sell_report_batches_after(q, *cursor)
+        page, next_cursor = split_page(
+            q.limit(limit + 1).all(), limit, lambda r: (r.last_created_at, r.report_date)
+        )
+        items = [_overview_sell_report_row(r) for r in page]
+    else:
+        created_at_raw = type_coerce(SellFinance.created_at, String)
+        q = db.query(SellFinance, created_at_raw.label("created_at_raw")).order_by(
+            SellFinance.created_at.desc(), SellFinance.id.desc()
+        )
+        if cursor:
+            q = q.filter(or_(
+                created_at_raw < cursor[0],
+                and_(created_at_raw == cursor[0], SellFinance.id < cursor[1]),
+            ))
+        page, next_cursor = split_page(
+            q.limit(limit + 1).all(), limit, lambda r: (r.created_at_raw, r.SellFinance.id)
+        )
+        items = list(_overview_finance_rows(db, [r.SellFinance for r in page]))
+    return jsonify({"section": section, "items": items, "next_cursor": next_cursor})
+
 
-        return jsonify({
-            "totals": {
-                "all_invoices_total_invoice_value": total_invoice_value_all,
-                "all_invoices_net_invoice_value": total_net_invoice_value_all,
-                "all_invoices_special_excise_cess": total_special_excise_cess_all,
-                "all_invoices_tcs": total_tcs_all,
-                "all_invoices_new_retailer_professional_tax": total_new_retailer_professional_tax_all,
-                "all_invoices_retail_shop_excise_turnover_tax": total_retail_shop_excise_turnover_tax_all,
-                "all_sell_amount": total_sell_amount_all
-            },
-            "latest_invoice": {
-                "invoice_number": latest_invoice.invoice_number if latest_invoice else "",
-                "invoice_date": latest_invoice.invoice_date if latest_invoice else "",
-                "uploaded_by": latest_invoice.uploaded_by if latest_invoice else "",
-                "uploaded_at": latest_invoice.uploaded_at.isoformat() if latest_invoice and latest_invoice.uploaded_at else "",
-                "net_invoice_value": float(latest_invoice_totals.net_invoice_value or 0.0) if latest_invoice_totals else 0.0,
-                "special_excise_cess": float(latest_invoice_totals.special_excise_cess or 0.0) if latest_invoice_totals else 0.0,
-                "tcs": float(latest_invoice_totals.tcs or 0.0) if latest_invoice_totals else 0.0,
-                "new_retailer_professional_tax": float(latest_invoice_totals.new_retailer_professional_tax or 0.0) if latest_invoice_totals else 0.0,
-                "retail_shop_excise_turnover_tax": float(latest_invoice_totals.retail_shop_excise_turnover_tax or 0.0) if latest_invoice_totals else 0.0,
-                "total_invoice_value": total_invoice_value_all,
-                "retailer_credit_balance": float(latest_invoice_totals.retailer_credit_balance or 0.0) if latest_invoice_totals else 0.0
-            },
-            "invoices": invoices_payload,
-            "latest_sell_report": {
-                "report_date": latest_sell_report.report_date if latest_sell_report else "",
-                "created_by": latest_sell_report.created_by if latest_sell_report else "",
-                "created_at": latest_sell_report.created_at.isoformat() if latest_sell_report and latest_sell_report.created_at else "",
-                "sell_amount": total_sell_amount_all if latest_sell_report else 0.0,
-                "latest_report_sell_amount": latest_sell_report_total if latest_sell_report else 0.0
-            },
-            "sell_reports": [
-                {
-                    "report_date": r[0],
-                    "total_items": int(r[1] or 0),
-                    "total_sell_amount": float(r[2] or 0.0),
-                    "last_created_at": r[3].isoformat() if r[3] else None
-                }
-                for r in sell_report_rows
-            ],
-            "finance": finance_payload
-        })
-    finally:
-        db.close()
+@sell_finance_bp.route("/seller/sell-finance/overview", methods=["GET"])
+@auth_required()
+@read_only_db
+def sell_finance_overview():
+    db = get_db()
+    section = request.args.get("section")
+    try:
+        limit, cursor = get_page_args(request.args, cursor_size=1 if section == "invoices" else 2)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    if limit is not None:
+        if section not in OVERVIEW_SECTIONS:
+            return {"error": f"section must be one of {', '.join(OVERVIEW_SECTIONS)}"}, 400
+        return _overview_page(db, section, limit, cursor)
+
+    latest_invoice = db.query(Invoice).order_by(Invoice.id.desc()).first()
+    latest_invoice_totals = None
+    if latest_invoice and latest_invoice.invoice_number:
+        latest_invoice_totals = db.query(InvoiceTotals).filter(
+            InvoiceTotals.invoice_number == latest_invoice.invoice_number
+        ).first()
+    total_invoice_value_all = float(db.query(
+        func.coalesce(func.sum(InvoiceTotals.total_invoice_value), 0.0)
+    ).scalar() or 0.0)
+    total_net_invoice_value_all = float(db.query(
+        func.coalesce(func.sum(InvoiceTotals.net_invoice_value), 0.0)
+    ).scalar() or 0.0)
+    total_special_excise_cess_all = float(db.query(
+        func.coalesce(func.sum(InvoiceTotals.special_excise_cess), 0.0)
+    ).scalar() or 0.0)
+    total_tcs_all = float(db.query(
+        func.coalesce(func.sum(InvoiceTotals.tcs), 0.0)
+    ).scalar() or 0.0)
+    total_new_retailer_professional_tax_all = float(db.query(
+        func.coalesce(func.sum(InvoiceTotals.new_retailer_professional_tax), 0.0)
+    ).scalar() or 0.0)
+    total_retail_shop_excise_turnover_tax_all = float(db.query(
+        func.coalesce(func.sum(InvoiceTotals.retail_shop_excise_turnover_tax), 0.0)
+    ).scalar() or 0.0)
+
+    invoice_rows = db.query(Invoice).order_by(Invoice.id.desc()).yield_per(STREAM_BATCH_SIZE)
+
+    latest_sell_report = db.query(SellReport).order_by(SellReport.created_at.desc()).first()
+    total_sell_amount_all = float(db.query(
+        func.coalesce(func.sum(SellReport.sell_amount), 0.0)
+    ).scalar() or 0.0)
+    latest_sell_report_total = 0.0
+    if latest_sell_report and latest_sell_report.report_date:
+        latest_sell_report_total = float(db.query(
+            func.coalesce(func.sum(SellReport.sell_amount), 0.0)
+        ).filter(
+            SellReport.report_date == latest_sell_report.report_date
+        ).scalar() or 0.0)
+    sell_report_rows = sell_report_batches_query(db).yield_per(STREAM_BATCH_SIZE)
+    finance_rows = db.query(SellFinance).order_by(
+        SellFinance.created_at.desc(), SellFinance.id.desc()
+    ).yield_per(STREAM_BATCH_SIZE)
+
+    return json_stream_response({
+        "totals": {
+            "all_invoices_total_invoice_value": total_invoice_value_all,
+            "all_invoices_net_invoice_value": total_net_invoice_value_all,
+            "all_invoices_special_excise_cess": total_special_excise_cess_all,
+            "all_invoices_tcs": total_tcs_all,
+            "all_invoices_new_retailer_professional_tax": total_new_retailer_professional_tax_all,
+            "all_invoices_retail_shop_excise_turnover_tax": total_retail_shop_excise_turnover_tax_all,
+            "all_sell_amount": total_sell_amount_all
+        },
+        "latest_invoice": {
+            "invoice_number": latest_invoice.invoice_number if latest_invoice else "",
+            "invoice_date": latest_invoice.invoice_date if latest_invoice else "",
+            "uploaded_by": latest_invoice.uploaded_by if latest_invoice else "",
+            "uploaded_at": latest_invoice.uploaded_at.isoformat() if latest_invoice and latest_invoice.uploaded_at else "",
+            "net_invoice_value": float(latest_invoice_totals.net_invoice_value or 0.0) if latest_invoice_totals else 0.0,
+            "special_excise_cess": float(latest_invoice_totals.special_excise_cess or 0.0) if latest_invoice_totals else 0.0,
+            "tcs": float(latest_invoice_totals.tcs or 0.0) if latest_invoice_totals else 0.0,
+            "new_retailer_professional_tax": float(latest_invoice_totals.new_retailer_professional_tax or 0.0) if latest_invoice_totals else 0.0,
+            "retail_shop_excise_turnover_tax": float(latest_invoice_totals.retail_shop_excise_turnover_tax or 0.0) if latest_invoice_totals else 0.0,
+            "total_invoice_value": total_invoice_value_all,
+            "retailer_credit_balance": float(latest_invoice_totals.retailer_credit_balance or 0.0) if latest_invoice_totals else 0.0
+        },
+        "invoices": _overview_invoice_rows(db, invoice_rows),
+        "latest_sell_report": {
+            "report_date": latest_sell_report.report_date if latest_sell_report else "",
+            "created_by": latest_sell_report.created_by if latest_sell_report else "",
+            "created_at": latest_sell_report.created_at.isoformat() if latest_sell_report and latest_sell_report.created_at else "",
+            "sell_amount": total_sell_amount_all if latest_sell_report else 0.0,
+            "latest_report_sell_amount": latest_sell_report_total if latest_sell_report else 0.0
+        },
+        "sell_reports": _overview_sell_report_rows(sell_report_rows),
+        "finance": _overview_finance_rows(db, finance_rows)
+    })
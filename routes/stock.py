@@ -1,44 +1,110 @@
-from flask import Blueprint, jsonify
-from database import SessionLocal
+from flask import Blueprint, jsonify, request
+from database import get_db
 from models import PresentStockDetail, StockSummary
 from auth import auth_required
+from config import STREAM_BATCH_SIZE
+from services.json_stream import json_stream_response
+from services.pagination import get_page_args, split_page
+from services.sales_utils import parse_report_date
+from services.stock_ledger import stock_as_of
 
 stock_bp = Blueprint("stock", __name__)
 
 @stock_bp.route("/stock", methods=["GET"])
 @auth_required()
 def get_stock():
-    db = SessionLocal()
+    db = get_db()
+    if request.args.get("as_of"):
+        return _stock_as_of(db, request.args.get("as_of"))
     try:
-        rows = db.query(PresentStockDetail).all()
-        summary = db.query(StockSummary).first()
-        stock = []
-        for r in rows:
-            stock.append({
-                "id": r.id,
-                "brand_number": r.brand_number,
-                "brand_name": r.brand_name,
-                "product_type": r.product_type,
-                "pack_type": r.pack_type,
-                "pack_size_case": r.pack_size_case,
-                "pack_size_quantity_ml": r.pack_size_quantity_ml,
-                "total_cases": r.total_cases,
-                "total_bottles": r.total_bottles,
-                "rate_per_case": r.rate_per_case,
-                "unit_rate_per_bottle": r.unit_rate_per_bottle,
-                "total_amount": r.total_amount,
-                "last_invoice_date": r.last_invoice_date,
-                "last_updated_item_name": r.last_updated_item_name,
-                "updated_at": r.updated_at.isoformat() if r.updated_at else None
-            })
-        summary_payload = None
-        if summary:
-            summary_payload = {
-                "total_cases_all_items": summary.total_cases_all_items,
-                "total_price_all_items": summary.total_price_all_items,
-                "last_updated_item_name": summary.last_updated_item_name,
-                "updated_at": summary.updated_at.isoformat() if summary.updated_at else None
-            }
-        return jsonify({"stock": stock, "summary": summary_payload})
-    finally:
-        db.close()
+        limit, cursor = get_page_args(request.args)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+    summary = db.query(StockSummary).first()
+    summary_payload = None
+    if summary:
+        summary_payload = {
+            "total_cases_all_items": summary.total_cases_all_items,
+            "total_price_all_items": summary.total_price_all_items,
+            "last_updated_item_name": summary.last_updated_item_name,
+            "updated_at": summary.updated_at.isoformat() if summary.updated_at else None
+        }
+    q = db.query(PresentStockDetail).order_by(PresentStockDetail.id.asc())
+    if limit is None:
+        stock = (_stock_row(r) for r in q.yield_per(STREAM_BATCH_SIZE))
+        return json_stream_response({"stock": stock, "summary": summary_payload})
+    if cursor:
+        q = q.filter(PresentStockDetail.id > cursor[0])
+    page, next_cursor = split_page(q.limit(limit + 1).all(), limit, lambda r: (r.id,))
+    return jsonify({
+        "stock": [_stock_row(r) for r in page],
+        "summary": summary_payload,
+        "next_cursor": next_cursor
+    })
+
+def _stock_as_of(db, raw_date):
+    as_of = parse_report_date(raw_date)
+    if as_of is None:
+        return {"error": "as_of must be a date (YYYY-MM-DD)"}, 400
+    try:
+        totals, snapshot_date = stock_as_of(db, as_of)
+    except ValueError as e:
+        return {"error": str(e)}, 400
+
+    # Names and current ids come from present stock; SKUs that no longer
+    # have a stock row are listed after the rest.
+    present = {}
+    for r in db.query(
+        PresentStockDetail.id,
+        PresentStockDetail.brand_number,
+        PresentStockDetail.brand_name,
+        PresentStockDetail.pack_size_case,
+        PresentStockDetail.pack_size_quantity_ml,
+    ).order_by(PresentStockDetail.id.asc()):
+        present.setdefault((r.brand_number, r.pack_size_case, r.pack_size_quantity_ml), r)
+    order = {sku: i for i, sku in enumerate(present)}
+
+    rows = []
+    for sku in sorted(totals, key=lambda k: (order.get(k, len(order)), tuple(str(v) for v in k))):
+        cases, bottles, amount = totals[sku]
+        if not (cases or bottles or amount) and sku not in present:
+            continue
+        current = present.get(sku)
+        rows.append({
+            "id": current.id if current else None,
+            "brand_number": sku[0],
+            "brand_name": current.brand_name if current else None,
+            "pack_size_case": sku[1],
+            "pack_size_quantity_ml": sku[2],
+            "total_cases": cases,
+            "total_bottles": bottles,
+            "total_amount": amount,
+        })
+    return jsonify({
+        "as_of": as_of.isoformat(),
+        "snapshot_date": snapshot_date.isoformat() if snapshot_date else None,
+        "stock": rows,
+        "summary": {
+            "total_cases_all_items": sum(r["total_cases"] for r in rows),
+            "total_price_all_items": sum(r["total_amount"] for r in rows),
+        },
+    })
+
+def _stock_row(r):
+    return {
+        "id": r.id,
+        "brand_number": r.brand_number,
+        "brand_name": r.brand_name,
+        "product_type": r.product_type,
+        "pack_type": r.pack_type,
+        "pack_size_case": r.pack_size_case,
+        "pack_size_quantity_ml": r.pack_size_quantity_ml,
+        "total_cases": r.total_cases,
+        "total_bottles": r.total_bottles,
+        "rate_per_case": r.rate_per_case,
+        "unit_rate_per_bottle": r.unit_rate_per_bottle,
+        "total_amount": r.total_amount,
+        "last_invoice_date": r.last_invoice_date,
+        "last_updated_item_name": r.last_updated_item_name,
+        "updated_at": r.updated_at.isoformat() if r.updated_at else None
+    }
@@ -1,17 +1,29 @@
 from flask import Blueprint, request, jsonify
 from werkzeug.utils import secure_filename
 import os
-from datetime import datetime
-from database import SessionLocal
-from models import Invoice, InvoiceItem, InvoiceTotals, PresentStockDetail, StockSummary, PriceListItem
-from pdf_parser import parse_invoice_pdf
-from config import INVOICES_FOLDER
+import uuid
+from database import get_db
+from models import Invoice, UploadJob
+from config import INVOICES_FOLDER, EXPECTED_RETAILER_CODE
 from services.files import save_invoice_file
 from auth import auth_required
 from services.audit import log_action
+from services.dashboard import INVOICE, STOCK, refresh_dashboard_snapshot
+from services.invoice_upload import (
+    invoice_sort_key,
+    parse_invoices_parallel,
+    retailer_code_matches,
+    store_invoice,
+)
+from services.parse_cache import parse_invoice_cached
+from services.sql_metrics import count_statements
+from services.upload_jobs import submit_upload_job, upload_job_payload
 
 upload_bp = Blueprint("upload", __name__)
 
+RETAILER_MISMATCH_ERROR = f"Retailer code mismatch. Expected {EXPECTED_RETAILER_CODE}."
+
+
 @upload_bp.route("/upload/preview", methods=["POST"])
 @auth_required()
 def upload_preview():
@@ -26,20 +38,16 @@ def upload_preview():
     file.save(temp_path)
 
     try:
-        data = parse_invoice_pdf(temp_path)
-        retailer_code = str(data.get("retailer", {}).get("code", "")).strip()
-        if retailer_code != "2500552":
-            return {"error": "Retailer code mismatch. Expected 2500552."}, 400
+        data, parse_timings, _ = parse_invoice_cached(temp_path)
+        if not retailer_code_matches(data):
+            return {"error": RETAILER_MISMATCH_ERROR}, 400
         invoice_number = data.get("invoice_meta", {}).get("invoice_number", "")
         if invoice_number:
-            db = SessionLocal()
-            try:
-                exists = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
-                if exists:
-                    return {"error": f"Invoice already exists: {invoice_number}"}, 409
-            finally:
-                db.close()
-        return jsonify({"preview": data})
+            db = get_db()
+            exists = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
+            if exists:
+                return {"error": f"Invoice already exists: {invoice_number}"}, 409
+        return jsonify({"preview": data, "parse_timings": parse_timings})
     finally:
         try:
             os.remove(temp_path)
@@ -54,132 +62,166 @@ def upload_pdf():
 
     file = request.files["file"]
     filename = secure_filename(file.filename)
+
+    if str(request.args.get("async", "")).strip().lower() in ("1", "true", "yes"):
+        job_id = submit_upload_job(file, filename, request.user)
+        return jsonify({
+            "job_id": job_id,
+            "status": "queued",
+            "status_url": f"/upload/jobs/{job_id}"
+        }), 202
+
     path = os.path.join(INVOICES_FOLDER, filename)
     file.save(path)
 
-    data = parse_invoice_pdf(path)
-    retailer_code = str(data.get("retailer", {}).get("code", "")).strip()
-    if retailer_code != "2500552":
+    data, parse_timings, _ = parse_invoice_cached(path)
+    if not retailer_code_matches(data):
         if os.path.exists(path):
             os.remove(path)
-        return {"error": "Retailer code mismatch. Expected 2500552."}, 400
+        return {"error": RETAILER_MISMATCH_ERROR}, 400
+
+    invoice_number = data.get("invoice_meta", {}).get("invoice_number", "")
+    db = get_db()
+    exists = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
+    if exists:
+        if os.path.exists(path):
+            os.remove(path)
+        return {"error": f"Invoice already exists: {invoice_number}"}, 409
+
     save_invoice_file(
         upload_path=path,
         invoice_date=data.get("invoice_meta", {}).get("invoice_date", ""),
         invoice_number=data.get("invoice_meta", {}).get("invoice_number", "")
     )
 
-    db = SessionLocal()
-    try:
-        invoice = Invoice(
-            invoice_number=data["invoice_meta"]["invoice_number"],
-            invoice_date=data["invoice_meta"]["invoice_date"],
-            retailer_name=data["retailer"]["name"],
-            retailer_code=data["retailer"]["code"],
-            licensee_pan=data["licensee"]["pan"],
-            uploaded_by=request.user.get("username"),
-            uploaded_at=datetime.utcnow()
-        )
-        db.add(invoice)
-        db.flush()
-
+    with count_statements() as sql_counter:
+        invoice = store_invoice(db, data, request.user.get("username"))
         invoice_id = invoice.id
-        invoice_number = invoice.invoice_number
-
-        totals_data = data.get("totals", {})
-        totals = InvoiceTotals(
-            invoice_number=invoice_number,
-            e_challan_amount=totals_data.get("e_challan_amount", 0.0),
-            previous_credit=totals_data.get("previous_credit", 0.0),
-            sub_total=totals_data.get("sub_total", 0.0),
-            special_excise_cess=totals_data.get("special_excise_cess", 0.0),
-            tcs=totals_data.get("tcs", 0.0),
-            new_retailer_professional_tax=totals_data.get("new_retailer_professional_tax", 0.0),
-            retail_shop_excise_turnover_tax=totals_data.get("retail_shop_excise_turnover_tax", 0.0),
-            less_this_invoice_value=totals_data.get("less_this_invoice_value", 0.0),
-            retailer_credit_balance=totals_data.get("retailer_credit_balance", 0.0),
-            invoice_value=totals_data.get("invoice_value", 0.0),
-            mrp_round_off=totals_data.get("mrp_round_off", 0.0),
-            net_invoice_value=totals_data.get("net_invoice_value", 0.0),
-            total_invoice_value=totals_data.get("total_invoice_value", 0.0)
-        )
-        db.add(totals)
-
-        invoice_date = invoice.invoice_date
-        summary = db.query(StockSummary).first()
-        if not summary:
-            summary = StockSummary(
-                total_cases_all_items=0,
-                total_price_all_items=0.0
-            )
-            db.add(summary)
-
-        for item in data["items"]:
-            db_item = InvoiceItem(invoice_number=invoice_number, **item)
-            db.add(db_item)
-
-            item_name = item.get("brand_name") or ""
-            item_ml = item.get("pack_size_quantity_ml") or 0
-            item_case = item.get("pack_size_case") or 0
-            item_display = f"{item_name} {item_ml}ml/{item_case}"
-
-            price_row = db.query(PriceListItem).filter(
-                PriceListItem.brand_number == item.get("brand_number"),
-                PriceListItem.pack_type == item.get("pack_type"),
-                PriceListItem.volume_ml == item.get("pack_size_quantity_ml")
-            ).first()
-            mrp = float(price_row.mrp) if price_row and price_row.mrp is not None else None
-            item_cases = item.get("cases_delivered") or 0
-            item_bottles = item.get("bottles_delivered") or 0
-            total_bottles = int(item_cases) * int(item_case or 0) + int(item_bottles)
-            unit_rate = mrp
-            rate_per_case = (float(mrp) * float(item_case)) if (mrp is not None and item_case) else None
-            total_amount = (float(mrp) * float(total_bottles)) if mrp is not None else 0.0
-
-            stock = db.query(PresentStockDetail).filter(
-                PresentStockDetail.brand_number == item.get("brand_number"),
-                PresentStockDetail.pack_size_case == item.get("pack_size_case"),
-                PresentStockDetail.pack_size_quantity_ml == item.get("pack_size_quantity_ml")
-            ).first()
-
-            if stock:
-                stock.total_cases = (stock.total_cases or 0) + (item.get("cases_delivered") or 0)
-                stock.total_bottles = (stock.total_bottles or 0) + (item.get("bottles_delivered") or 0)
-                stock.total_amount = (stock.total_amount or 0.0) + total_amount
-                if unit_rate is not None:
-                    stock.unit_rate_per_bottle = unit_rate
-                if rate_per_case is not None:
-                    stock.rate_per_case = rate_per_case
-                stock.last_invoice_date = invoice_date
-                stock.last_updated_item_name = item_display
-            else:
-                stock = PresentStockDetail(
-                    brand_number=item.get("brand_number"),
-                    brand_name=item.get("brand_name"),
-                    product_type=item.get("product_type"),
-                    pack_type=item.get("pack_type"),
-                    pack_size_case=item.get("pack_size_case"),
-                    pack_size_quantity_ml=item.get("pack_size_quantity_ml"),
-                    total_cases=item.get("cases_delivered") or 0,
-                    total_bottles=item.get("bottles_delivered") or 0,
-                    rate_per_case=rate_per_case,
-                    unit_rate_per_bottle=unit_rate,
-                    total_amount=total_amount,
-                    last_invoice_date=invoice_date,
-                    last_updated_item_name=item_display
-                )
-                db.add(stock)
-
-            summary.total_cases_all_items = (summary.total_cases_all_items or 0) + (item.get("cases_delivered") or 0)
-            summary.total_price_all_items = (summary.total_price_all_items or 0.0) + total_amount
-            summary.last_updated_item_name = item_display
-
-        log_action(db, request.user, "upload_invoice", "invoice", invoice_number)
+        log_action(db, request.user, "upload_invoice", "invoice", invoice.invoice_number)
+        refresh_dashboard_snapshot(db, INVOICE, STOCK)
         db.commit()
-    finally:
-        db.close()
 
     return jsonify({
         "invoice_id": invoice_id,
-        "invoice": data
+        "invoice": data,
+        "parse_timings": parse_timings,
+        "sql_statements": sql_counter["statements"]
+    })
+
+
+@upload_bp.route("/upload/jobs/<job_id>", methods=["GET"])
+@auth_required()
+def get_upload_job(job_id):
+    db = get_db()
+    job = db.query(UploadJob).filter(UploadJob.id == job_id).first()
+    if not job:
+        return {"error": "job not found"}, 404
+    return jsonify(upload_job_payload(job))
+
+
+@upload_bp.route("/upload/batch", methods=["POST"])
+@auth_required()
+def upload_batch():
+    files = [f for f in request.files.getlist("files") + request.files.getlist("file") if f and f.filename]
+    if not files:
+        return {"error": "No files"}, 400
+
+    batch_dir = os.path.join("output", "batch", uuid.uuid4().hex)
+    os.makedirs(batch_dir, exist_ok=True)
+
+    results = []
+    paths = []
+    for idx, file in enumerate(files):
+        filename = secure_filename(file.filename) or f"invoice-{idx}.pdf"
+        path = os.path.join(batch_dir, f"{idx}-{filename}")
+        file.save(path)
+        paths.append(path)
+        results.append({"file": file.filename, "status": None})
+
+    parsed = parse_invoices_parallel(paths)
+
+    candidates = []
+    for idx, (data, timings, error) in enumerate(parsed):
+        result = results[idx]
+        result["parse_timings"] = timings
+        if error:
+            result["status"] = "parse_error"
+            result["error"] = error
+            continue
+        invoice_number = data.get("invoice_meta", {}).get("invoice_number", "")
+        result["invoice_number"] = invoice_number
+        result["invoice_date"] = data.get("invoice_meta", {}).get("invoice_date", "")
+        if not retailer_code_matches(data):
+            result["status"] = "retailer_mismatch"
+            result["error"] = RETAILER_MISMATCH_ERROR
+            continue
+        if not invoice_number:
+            result["status"] = "parse_error"
+            result["error"] = "invoice number not found in PDF"
+            continue
+        candidates.append((idx, data))
+
+    db = get_db()
+    numbers = [data["invoice_meta"]["invoice_number"] for _, data in candidates]
+    existing = {
+        r[0] for r in db.query(Invoice.invoice_number).filter(Invoice.invoice_number.in_(numbers)).all()
+    } if numbers else set()
+
+    to_store = []
+    seen = set()
+    for idx, data in sorted(candidates, key=lambda c: invoice_sort_key(c[1])):
+        invoice_number = data["invoice_meta"]["invoice_number"]
+        if invoice_number in existing or invoice_number in seen:
+            results[idx]["status"] = "duplicate"
+            results[idx]["error"] = f"Invoice already exists: {invoice_number}"
+            continue
+        seen.add(invoice_number)
+        to_store.append((idx, data))
+
+    username = request.user.get("username")
+    try:
+        with count_statements() as sql_counter:
+            for idx, data in to_store:
+                invoice = store_invoice(db, data, username)
+                results[idx]["invoice_id"] = invoice.id
+                log_action(db, request.user, "upload_invoice", "invoice", invoice.invoice_number)
+            if to_store:
+                refresh_dashboard_snapshot(db, INVOICE, STOCK)
+            db.commit()
+    except Exception as e:
+        db.rollback()
+        for idx, _ in to_store:
+            results[idx].pop("invoice_id", None)
+            results[idx]["status"] = "error"
+            results[idx]["error"] = f"batch not saved: {e}"
+        to_store = []
+
+    for idx, data in to_store:
+        results[idx]["status"] = "ok"
+        save_invoice_file(
+            upload_path=paths[idx],
+            invoice_date=data.get("invoice_meta", {}).get("invoice_date", ""),
+            invoice_number=data.get("invoice_meta", {}).get("invoice_number", "")
+        )
+
+    for path in paths:
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+        except Exception:
+            pass
+    try:
+        os.rmdir(batch_dir)
+    except Exception:
+        pass
+
+    counts = {}
+    for r in results:
+        counts[r["status"]] = counts.get(r["status"], 0) + 1
+
+    return jsonify({
+        "stored_order": [results[idx]["invoice_number"] for idx, _ in to_store],
+        "sql_statements": sql_counter["statements"] if to_store else 0,
+        "counts": counts,
+        "results": results
     })
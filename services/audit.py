@@ -1,30 +1,168 @@
+import atexit
+import queue
+import threading
+import time
 from datetime import datetime
+
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import AUDIT_BATCH_SIZE, AUDIT_FLUSH_INTERVAL_SECONDS, AUDIT_QUEUE_SIZE
+from database import engine
 from models import AuditLog, UserLogin
 
+_pending = queue.Queue(maxsize=AUDIT_QUEUE_SIZE)
+_writer = None
+_writer_lock = threading.Lock()
+_stats_lock = threading.Lock()
+_stats = {
+    "queued": 0,
+    "written": 0,
+    "dropped": 0,
+    "failed": 0,
+    "batches": 0,
+}
+
 
 def log_action(db, user, action, entity_type="", entity_id="", details=""):
+    """
+    Adds the audit row to the caller's transaction, so it commits or rolls
+    back together with the change it describes.
+    """
+    if not user:
+        return
+    db.add(AuditLog(**_audit_row(user, action, entity_type, entity_id, details)))
+
+
+def _audit_row(user, action, entity_type, entity_id, details, created_at=None):
+    row = {
+        "username": user.get("username"),
+        "role": user.get("role"),
+        "action": action,
+        "entity_type": entity_type,
+        "entity_id": str(entity_id) if entity_id is not None else "",
+        "details": details or "",
+    }
+    if created_at is not None:
+        row["created_at"] = created_at
+    return row
+
+
+def queue_action(user, action, entity_type="", entity_id="", details="", touch_login=False, sync=False):
+    """
+    Queues an audit row for the background writer. With touch_login the
+    user's last-login time is upserted in the same batch. With sync the row
+    is written before the call returns, and a failed write raises; use it
+    for destructive actions, which must not go ahead without an audit row.
+
+    Non-sync entries are dropped (and counted) when the queue is full.
+    """
     if not user:
         return
-    db.add(AuditLog(
-        username=user.get("username"),
-        role=user.get("role"),
-        action=action,
-        entity_type=entity_type,
-        entity_id=str(entity_id) if entity_id is not None else "",
-        details=details or ""
-    ))
+    now = datetime.utcnow()
+    entry = {"audit": _audit_row(user, action, entity_type, entity_id, details, created_at=now)}
+    if touch_login and user.get("username"):
+        entry["login"] = {"username": user.get("username"), "role": user.get("role"), "last_login_at": now}
+
+    if sync:
+        _write_batch([entry], raise_errors=True)
+        return
+    try:
+        _pending.put_nowait(entry)
+    except queue.Full:
+        _count("dropped")
+        return
+    _count("queued")
+    _start_writer()
 
 
-def update_last_login(db, user):
+def record_login(user):
     if not user:
         return
-    username = user.get("username")
-    role = user.get("role")
-    if not username:
+    queue_action(user, "login", entity_type="auth", entity_id=user.get("username"), touch_login=True)
+
+
+def _count(name, n=1):
+    with _stats_lock:
+        _stats[name] += n
+
+
+def audit_queue_stats():
+    with _stats_lock:
+        stats = dict(_stats)
+    stats["pending"] = _pending.qsize()
+    stats["capacity"] = AUDIT_QUEUE_SIZE
+    return stats
+
+
+def _start_writer():
+    global _writer
+    if _writer is not None:
+        return
+    with _writer_lock:
+        if _writer is None:
+            _writer = threading.Thread(target=_run_writer, name="audit-writer", daemon=True)
+            _writer.start()
+
+
+def _run_writer():
+    while True:
+        batch = [_pending.get()]
+        deadline = time.monotonic() + AUDIT_FLUSH_INTERVAL_SECONDS
+        while len(batch) < AUDIT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(_pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        _write_batch(batch)
+        for _ in batch:
+            _pending.task_done()
+
+
+def _write_batch(batch, raise_errors=False):
+    audit_rows = [e["audit"] for e in batch]
+    logins = {}
+    for e in batch:
+        if "login" in e:
+            logins[e["login"]["username"]] = e["login"]
+    try:
+        with engine.begin() as conn:
+            conn.execute(AuditLog.__table__.insert(), audit_rows)
+            if logins:
+                stmt = sqlite_insert(UserLogin.__table__)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["username"],
+                    set_={"role": stmt.excluded.role, "last_login_at": stmt.excluded.last_login_at}
+                )
+                conn.execute(stmt, list(logins.values()))
+    except Exception:
+        _count("failed", len(batch))
+        if raise_errors:
+            raise
         return
-    row = db.query(UserLogin).filter(UserLogin.username == username).first()
-    if row:
-        row.role = role
-        row.last_login_at = datetime.utcnow()
-    else:
-        db.add(UserLogin(username=username, role=role, last_login_at=datetime.utcnow()))
+    _count("written", len(batch))
+    _count("batches")
+
+
+def flush_audit_queue(timeout=None):
+    """
+    Blocks until everything queued so far has been written, or until
+    timeout seconds have passed. Returns True when the queue drained.
+    """
+    if timeout is None:
+        _pending.join()
+        return True
+    deadline = time.monotonic() + timeout
+    while _pending.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+@atexit.register
+def _flush_on_exit():
+    if _writer is not None:
+        flush_audit_queue(timeout=AUDIT_FLUSH_INTERVAL_SECONDS + 5)
@@ -0,0 +1,383 @@
+import gzip
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import String, select, type_coerce
+
+try:
+    import fcntl
+except ImportError:  # Windows: locks below only cover this process
+    fcntl = None
+
+from config import (
+    AUDIT_ARCHIVE_CACHE_MB,
+    AUDIT_ARCHIVE_CHUNK_SIZE,
+    AUDIT_ARCHIVE_FOLDER,
+    AUDIT_RETENTION_DAYS,
+    AUDIT_RETENTION_INTERVAL_SECONDS,
+)
+from database import engine
+from models import AuditLog
+
+# Appends take FILES_LOCK exclusively and readers share it, so a reader
+# never sees a half-written gzip member. RUN_LOCK keeps a second archiver
+# (another server process, or the debug reloader's other process) from
+# archiving and deleting the same chunk.
+FILES_LOCK = ".files.lock"
+RUN_LOCK = ".archiver.lock"
+MANIFEST_FIELDS = ("username", "role", "action", "entity_type")
+
+_local_locks = {FILES_LOCK: threading.Lock(), RUN_LOCK: threading.Lock()}
+_manifest_cache = {}
+# Decompressed day files, most recently used last, as path ->
+# (file_size, lines, bytes). Paging back through history re-reads the
+# same days, and decompressing is most of the cost of a read.
+_day_cache = OrderedDict()
+_day_cache_bytes = 0
+_day_cache_lock = threading.Lock()
+_retention_thread = None
+_status_lock = threading.Lock()
+_last_run = {}
+
+
+@contextmanager
+def _archive_lock(name, shared=False, blocking=True):
+    """
+    flock on a lock file in the archive folder, which serialises threads
+    and processes alike. Yields False when blocking is off and the lock is
+    held elsewhere.
+    """
+    if fcntl is None:
+        lock = _local_locks[name]
+        acquired = lock.acquire(blocking)
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                lock.release()
+        return
+
+    os.makedirs(AUDIT_ARCHIVE_FOLDER, exist_ok=True)
+    with open(os.path.join(AUDIT_ARCHIVE_FOLDER, name), "a") as f:
+        flags = fcntl.LOCK_SH if shared else fcntl.LOCK_EX
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(f, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def archive_path(day):
+    return os.path.join(AUDIT_ARCHIVE_FOLDER, f"{day:%Y}", f"audit-{day.isoformat()}.jsonl.gz")
+
+
+def _manifest_path(day):
+    return os.path.join(AUDIT_ARCHIVE_FOLDER, f"{day:%Y}", f"audit-{day.isoformat()}.manifest.json")
+
+
+def archived_days():
+    """Dates that have an archive file, oldest first."""
+    days = []
+    if not os.path.isdir(AUDIT_ARCHIVE_FOLDER):
+        return days
+    for year in os.listdir(AUDIT_ARCHIVE_FOLDER):
+        year_dir = os.path.join(AUDIT_ARCHIVE_FOLDER, year)
+        if not os.path.isdir(year_dir):
+            continue
+        for name in os.listdir(year_dir):
+            if not (name.startswith("audit-") and name.endswith(".jsonl.gz")):
+                continue
+            try:
+                days.append(date.fromisoformat(name[len("audit-"):-len(".jsonl.gz")]))
+            except ValueError:
+                continue
+    return sorted(days)
+
+
+def _line_key(line):
+    # Rows are written with sorted keys and compact separators, and JSON
+    # escapes every quote inside a string value, so the first '"id":' and
+    # '"created_at":' in a line are the row's own fields.
+    created_at = ""
+    i = line.find('"created_at":"')
+    if i >= 0:
+        i += len('"created_at":"')
+        created_at = line[i:line.index('"', i)]
+    j = line.index('"id":') + len('"id":')
+    k = line.find(",", j)
+    return created_at, int(line[j:k] if k >= 0 else line[j:line.index("}", j)])
+
+
+def _day_lines(path):
+    # Caller holds FILES_LOCK, so the size matches the content read.
+    global _day_cache_bytes
+    size = os.path.getsize(path)
+    with _day_cache_lock:
+        cached = _day_cache.get(path)
+        if cached and cached[0] == size:
+            _day_cache.move_to_end(path)
+            return cached[1]
+    with open(path, "rb") as f:
+        data = gzip.decompress(f.read())
+    lines = data.decode("utf-8").split("\n")
+    cost = len(data) + 64 * len(lines)
+    with _day_cache_lock:
+        old = _day_cache.pop(path, None)
+        if old:
+            _day_cache_bytes -= old[2]
+        if cost <= AUDIT_ARCHIVE_CACHE_MB * 1024 * 1024:
+            _day_cache[path] = (size, lines, cost)
+            _day_cache_bytes += cost
+        while _day_cache_bytes > AUDIT_ARCHIVE_CACHE_MB * 1024 * 1024:
+            _, (_, _, evicted) = _day_cache.popitem(last=False)
+            _day_cache_bytes -= evicted
+    return lines
+
+
+def clear_day_cache():
+    global _day_cache_bytes
+    with _day_cache_lock:
+        _day_cache.clear()
+        _day_cache_bytes = 0
+
+
+def _read_rows(path, match=None, before=None, limit=None):
+    # A line without '"field":value' for every filter cannot match and is
+    # skipped unparsed; the rest are ranked by their (created_at, id) key
+    # and only parsed while the result is short of limit. Duplicate keys
+    # (a chunk archived twice after a crash) collapse to one row.
+    needles = [f'"{k}":{json.dumps(v)}' for k, v in (match or {}).items()]
+    lines = {}
+    for line in _day_lines(path):
+        if not line:
+            continue
+        for needle in needles:
+            if needle not in line:
+                break
+        else:
+            key = _line_key(line)
+            if before is None or key < before:
+                lines[key] = line
+    rows = []
+    for key in sorted(lines, reverse=True):
+        row = json.loads(lines[key])
+        if all(row.get(k) == v for k, v in (match or {}).items()):
+            rows.append(row)
+            if limit is not None and len(rows) >= limit:
+                break
+    return rows
+
+
+def read_archived_day(day, match=None, before=None, limit=None):
+    """
+    Archived rows for one day, newest first by (created_at, id). match
+    keeps rows whose fields equal every value in it, before keeps rows
+    whose key sorts below that (created_at, id) pair, and limit caps how
+    many rows are returned.
+    """
+    with _archive_lock(FILES_LOCK, shared=True):
+        return _read_rows(archive_path(day), match, before, limit)
+
+
+def _new_manifest():
+    return {"rows": 0, "min_created_at": None, "max_created_at": None, **{f: [] for f in MANIFEST_FIELDS}}
+
+
+def _add_to_manifest(manifest, rows):
+    manifest["rows"] += len(rows)
+    for field in MANIFEST_FIELDS:
+        manifest[field] = sorted(set(manifest[field]) | {r.get(field) for r in rows}, key=lambda v: (v is None, v or ""))
+    created = [r["created_at"] for r in rows if r.get("created_at")]
+    if created:
+        manifest["min_created_at"] = min([v for v in (manifest["min_created_at"], *created) if v])
+        manifest["max_created_at"] = max([v for v in (manifest["max_created_at"], *created) if v])
+    return manifest
+
+
+def _write_manifest(day, manifest):
+    path = _manifest_path(day)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, sort_keys=True)
+    os.replace(tmp_path, path)
+    _manifest_cache[day] = manifest
+
+
+def _load_manifest(day):
+    try:
+        with open(_manifest_path(day), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _stored_manifest(day, size):
+    manifest = _manifest_cache.get(day)
+    if manifest is None or manifest.get("file_size") != size:
+        manifest = _load_manifest(day)
+    if manifest is None or manifest.get("file_size") != size:
+        return None
+    _manifest_cache[day] = manifest
+    return manifest
+
+
+def _rebuild_manifest(day):
+    # Caller holds FILES_LOCK.
+    path = archive_path(day)
+    manifest = _add_to_manifest(_new_manifest(), _read_rows(path))
+    manifest["file_size"] = os.path.getsize(path)
+    _write_manifest(day, manifest)
+    return manifest
+
+
+def day_manifest(day):
+    """
+    Summary of one archived day: row count (an upper bound, as a chunk
+    archived twice after a crash counts twice), the distinct values of
+    MANIFEST_FIELDS and the min/max created_at. A manifest that does not
+    describe the current file (an archive written before manifests, or a
+    crash between the append and the manifest write) is rebuilt from the
+    day file. None when the day has no archive.
+    """
+    try:
+        size = os.path.getsize(archive_path(day))
+    except OSError:
+        return None
+    manifest = _stored_manifest(day, size)
+    if manifest is None:
+        with _archive_lock(FILES_LOCK, shared=True):
+            manifest = _rebuild_manifest(day)
+    return manifest
+
+
+def _append_day(day, rows):
+    # Caller holds FILES_LOCK.
+    path = archive_path(day)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        manifest = _stored_manifest(day, os.path.getsize(path)) or _rebuild_manifest(day)
+    else:
+        manifest = _new_manifest()
+    # Each append is its own gzip member; gzip readers concatenate members.
+    with open(path, "ab") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for row in rows:
+                gz.write((json.dumps(row, sort_keys=True, separators=(",", ":")) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    manifest = _add_to_manifest(dict(manifest), rows)
+    manifest["file_size"] = os.path.getsize(path)
+    _write_manifest(day, manifest)
+
+
+def archive_audit_logs(retention_days=AUDIT_RETENTION_DAYS, chunk_size=AUDIT_ARCHIVE_CHUNK_SIZE, now=None, bind=None):
+    """
+    Moves audit rows from days older than retention_days into per-day gzip
+    JSONL files, chunk_size rows at a time. Each chunk is written and
+    fsynced before its rows are deleted in their own short transaction,
+    then freed pages are returned with an incremental vacuum. Only one
+    archiver runs at a time; a run that finds another one going skips.
+    bind defaults to the app's engine.
+    """
+    bind = bind or engine
+    result = {"archived": 0, "days": [], "cutoff": None}
+    if retention_days <= 0:
+        return result
+    cutoff = ((now or datetime.utcnow()).date() - timedelta(days=retention_days)).isoformat()
+    result["cutoff"] = cutoff
+
+    table = AuditLog.__table__
+    created_at = type_coerce(table.c.created_at, String)
+    chunk_stmt = select(
+        table.c.id,
+        table.c.username,
+        table.c.role,
+        table.c.action,
+        table.c.entity_type,
+        table.c.entity_id,
+        table.c.details,
+        created_at.label("created_at"),
+    ).where(created_at < cutoff).order_by(table.c.created_at, table.c.id).limit(chunk_size)
+
+    days = set()
+    with _archive_lock(RUN_LOCK, blocking=False) as acquired:
+        if not acquired:
+            result["skipped"] = "another process is archiving"
+            return result
+        while True:
+            with bind.connect() as conn:
+                rows = [dict(r) for r in conn.execute(chunk_stmt).mappings()]
+            if not rows:
+                break
+            by_day = {}
+            for row in rows:
+                by_day.setdefault(row["created_at"][:10], []).append(row)
+            with _archive_lock(FILES_LOCK):
+                for day, day_rows in sorted(by_day.items()):
+                    _append_day(date.fromisoformat(day), day_rows)
+            with bind.begin() as conn:
+                conn.execute(table.delete().where(table.c.id.in_([r["id"] for r in rows])))
+            days.update(by_day)
+            result["archived"] += len(rows)
+
+    if result["archived"]:
+        # incremental_vacuum frees one page per step and execute() only
+        # steps once; executescript runs each statement to completion.
+        raw = bind.raw_connection()
+        try:
+            raw.driver_connection.executescript(
+                "PRAGMA incremental_vacuum; PRAGMA wal_checkpoint(PASSIVE);"
+            )
+        finally:
+            raw.close()
+    result["days"] = sorted(days)
+    return result
+
+
+def _run_retention():
+    while True:
+        started = time.time()
+        try:
+            status = archive_audit_logs()
+        except Exception as e:
+            status = {"error": str(e)}
+        status["finished_at"] = datetime.utcnow().isoformat()
+        status["duration_ms"] = round((time.time() - started) * 1000, 1)
+        with _status_lock:
+            _last_run.clear()
+            _last_run.update(status)
+        time.sleep(AUDIT_RETENTION_INTERVAL_SECONDS)
+
+
+def start_audit_retention():
+    """Runs archive_audit_logs now and then every AUDIT_RETENTION_INTERVAL_SECONDS."""
+    global _retention_thread
+    if AUDIT_RETENTION_DAYS <= 0 or AUDIT_RETENTION_INTERVAL_SECONDS <= 0:
+        return
+    if _retention_thread is not None:
+        return
+    _retention_thread = threading.Thread(target=_run_retention, name="audit-retention", daemon=True)
+    _retention_thread.start()
+
+
+def audit_retention_status():
+    with _status_lock:
+        last_run = dict(_last_run)
+    days = archived_days()
+    return {
+        "retention_days": AUDIT_RETENTION_DAYS,
+        "archived_from": days[0].isoformat() if days else None,
+        "archived_to": days[-1].isoformat() if days else None,
+        "last_run": last_run or None,
+    }
@@ -0,0 +1,138 @@
+from datetime import date, timedelta
+
+from sqlalchemy import String, or_, type_coerce
+
+from models import AuditLog
+from services.audit_archive import archived_days, day_manifest, read_archived_day
+from services.pagination import split_page
+from services.sales_utils import parse_report_date, stored_datetime_iso
+
+AUDIT_FILTERS = ("username", "role", "action", "entity_type")
+AUDIT_DEFAULT_LIMIT = 200
+
+
+def parse_audit_filters(args):
+    """
+    Exact-match filters plus an inclusive date_from/date_to range from the
+    query string. Raises ValueError with a client-facing message.
+    """
+    filters = {key: args.get(key) for key in AUDIT_FILTERS if args.get(key)}
+    for key in ("date_from", "date_to"):
+        raw = args.get(key)
+        if not raw:
+            continue
+        value = parse_report_date(raw)
+        if value is None:
+            raise ValueError(f"{key} must be a date (YYYY-MM-DD)")
+        filters[key] = value
+    if "date_from" in filters and "date_to" in filters and filters["date_from"] > filters["date_to"]:
+        raise ValueError("date_from must not be after date_to")
+    return filters
+
+
+def _sort_key(row):
+    return row["created_at"] or "", row["id"]
+
+
+def _audit_item(row):
+    return {
+        "username": row["username"],
+        "role": row["role"],
+        "action": row["action"],
+        "entity_type": row["entity_type"],
+        "entity_id": row["entity_id"],
+        "details": row["details"],
+        "created_at": stored_datetime_iso(row["created_at"])
+    }
+
+
+def _db_rows(db, filters, limit, cursor):
+    created_at = type_coerce(AuditLog.created_at, String)
+    q = db.query(
+        AuditLog.id,
+        AuditLog.username,
+        AuditLog.role,
+        AuditLog.action,
+        AuditLog.entity_type,
+        AuditLog.entity_id,
+        AuditLog.details,
+        created_at.label("created_at"),
+    )
+    for key in AUDIT_FILTERS:
+        if key in filters:
+            q = q.filter(getattr(AuditLog, key) == filters[key])
+    if "date_from" in filters:
+        q = q.filter(created_at >= filters["date_from"].isoformat())
+    if "date_to" in filters:
+        q = q.filter(created_at < (filters["date_to"] + timedelta(days=1)).isoformat())
+    if cursor:
+        last_created_at, last_id = cursor
+        # The plain upper bound lets SQLite seek the index to the cursor;
+        # the OR only breaks ties inside that one created_at value.
+        q = q.filter(
+            created_at <= last_created_at,
+            or_(created_at < last_created_at, AuditLog.id < last_id),
+        )
+    rows = q.order_by(AuditLog.created_at.desc(), AuditLog.id.desc()).limit(limit).all()
+    return [r._asdict() for r in rows]
+
+
+def _archived_rows(filters, cursor, limit):
+    """
+    Up to limit archived rows matching filters, newest first. Day files
+    are read newest first, and a day is skipped without opening it when
+    its manifest shows that no row can match the filters or the cursor.
+    """
+    date_from = filters.get("date_from")
+    date_to = filters.get("date_to")
+    cursor_key = None
+    if cursor:
+        try:
+            cursor_day = date.fromisoformat(str(cursor[0])[:10])
+            cursor_key = (str(cursor[0]), int(cursor[1]))
+        except ValueError:
+            raise ValueError("invalid cursor")
+        date_to = min(date_to, cursor_day) if date_to else cursor_day
+    match = {key: filters[key] for key in AUDIT_FILTERS if key in filters}
+
+    found = []
+    for day in reversed(archived_days()):
+        if date_to and day > date_to:
+            continue
+        if date_from and day < date_from:
+            break
+        manifest = day_manifest(day)
+        if manifest is None or not manifest["rows"]:
+            continue
+        if any(value not in manifest[key] for key, value in match.items()):
+            continue
+        if cursor_key and (manifest["min_created_at"] or "") > cursor_key[0]:
+            continue
+        rows = read_archived_day(day, match, cursor_key, limit - len(found))
+        found.extend(rows)
+        if len(found) >= limit:
+            break
+    return found
+
+
+def audit_log_page(db, filters, limit, cursor=None):
+    """
+    One page of audit rows, newest first, keyed on (created_at, id).
+    created_at is compared as stored text so the range and cursor terms
+    match the index exactly whatever precision a row was written with.
+    Rows moved out by the retention job are read back from the archive
+    files once the page runs past what is left in the table. Returns
+    (items, next_cursor).
+    """
+    rows = _db_rows(db, filters, limit + 1, cursor)
+    days = archived_days()
+    archive_end = (days[-1] + timedelta(days=1)).isoformat() if days else None
+    if archive_end and (len(rows) <= limit or rows[-1]["created_at"] < archive_end):
+        archived = _archived_rows(filters, cursor, limit + 1)
+        # Keyed on (created_at, id) rather than id: SQLite hands out ids
+        # again once archiving has emptied the table.
+        merged = {_sort_key(r): r for r in archived}
+        merged.update({_sort_key(r): r for r in rows})
+        rows = sorted(merged.values(), key=_sort_key, reverse=True)[:limit + 1]
+    page, next_cursor = split_page(rows, limit, lambda r: (r["created_at"], r["id"]))
+    return [_audit_item(r) for r in page], next_cursor
@@ -0,0 +1,306 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func
+from sqlalchemy.exc import IntegrityError
+
+from config import DASHBOARD_CACHE_SECONDS
+from database import SessionLocal
+from models import (
+    DashboardSnapshot,
+    Invoice,
+    InvoiceTotals,
+    PresentStockDetail,
+    SellFinance,
+    SellReport,
+    StockSummary,
+)
+from services.price_index import get_price_index
+
+SNAPSHOT_ID = 1
+REFRESHED_FLAG = "dashboard_snapshot_refreshed"
+
+FINANCE = "finance"
+INVOICE = "invoice"
+STOCK = "stock"
+SELL_REPORT = "sell_report"
+SECTIONS = (FINANCE, INVOICE, STOCK, SELL_REPORT)
+
+SNAPSHOT_FIELDS = (
+    "last_uncleared_amount",
+    "last_invoice_date",
+    "last_invoice_number",
+    "last_invoice_net_value",
+    "last_invoice_total_value",
+    "last_invoice_retailer_credit_balance",
+    "total_present_stock",
+    "present_stock_mrp_value",
+    "stock_summary_value",
+    "price_list_version",
+    "last_sell_report_date",
+    "last_sell_report_value",
+)
+
+
+def _finance_values(db):
+    last_finance = db.query(SellFinance.final_balance).order_by(SellFinance.created_at.desc()).first()
+    return {
+        "last_uncleared_amount": float(last_finance.final_balance or 0.0) if last_finance else 0.0,
+    }
+
+
+def _invoice_values(db):
+    last_invoice = db.query(Invoice.invoice_number, Invoice.invoice_date).order_by(Invoice.id.desc()).first()
+    values = {
+        "last_invoice_date": last_invoice.invoice_date if last_invoice else "",
+        "last_invoice_number": last_invoice.invoice_number if last_invoice else "",
+        "last_invoice_net_value": 0.0,
+        "last_invoice_total_value": 0.0,
+        "last_invoice_retailer_credit_balance": 0.0,
+    }
+    if last_invoice:
+        totals = db.query(InvoiceTotals).filter(
+            InvoiceTotals.invoice_number == last_invoice.invoice_number
+        ).first()
+        if totals:
+            values["last_invoice_net_value"] = float(totals.net_invoice_value or 0.0)
+            values["last_invoice_total_value"] = float(totals.total_invoice_value or 0.0)
+            values["last_invoice_retailer_credit_balance"] = float(totals.retailer_credit_balance or 0.0)
+    return values
+
+
+def _stock_summary_values(db):
+    summary = db.query(StockSummary.total_cases_all_items, StockSummary.total_price_all_items).first()
+    return {
+        "total_present_stock": int(summary.total_cases_all_items or 0) if summary else 0,
+        "stock_summary_value": float(summary.total_price_all_items or 0.0) if summary else 0.0,
+    }
+
+
+def _stock_mrp_values(db):
+    index = get_price_index(db)
+    mrp_map = index.mrp_by_pack
+    present_stock_mrp_value = 0.0
+    rows = db.query(
+        PresentStockDetail.brand_number,
+        PresentStockDetail.pack_type,
+        PresentStockDetail.pack_size_quantity_ml,
+        PresentStockDetail.total_bottles,
+    ).order_by(PresentStockDetail.id.asc()).all()
+    for r in rows:
+        key = (str(r.brand_number or "").strip(), str(r.pack_type or "").strip(), int(r.pack_size_quantity_ml or 0))
+        mrp = mrp_map.get(key)
+        if mrp is None:
+            continue
+        present_stock_mrp_value += float(mrp) * int(r.total_bottles or 0)
+    return {
+        "present_stock_mrp_value": present_stock_mrp_value,
+        "price_list_version": index.version,
+    }
+
+
+def _stock_table_values(db):
+    cases, amount = db.query(
+        func.coalesce(func.sum(PresentStockDetail.total_cases), 0),
+        func.coalesce(func.sum(PresentStockDetail.total_amount), 0.0),
+    ).one()
+    return {
+        "total_present_stock": int(cases or 0),
+        "stock_summary_value": float(amount or 0.0),
+    }
+
+
+def _stock_values(db):
+    # Full recompute: totals are summed from the stock rows themselves, so
+    # ?fresh=1 reports drift in the delta-maintained stock summary too.
+    values = _stock_table_values(db)
+    values.update(_stock_mrp_values(db))
+    return values
+
+
+def _stock_values_deferred(db):
+    # Totals come from the delta-maintained stock summary. The MRP value
+    # needs every stock row, so writers only mark it stale by clearing
+    # price_list_version; get_dashboard_snapshot recomputes it on read.
+    values = _stock_summary_values(db)
+    values["price_list_version"] = None
+    return values
+
+
+def _sell_report_values(db):
+    last_report = db.query(SellReport.report_date).order_by(SellReport.created_at.desc()).first()
+    last_report_date = last_report.report_date if last_report else ""
+    last_sell_report_value = 0.0
+    if last_report_date:
+        last_sell_report_value = db.query(
+            func.coalesce(func.sum(SellReport.sell_amount), 0.0)
+        ).filter(SellReport.report_date == last_report_date).scalar()
+    return {
+        "last_sell_report_date": last_report_date,
+        "last_sell_report_value": float(last_sell_report_value or 0.0),
+    }
+
+
+_SECTION_BUILDERS = {
+    FINANCE: _finance_values,
+    INVOICE: _invoice_values,
+    STOCK: _stock_values,
+    SELL_REPORT: _sell_report_values,
+}
+
+
+def compute_dashboard_values(db, sections=SECTIONS):
+    values = {}
+    for section in sections:
+        values.update(_SECTION_BUILDERS[section](db))
+    return values
+
+
+def _snapshot_dict(row):
+    return {f: getattr(row, f) for f in SNAPSHOT_FIELDS}
+
+
+def store_dashboard_snapshot(db, values):
+    """
+    Writes the given snapshot fields inside the caller's transaction,
+    creating the row if needed. Does not commit.
+    """
+    row = db.get(DashboardSnapshot, SNAPSHOT_ID)
+    if row is None:
+        row = DashboardSnapshot(id=SNAPSHOT_ID)
+        db.add(row)
+    for field, value in values.items():
+        setattr(row, field, value)
+    row.updated_at = datetime.utcnow()
+    db.info[REFRESHED_FLAG] = True
+    return row
+
+
+def refresh_dashboard_snapshot(db, *sections):
+    """
+    Recomputes the given sections of the dashboard snapshot inside the
+    caller's transaction, so the snapshot commits together with the write
+    that changed it. With no sections, everything is recomputed. The stock
+    MRP value is only marked stale here and rebuilt on the next read, so
+    stock writes never scan every stock row. Does not commit.
+    """
+    db.flush()
+    if not sections or db.get(DashboardSnapshot, SNAPSHOT_ID) is None:
+        sections = SECTIONS
+    values = {}
+    for section in sections:
+        builder = _stock_values_deferred if section == STOCK else _SECTION_BUILDERS[section]
+        values.update(builder(db))
+    return store_dashboard_snapshot(db, values)
+
+
+def get_dashboard_snapshot(db):
+    """
+    Returns the stored snapshot as a dict. Builds it on first use, and
+    refreshes the stock section when its MRP value is stale or the price
+    list has changed since it was computed. Commits only when it had to
+    write.
+    """
+    row = db.get(DashboardSnapshot, SNAPSHOT_ID)
+    stale = []
+    if row is None:
+        stale = list(SECTIONS)
+    elif row.price_list_version != get_price_index(db).version:
+        stale = [STOCK]
+    if stale:
+        try:
+            row = store_dashboard_snapshot(db, compute_dashboard_values(db, stale))
+            db.commit()
+        except IntegrityError:
+            # another request created the row first
+            db.rollback()
+            row = db.get(DashboardSnapshot, SNAPSHOT_ID)
+    return _snapshot_dict(row)
+
+
+_cache_lock = threading.Lock()
+_cache_generation = 0
+_cached = None
+
+
+def get_cached_dashboard_snapshot():
+    """
+    Process-local copy of the snapshot for the login response. It is
+    dropped whenever this process commits a snapshot refresh; writes from
+    other processes show up within DASHBOARD_CACHE_SECONDS.
+    """
+    global _cached
+    cached = _cached
+    if cached is not None and time.monotonic() - cached[0] < DASHBOARD_CACHE_SECONDS:
+        return cached[1]
+
+    generation = _cache_generation
+    db = SessionLocal()
+    try:
+        snapshot = get_dashboard_snapshot(db)
+    finally:
+        db.close()
+    with _cache_lock:
+        if generation == _cache_generation:
+            _cached = (time.monotonic(), snapshot)
+    return snapshot
+
+
+def invalidate_dashboard_cache():
+    global _cached, _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        _cached = None
+
+
+@event.listens_for(SessionLocal, "after_commit")
+def _drop_cache_on_refresh(session):
+    if session.info.pop(REFRESHED_FLAG, False):
+        invalidate_dashboard_cache()
+
+
+@event.listens_for(SessionLocal, "after_soft_rollback")
+def _clear_refresh_flag(session, previous_transaction):
+    session.info.pop(REFRESHED_FLAG, None)
+
+
+def snapshot_drift(stored, fresh):
+    drift = {}
+    for field in SNAPSHOT_FIELDS:
+        a, b = stored.get(field), fresh.get(field)
+        if isinstance(a, float) or isinstance(b, float):
+            if a is not None and b is not None and abs(float(a) - float(b)) < 1e-6:
+                continue
+        elif a == b:
+            continue
+        drift[field] = {"stored": a, "fresh": b}
+    return drift
+
+
+def login_summary_payload(snapshot):
+    return {
+        "last_uncleared_amount": snapshot["last_uncleared_amount"],
+        "last_invoice_date": snapshot["last_invoice_date"],
+        "last_invoice_number": snapshot["last_invoice_number"],
+        "last_invoice_value": snapshot["last_invoice_net_value"],
+        "last_invoice_retailer_credit_balance": snapshot["last_invoice_retailer_credit_balance"],
+        "total_present_stock": snapshot["total_present_stock"],
+        "total_present_stock_mrp_value": snapshot["present_stock_mrp_value"],
+        "last_sell_report_date": snapshot["last_sell_report_date"],
+        "last_sell_report_value": snapshot["last_sell_report_value"],
+    }
+
+
+def dashboard_summary_payload(snapshot):
+    return {
+        "last_uncleared_amount": snapshot["last_uncleared_amount"],
+        "last_invoice_date": snapshot["last_invoice_date"],
+        "last_invoice_number": snapshot["last_invoice_number"],
+        "last_invoice_value": snapshot["last_invoice_total_value"],
+        "last_invoice_retailer_credit_balance": snapshot["last_invoice_retailer_credit_balance"],
+        "total_present_stock": snapshot["total_present_stock"],
+        "total_present_stock_mrp_value": snapshot["stock_summary_value"],
+        "last_sell_report_date": snapshot["last_sell_report_date"],
+        "last_sell_report_value": snapshot["last_sell_report_value"],
+    }
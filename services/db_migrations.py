@@ -1,4 +1,7 @@
 from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import SellFinanceCash, SellFinancePhonePay, StockMovement, StockSnapshot
 
 
 def ensure_invoice_totals_tax_columns(engine):
@@ -113,3 +116,281 @@ def ensure_user_brand_aliases_support(engine):
             "CREATE INDEX IF NOT EXISTS ix_user_brand_aliases_brand_number "
             "ON user_brand_aliases (brand_number)"
         ))
+
+
+def ensure_upload_jobs_support(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS upload_jobs (
+                id VARCHAR PRIMARY KEY,
+                status VARCHAR,
+                stage VARCHAR,
+                file_path VARCHAR,
+                original_filename VARCHAR,
+                username VARCHAR,
+                role VARCHAR,
+                invoice_number VARCHAR,
+                invoice_id INTEGER,
+                timings VARCHAR,
+                result VARCHAR,
+                error VARCHAR,
+                http_status INTEGER,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_upload_jobs_status "
+            "ON upload_jobs (status)"
+        ))
+
+
+def ensure_upload_job_worker_column(engine):
+    with engine.begin() as conn:
+        table_exists = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table' AND name='upload_jobs'")
+        ).fetchone()
+        if not table_exists:
+            return
+        existing_cols = {
+            row[1]
+            for row in conn.execute(text("PRAGMA table_info(upload_jobs)")).fetchall()
+        }
+        if "worker" not in existing_cols:
+            conn.execute(text("ALTER TABLE upload_jobs ADD COLUMN worker VARCHAR"))
+
+
+def ensure_cache_versions_support(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS cache_versions (
+                name VARCHAR PRIMARY KEY,
+                version INTEGER
+            )
+        """))
+
+
+def seed_cache_versions(engine):
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('price_list', 0)"
+        ))
+
+
+def ensure_sell_report_latest_index(engine):
+    with engine.begin() as conn:
+        table_exists = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table' AND name='sell_reports'")
+        ).fetchone()
+        if not table_exists:
+            return
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_sell_reports_stock_id_created_at "
+            "ON sell_reports (stock_id, created_at)"
+        ))
+
+
+def ensure_dashboard_snapshot_support(engine):
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS dashboard_snapshot (
+                id INTEGER PRIMARY KEY,
+                last_uncleared_amount FLOAT,
+                last_invoice_date VARCHAR,
+                last_invoice_number VARCHAR,
+                last_invoice_net_value FLOAT,
+                last_invoice_total_value FLOAT,
+                last_invoice_retailer_credit_balance FLOAT,
+                total_present_stock INTEGER,
+                present_stock_mrp_value FLOAT,
+                stock_summary_value FLOAT,
+                price_list_version INTEGER,
+                last_sell_report_date VARCHAR,
+                last_sell_report_value FLOAT,
+                updated_at DATETIME
+            )
+        """))
+
+
+# Statistics from near-empty tables make the planner prefer full scans
+# (e.g. scanning a one-row invoices table for every item), so small
+# tables are left to the planner's index-friendly defaults.
+ANALYZE_MIN_ROWS = 1000
+
+HOT_QUERY_INDEXES = (
+    ("sell_reports", "ix_sell_reports_report_date", "report_date"),
+    ("sell_reports", "ix_sell_reports_created_at", "created_at"),
+    ("invoices", "ix_invoices_created_at", "created_at"),
+    ("invoice_items", "ix_invoice_items_sku", "brand_number, pack_size_case, pack_size_quantity_ml"),
+    ("price_list", "ix_price_list_brand_pack_volume", "brand_number, pack_type, volume_ml"),
+    ("sell_finance", "ix_sell_finance_created_at", "created_at"),
+    ("audit_logs", "ix_audit_logs_created_at", "created_at"),
+)
+
+
+def ensure_hot_query_indexes(engine):
+    """
+    Creates the indexes behind the hot report/prepare queries and runs
+    ANALYZE on those tables that are big enough for statistics to help.
+    """
+    with engine.begin() as conn:
+        tables = {
+            row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type='table'"))
+        }
+        for table, name, columns in HOT_QUERY_INDEXES:
+            if table in tables:
+                conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"))
+        for table in sorted({t for t, _, _ in HOT_QUERY_INDEXES} & tables):
+            rows = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+            if rows >= ANALYZE_MIN_ROWS:
+                conn.execute(text(f"ANALYZE {table}"))
+
+
+def ensure_sell_finance_payment_tables(engine):
+    SellFinancePhonePay.__table__.create(bind=engine, checkfirst=True)
+    SellFinanceCash.__table__.create(bind=engine, checkfirst=True)
+
+
+AUDIT_LOG_FILTER_INDEXES = (
+    ("ix_audit_logs_username_created_at", "username, created_at"),
+    ("ix_audit_logs_role_created_at", "role, created_at"),
+    ("ix_audit_logs_action_created_at", "action, created_at"),
+    ("ix_audit_logs_entity_type_created_at", "entity_type, created_at"),
+)
+
+
+def ensure_audit_log_filter_indexes(engine):
+    """
+    Replaces the single-column username/role/action indexes with
+    (column, created_at) indexes that also serve the keyset order.
+    """
+    with engine.begin() as conn:
+        table_exists = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table' AND name='audit_logs'")
+        ).fetchone()
+        if not table_exists:
+            return
+        for name, columns in AUDIT_LOG_FILTER_INDEXES:
+            conn.execute(text(f"CREATE INDEX IF NOT EXISTS {name} ON audit_logs ({columns})"))
+        for column in ("username", "role", "action"):
+            conn.execute(text(f"DROP INDEX IF EXISTS ix_audit_logs_{column}"))
+        rows = conn.execute(text("SELECT COUNT(*) FROM audit_logs")).scalar()
+        if rows >= ANALYZE_MIN_ROWS:
+            conn.execute(text("ANALYZE audit_logs"))
+
+
+def ensure_incremental_auto_vacuum(engine):
+    """
+    Switches the database to auto_vacuum=INCREMENTAL so the audit retention
+    job can hand freed pages back with PRAGMA incremental_vacuum. Changing
+    the mode on an existing file needs one full VACUUM.
+    """
+    with engine.connect() as conn:
+        if conn.exec_driver_sql("PRAGMA auto_vacuum").scalar() == 2:
+            return
+        conn.exec_driver_sql("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.exec_driver_sql("VACUUM")
+
+
+def ensure_stock_movements_support(engine):
+    """
+    Creates the stock movement ledger. An empty ledger gets one opening
+    movement per present stock row, so the ledger sums to present stock
+    from the start.
+    """
+    StockMovement.__table__.create(bind=engine, checkfirst=True)
+    with engine.begin() as conn:
+        if conn.execute(text("SELECT 1 FROM stock_movements LIMIT 1")).fetchone():
+            return
+        table_exists = conn.execute(
+            text("SELECT name FROM sqlite_master WHERE type='table' AND name='present_stock_details'")
+        ).fetchone()
+        if not table_exists:
+            return
+        conn.execute(text("""
+            INSERT INTO stock_movements (
+                movement_date, kind, reference, brand_number, pack_size_case, pack_size_quantity_ml,
+                cases_delta, bottles_delta, amount_delta, created_by
+            )
+            SELECT
+                date('now'), 'opening', NULL, brand_number, pack_size_case, pack_size_quantity_ml,
+                COALESCE(total_cases, 0), COALESCE(total_bottles, 0), COALESCE(total_amount, 0.0), 'migration'
+            FROM present_stock_details
+            ORDER BY id
+        """))
+
+
+def ensure_stock_snapshots_support(engine):
+    StockSnapshot.__table__.create(bind=engine, checkfirst=True)
+
+
+def ensure_stock_movement_reference_index(engine):
+    """Lets an invoice delete find the movements its upload recorded."""
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_stock_movements_reference_kind ON stock_movements (reference, kind)"
+        ))
+
+
+# Ordered (version, name, step). Steps must be safe to re-run: databases
+# created before schema_version existed replay all of them once. Append new
+# steps with the next version number; never renumber.
+MIGRATIONS = (
+    (1, "invoice_totals_tax_columns", ensure_invoice_totals_tax_columns),
+    (2, "sell_finance_outside_income", ensure_sell_finance_outside_income_support),
+    (3, "user_brand_aliases", ensure_user_brand_aliases_support),
+    (4, "user_brand_sort_preferences", ensure_user_brand_sort_preferences_support),
+    (5, "upload_jobs", ensure_upload_jobs_support),
+    (6, "cache_versions", ensure_cache_versions_support),
+    (7, "sell_report_latest_index", ensure_sell_report_latest_index),
+    (8, "dashboard_snapshot", ensure_dashboard_snapshot_support),
+    (9, "hot_query_indexes", ensure_hot_query_indexes),
+    (10, "sell_finance_payment_tables", ensure_sell_finance_payment_tables),
+    (11, "audit_log_filter_indexes", ensure_audit_log_filter_indexes),
+    (12, "incremental_auto_vacuum", ensure_incremental_auto_vacuum),
+    (13, "stock_movements", ensure_stock_movements_support),
+    (14, "stock_snapshots", ensure_stock_snapshots_support),
+    (15, "seed_cache_versions", seed_cache_versions),
+    (16, "upload_job_worker", ensure_upload_job_worker_column),
+    (17, "stock_movement_reference_index", ensure_stock_movement_reference_index),
+)
+
+
+def get_schema_version(engine):
+    with engine.connect() as conn:
+        try:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+        except OperationalError:
+            return 0
+
+
+def run_migrations(engine):
+    """
+    Applies the registered migrations newer than the stored schema version,
+    in order, recording each one in schema_version. An up-to-date database
+    costs a single version read. Returns the resulting version.
+    """
+    current = get_schema_version(engine)
+    if current >= MIGRATIONS[-1][0]:
+        return current
+
+    with engine.begin() as conn:
+        conn.execute(text("""
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR,
+                applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+            )
+        """))
+
+    for version, name, step in MIGRATIONS:
+        if version <= current:
+            continue
+        step(engine)
+        with engine.begin() as conn:
+            conn.execute(
+                text("INSERT OR IGNORE INTO schema_version (version, name) VALUES (:version, :name)"),
+                {"version": version, "name": name}
+            )
+        current = version
+    return current
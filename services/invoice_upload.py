@@ -0,0 +1,384 @@
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from sqlalchemy import and_, func, or_
+
+from config import EXPECTED_RETAILER_CODE, UPLOAD_PARSE_WORKERS
+from models import Invoice, InvoiceItem, InvoiceTotals, PresentStockDetail, PriceListItem, StockMovement
+from services.parse_cache import parse_invoices_cached
+from services.sales_utils import parse_report_date
+from services.stock_ledger import INVOICE, INVOICE_DELETE, movement_row, record_movements
+from services.stock_service import adjust_stock_summary
+
+_parse_pool = None
+
+
+def get_parse_pool():
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(max_workers=UPLOAD_PARSE_WORKERS)
+    return _parse_pool
+
+
+def retailer_code_matches(data):
+    retailer_code = str(data.get("retailer", {}).get("code", "")).strip()
+    return retailer_code == EXPECTED_RETAILER_CODE
+
+
+def parse_invoices_parallel(paths):
+    """
+    Parses PDFs in the process pool. PDFs already in the parse cache are
+    not sent to the pool. Returns one (data, timings, error) tuple per
+    path, in the same order as paths.
+    """
+    return parse_invoices_cached(paths, get_parse_pool())
+
+
+def invoice_sort_key(data):
+    invoice_dt = parse_report_date(data.get("invoice_meta", {}).get("invoice_date", ""))
+    return (
+        invoice_dt is None,
+        invoice_dt or datetime.min.date(),
+        data.get("invoice_meta", {}).get("invoice_number", ""),
+    )
+
+
+def _load_price_rows(db, brand_numbers):
+    """
+    One keyed query for the price rows an invoice needs, mapped by
+    (brand_number, pack_type, volume_ml) -> mrp.
+    """
+    if not brand_numbers:
+        return {}
+    rows = db.query(
+        PriceListItem.brand_number,
+        PriceListItem.pack_type,
+        PriceListItem.volume_ml,
+        PriceListItem.mrp,
+    ).filter(PriceListItem.brand_number.in_(brand_numbers)).order_by(PriceListItem.id.asc()).all()
+    price_map = {}
+    for brand_number, pack_type, volume_ml, mrp in rows:
+        price_map.setdefault((brand_number, pack_type, volume_ml), mrp)
+    return price_map
+
+
+STOCK_UPDATE_COLUMNS = (
+    "id",
+    "total_cases",
+    "total_bottles",
+    "total_amount",
+    "rate_per_case",
+    "unit_rate_per_bottle",
+)
+
+
+def _load_stock_rows(db, brand_numbers):
+    """
+    One keyed query for the present stock rows an invoice touches, mapped
+    by (brand_number, pack_size_case, pack_size_quantity_ml).
+    """
+    if not brand_numbers:
+        return {}
+    columns = [getattr(PresentStockDetail, c) for c in STOCK_UPDATE_COLUMNS]
+    rows = db.query(
+        PresentStockDetail.brand_number,
+        PresentStockDetail.pack_size_case,
+        PresentStockDetail.pack_size_quantity_ml,
+        *columns,
+    ).filter(PresentStockDetail.brand_number.in_(brand_numbers)).order_by(PresentStockDetail.id.asc()).all()
+    stock_map = {}
+    for r in rows:
+        key = (r[0], r[1], r[2])
+        if key not in stock_map:
+            stock_map[key] = dict(zip(STOCK_UPDATE_COLUMNS, r[3:]))
+    return stock_map
+
+
+def store_invoice(db, data, username):
+    """
+    Adds the invoice, its totals and items, and applies the items to
+    present stock and the stock summary. Does not commit.
+    """
+    invoice = Invoice(
+        invoice_number=data["invoice_meta"]["invoice_number"],
+        invoice_date=data["invoice_meta"]["invoice_date"],
+        retailer_name=data["retailer"]["name"],
+        retailer_code=data["retailer"]["code"],
+        licensee_pan=data["licensee"]["pan"],
+        uploaded_by=username,
+        uploaded_at=datetime.utcnow()
+    )
+    db.add(invoice)
+    db.flush()
+
+    invoice_number = invoice.invoice_number
+
+    totals_data = data.get("totals", {})
+    totals = InvoiceTotals(
+        invoice_number=invoice_number,
+        e_challan_amount=totals_data.get("e_challan_amount", 0.0),
+        previous_credit=totals_data.get("previous_credit", 0.0),
+        sub_total=totals_data.get("sub_total", 0.0),
+        special_excise_cess=totals_data.get("special_excise_cess", 0.0),
+        tcs=totals_data.get("tcs", 0.0),
+        new_retailer_professional_tax=totals_data.get("new_retailer_professional_tax", 0.0),
+        retail_shop_excise_turnover_tax=totals_data.get("retail_shop_excise_turnover_tax", 0.0),
+        less_this_invoice_value=totals_data.get("less_this_invoice_value", 0.0),
+        retailer_credit_balance=totals_data.get("retailer_credit_balance", 0.0),
+        invoice_value=totals_data.get("invoice_value", 0.0),
+        mrp_round_off=totals_data.get("mrp_round_off", 0.0),
+        net_invoice_value=totals_data.get("net_invoice_value", 0.0),
+        total_invoice_value=totals_data.get("total_invoice_value", 0.0)
+    )
+    db.add(totals)
+
+    invoice_date = invoice.invoice_date
+    items = data["items"]
+    brand_numbers = sorted({item.get("brand_number") for item in items if item.get("brand_number")})
+    price_map = _load_price_rows(db, brand_numbers)
+    stock_map = _load_stock_rows(db, brand_numbers)
+
+    item_rows = []
+    stock_updates = {}
+    stock_inserts = {}
+    summary_cases = 0
+    summary_amount = 0.0
+    summary_item_name = None
+    movements = []
+    movement_date = parse_report_date(invoice_date)
+    now = datetime.utcnow()
+    for item in items:
+        item_rows.append(dict(item, invoice_number=invoice_number))
+
+        item_name = item.get("brand_name") or ""
+        item_ml = item.get("pack_size_quantity_ml") or 0
+        item_case = item.get("pack_size_case") or 0
+        item_display = f"{item_name} {item_ml}ml/{item_case}"
+
+        price_mrp = price_map.get((item.get("brand_number"), item.get("pack_type"), item.get("pack_size_quantity_ml")))
+        mrp = float(price_mrp) if price_mrp is not None else None
+        item_cases = item.get("cases_delivered") or 0
+        item_bottles = item.get("bottles_delivered") or 0
+        total_bottles = int(item_cases) * int(item_case or 0) + int(item_bottles)
+        unit_rate = mrp
+        rate_per_case = (float(mrp) * float(item_case)) if (mrp is not None and item_case) else None
+        total_amount = (float(mrp) * float(total_bottles)) if mrp is not None else 0.0
+
+        key = (item.get("brand_number"), item.get("pack_size_case"), item.get("pack_size_quantity_ml"))
+        existing = stock_map.get(key)
+        if existing:
+            stock = stock_updates.setdefault(existing["id"], dict(existing))
+        elif key in stock_inserts:
+            stock = stock_inserts[key]
+        else:
+            stock = stock_inserts[key] = {
+                "brand_number": item.get("brand_number"),
+                "brand_name": item.get("brand_name"),
+                "product_type": item.get("product_type"),
+                "pack_type": item.get("pack_type"),
+                "pack_size_case": item.get("pack_size_case"),
+                "pack_size_quantity_ml": item.get("pack_size_quantity_ml"),
+                "total_cases": 0,
+                "total_bottles": 0,
+                "rate_per_case": None,
+                "unit_rate_per_bottle": None,
+                "total_amount": 0.0,
+            }
+
+        stock["total_cases"] = (stock["total_cases"] or 0) + (item.get("cases_delivered") or 0)
+        stock["total_bottles"] = (stock["total_bottles"] or 0) + (item.get("bottles_delivered") or 0)
+        stock["total_amount"] = (stock["total_amount"] or 0.0) + total_amount
+        if unit_rate is not None:
+            stock["unit_rate_per_bottle"] = unit_rate
+        if rate_per_case is not None:
+            stock["rate_per_case"] = rate_per_case
+        stock["last_invoice_date"] = invoice_date
+        stock["last_updated_item_name"] = item_display
+        stock["updated_at"] = now
+
+        summary_cases += item.get("cases_delivered") or 0
+        summary_amount += total_amount
+        summary_item_name = item_display
+        movements.append(movement_row(
+            db, key, item.get("cases_delivered") or 0, item.get("bottles_delivered") or 0, total_amount,
+            kind=INVOICE, reference=invoice_number, movement_date=movement_date, created_by=username,
+        ))
+
+    if item_rows:
+        db.bulk_insert_mappings(InvoiceItem, item_rows)
+    if stock_inserts:
+        db.bulk_insert_mappings(PresentStockDetail, list(stock_inserts.values()))
+    if stock_updates:
+        db.bulk_update_mappings(PresentStockDetail, list(stock_updates.values()))
+    # Bulk mappings skip the ORM flush events, so the ledger and the
+    # summary are updated here.
+    record_movements(db, movements)
+    adjust_stock_summary(db, summary_cases, summary_amount, summary_item_name)
+
+    return invoice
+
+
+def _sku_filter(model, keys):
+    # Every (brand_number, pack_size_case, pack_size_quantity_ml) in keys
+    # and possibly a few more combinations; NULL brand numbers match NULL.
+    brand_numbers = {k[0] for k in keys}
+    brand_filter = model.brand_number.in_(sorted(b for b in brand_numbers if b is not None))
+    if None in brand_numbers:
+        brand_filter = or_(brand_filter, model.brand_number.is_(None))
+    return and_(
+        brand_filter,
+        model.pack_size_case.in_({k[1] for k in keys}),
+        model.pack_size_quantity_ml.in_({k[2] for k in keys}),
+    )
+
+
+def _latest_invoice_dates(db, keys, invoice_number):
+    """
+    Date of the last uploaded invoice, other than invoice_number, that has
+    an item for each (brand_number, pack_size_case, pack_size_quantity_ml)
+    in keys. SKUs with no other invoice are left out.
+    """
+    latest = db.query(
+        InvoiceItem.brand_number,
+        InvoiceItem.pack_size_case,
+        InvoiceItem.pack_size_quantity_ml,
+        func.max(Invoice.id).label("invoice_id"),
+    ).join(Invoice, Invoice.invoice_number == InvoiceItem.invoice_number).filter(
+        _sku_filter(InvoiceItem, keys),
+        InvoiceItem.invoice_number != invoice_number,
+    ).group_by(
+        InvoiceItem.brand_number,
+        InvoiceItem.pack_size_case,
+        InvoiceItem.pack_size_quantity_ml,
+    ).subquery()
+    rows = db.query(
+        latest.c.brand_number,
+        latest.c.pack_size_case,
+        latest.c.pack_size_quantity_ml,
+        Invoice.invoice_date,
+    ).join(Invoice, Invoice.id == latest.c.invoice_id).all()
+    return {(r[0], r[1], r[2]): r[3] for r in rows if (r[0], r[1], r[2]) in keys}
+
+
+def _uploaded_movements(db, invoice_number):
+    """
+    Cases, bottles and amount per SKU that the invoice's upload recorded in
+    the ledger. A re-uploaded invoice number only counts movements after
+    its last delete. Empty for invoices uploaded before the ledger existed.
+    """
+    last_delete_id = db.query(func.max(StockMovement.id)).filter(
+        StockMovement.reference == invoice_number,
+        StockMovement.kind == INVOICE_DELETE,
+    ).scalar() or 0
+    rows = db.query(
+        StockMovement.brand_number,
+        StockMovement.pack_size_case,
+        StockMovement.pack_size_quantity_ml,
+        func.sum(StockMovement.cases_delta),
+        func.sum(StockMovement.bottles_delta),
+        func.sum(StockMovement.amount_delta),
+    ).filter(
+        StockMovement.reference == invoice_number,
+        StockMovement.kind == INVOICE,
+        StockMovement.id > last_delete_id,
+    ).group_by(
+        StockMovement.brand_number,
+        StockMovement.pack_size_case,
+        StockMovement.pack_size_quantity_ml,
+    ).all()
+    return {(r[0], r[1], r[2]): (int(r[3] or 0), int(r[4] or 0), float(r[5] or 0.0)) for r in rows}
+
+
+def reverse_invoice(db, invoice_number):
+    """
+    Takes an invoice's items back out of present stock and the stock
+    summary, the reverse of what store_invoice applied. The amounts come
+    from the movements the upload recorded, so a later MRP change does not
+    alter them; invoices uploaded before the ledger fall back to MRP times
+    bottles. Only the stock rows the invoice touched are read and written,
+    and no total goes below zero. Call before deleting the invoice items.
+    Does not commit. Returns a report of what was changed.
+    """
+    items = db.query(
+        InvoiceItem.brand_number,
+        InvoiceItem.pack_type,
+        InvoiceItem.pack_size_case,
+        InvoiceItem.pack_size_quantity_ml,
+        InvoiceItem.cases_delivered,
+        InvoiceItem.bottles_delivered,
+    ).filter(InvoiceItem.invoice_number == invoice_number).order_by(InvoiceItem.id.asc()).all()
+
+    brand_numbers = sorted({it.brand_number for it in items if it.brand_number})
+    stock_map = _load_stock_rows(db, brand_numbers)
+    uploaded = _uploaded_movements(db, invoice_number)
+    price_map = {} if uploaded else _load_price_rows(db, brand_numbers)
+
+    removals = {}
+    missing = 0
+    for it in items:
+        key = (it.brand_number, it.pack_size_case, it.pack_size_quantity_ml)
+        if key not in stock_map:
+            missing += 1
+            continue
+        if uploaded:
+            removals[key] = uploaded.get(key, (0, 0, 0.0))
+            continue
+        price_mrp = price_map.get((it.brand_number, it.pack_type, it.pack_size_quantity_ml))
+        item_cases = it.cases_delivered or 0
+        item_bottles = it.bottles_delivered or 0
+        total_bottles = int(item_cases) * int(it.pack_size_case or 0) + int(item_bottles)
+        total_amount = (float(price_mrp) * float(total_bottles)) if price_mrp is not None else 0.0
+        cases, bottles, amount = removals.get(key, (0, 0, 0.0))
+        removals[key] = (cases + item_cases, bottles + item_bottles, amount + total_amount)
+
+    stock_updates = {}
+    for key, (cases, bottles, amount) in removals.items():
+        existing = stock_map[key]
+        stock = stock_updates[existing["id"]] = dict(existing, key=key)
+        stock["total_cases"] = (stock["total_cases"] or 0) - cases
+        stock["total_bottles"] = (stock["total_bottles"] or 0) - bottles
+        stock["total_amount"] = (stock["total_amount"] or 0.0) - amount
+
+    cases_removed = 0
+    amount_removed = 0.0
+    clamped = 0
+    movements = []
+    for stock in stock_updates.values():
+        before = stock_map[stock["key"]]
+        if stock["total_cases"] < 0 or stock["total_bottles"] < 0 or stock["total_amount"] < 0:
+            clamped += 1
+        stock["total_cases"] = max(stock["total_cases"], 0)
+        stock["total_bottles"] = max(stock["total_bottles"], 0)
+        stock["total_amount"] = max(stock["total_amount"], 0.0)
+        cases_removed += (before["total_cases"] or 0) - stock["total_cases"]
+        amount_removed += (before["total_amount"] or 0.0) - stock["total_amount"]
+        movements.append(movement_row(
+            db,
+            stock["key"],
+            stock["total_cases"] - (before["total_cases"] or 0),
+            stock["total_bottles"] - (before["total_bottles"] or 0),
+            stock["total_amount"] - (before["total_amount"] or 0.0),
+            kind=INVOICE_DELETE,
+            reference=invoice_number,
+        ))
+
+    keys = {stock["key"] for stock in stock_updates.values()}
+    invoice_dates = _latest_invoice_dates(db, keys, invoice_number) if keys else {}
+    now = datetime.utcnow()
+    for stock in stock_updates.values():
+        stock["last_invoice_date"] = invoice_dates.get(stock.pop("key"), "")
+        stock["updated_at"] = now
+
+    if stock_updates:
+        db.bulk_update_mappings(PresentStockDetail, list(stock_updates.values()))
+        record_movements(db, movements)
+        adjust_stock_summary(db, -cases_removed, -amount_removed)
+
+    return {
+        "items": len(items),
+        "stock_rows": len(stock_updates),
+        "missing_stock_rows": missing,
+        "clamped_stock_rows": clamped,
+        "cases_removed": cases_removed,
+        "amount_removed": round(amount_removed, 2),
+    }
@@ -0,0 +1,71 @@
+import json
+from types import GeneratorType
+
+from flask import Response, stream_with_context
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":"))
+
+
+def _is_stream(value):
+    return isinstance(value, GeneratorType)
+
+
+def _iter_json(value):
+    if _is_stream(value):
+        yield "["
+        first = True
+        for item in value:
+            if not first:
+                yield ","
+            first = False
+            yield from _iter_json(item)
+        yield "]"
+    elif isinstance(value, dict) and any(_is_stream(v) for v in value.values()):
+        yield "{"
+        for i, key in enumerate(sorted(value)):
+            yield ("," if i else "") + json.dumps(key) + ":"
+            yield from _iter_json(value[key])
+        yield "}"
+    else:
+        yield _dumps(value)
+
+
+def _buffered(value):
+    buf = []
+    size = 0
+    for part in _iter_json(value):
+        buf.append(part)
+        size += len(part)
+        if size >= CHUNK_SIZE:
+            yield "".join(buf)
+            buf = []
+            size = 0
+    buf.append("\n")
+    yield "".join(buf)
+
+
+def json_stream_response(payload):
+    """
+    Streams payload as JSON. Generators anywhere in the payload (as a
+    value or as a dict value) are written out as JSON arrays while they
+    are consumed, so large row sets never sit in memory as one list. The
+    request context, and with it the request's DB session, stays open
+    until the last chunk is sent.
+    """
+    return Response(stream_with_context(_buffered(payload)), mimetype="application/json")
+
+
+def iter_chunks(rows, size):
+    """Groups an iterable of rows into lists of at most size rows."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
@@ -0,0 +1,56 @@
+import base64
+import json
+
+from config import PAGE_MAX_LIMIT
+
+
+def encode_cursor(*values):
+    raw = json.dumps(list(values), separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, size):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, TypeError):
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError("invalid cursor")
+    if not all(isinstance(v, (str, int, float)) for v in values):
+        raise ValueError("invalid cursor")
+    return values
+
+
+def get_page_args(args, cursor_size=1, default_limit=None):
+    """
+    Reads limit/cursor from the query string. Returns (limit, cursor
+    values); limit is default_limit when the caller did not ask for a
+    page. Raises ValueError with a client-facing message on bad input.
+    """
+    limit = args.get("limit")
+    cursor = args.get("cursor")
+    if limit is None and default_limit is not None:
+        limit = default_limit
+    if limit is None:
+        if cursor:
+            raise ValueError("cursor requires limit")
+        return None, None
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit must be an integer")
+    if limit < 1 or limit > PAGE_MAX_LIMIT:
+        raise ValueError(f"limit must be between 1 and {PAGE_MAX_LIMIT}")
+    return limit, (decode_cursor(cursor, cursor_size) if cursor else None)
+
+
+def split_page(rows, limit, cursor_values):
+    """
+    Takes rows fetched with LIMIT limit + 1 and returns (page rows, next
+    cursor or None). cursor_values(row) gives the keyset values of a row.
+    """
+    page = rows[:limit]
+    if len(rows) > limit and page:
+        return page, encode_cursor(*cursor_values(page[-1]))
+    return page, None
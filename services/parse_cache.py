@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+from config import PARSE_CACHE_FOLDER, PARSE_CACHE_MAX_ENTRIES
+from pdf_parser import parse_invoice_pdf_with_timings
+
+# Bump when pdf_parser's output changes so cached results are parsed again.
+PARSER_VERSION = 1
+
+
+def file_sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _entry_path(digest):
+    return os.path.join(PARSE_CACHE_FOLDER, f"{digest}.v{PARSER_VERSION}.json")
+
+
+def get_cached_parse(digest):
+    path = _entry_path(digest)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    try:
+        # mtime doubles as the LRU clock
+        os.utime(path, None)
+    except OSError:
+        pass
+    return data
+
+
+def store_parsed(digest, data):
+    """
+    Caches a parse result. Best effort: a failed write only costs a
+    re-parse later, so it never fails the caller.
+    """
+    path = _entry_path(digest)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        os.makedirs(PARSE_CACHE_FOLDER, exist_ok=True)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        return
+    finally:
+        if os.path.exists(tmp_path):
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    _evict()
+
+
+def _evict():
+    try:
+        entries = [
+            e for e in os.scandir(PARSE_CACHE_FOLDER)
+            if e.is_file() and e.name.endswith(".json")
+        ]
+    except OSError:
+        return
+    overflow = len(entries) - PARSE_CACHE_MAX_ENTRIES
+    if overflow <= 0:
+        return
+    entries.sort(key=lambda e: e.stat().st_mtime)
+    for e in entries[:overflow]:
+        try:
+            os.remove(e.path)
+        except OSError:
+            pass
+
+
+def cached_parse_result(digest):
+    """
+    Returns (data, timings) for a cache hit, or None. The timings dict
+    marks the hit so callers can report it like a normal parse.
+    """
+    t0 = time.perf_counter()
+    data = get_cached_parse(digest)
+    if data is None:
+        return None
+    return data, {"cache_hit": True, "total_ms": round((time.perf_counter() - t0) * 1000, 2)}
+
+
+def _store_fresh(digest, data, timings):
+    timings["cache_hit"] = False
+    store_parsed(digest, data)
+    return data, timings
+
+
+def parse_invoice_cached(path, digest=None, pool=None):
+    """
+    Parses the PDF at path unless a result for the same bytes is cached.
+    A miss is parsed in pool (an executor) when one is given, otherwise in
+    the calling thread. Returns (data, timings, digest).
+    """
+    digest = digest or file_sha256(path)
+    hit = cached_parse_result(digest)
+    if hit:
+        return hit[0], hit[1], digest
+    if pool is None:
+        data, timings = parse_invoice_pdf_with_timings(path)
+    else:
+        data, timings = pool.submit(parse_invoice_pdf_with_timings, path).result()
+    data, timings = _store_fresh(digest, data, timings)
+    return data, timings, digest
+
+
+def parse_invoices_cached(paths, pool):
+    """
+    parse_invoice_cached for many PDFs: every miss is submitted to pool
+    before any result is awaited. Returns one (data, timings, error) tuple
+    per path, in the same order as paths.
+    """
+    digests = [file_sha256(p) for p in paths]
+    pending = {}
+    results = [None] * len(paths)
+    for idx, (path, digest) in enumerate(zip(paths, digests)):
+        hit = cached_parse_result(digest)
+        if hit:
+            results[idx] = (hit[0], hit[1], None)
+        else:
+            pending[idx] = pool.submit(parse_invoice_pdf_with_timings, path)
+
+    for idx, fut in pending.items():
+        try:
+            data, timings = _store_fresh(digests[idx], *fut.result())
+            results[idx] = (data, timings, None)
+        except Exception as e:
+            results[idx] = (None, None, str(e) or e.__class__.__name__)
+    return results
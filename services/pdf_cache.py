@@ -0,0 +1,82 @@
+import hashlib
+import json
+import os
+import re
+import threading
+
+from flask import Response, request, send_file
+
+from config import REQUESTED_PDF_FOLDER
+
+# Bump when the PDF layout changes so every cached file is rebuilt.
+PDF_LAYOUT_VERSION = 1
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def pdf_content_digest(*parts):
+    """
+    Hashes the rows a PDF is rendered from. Equal digests mean an identical
+    PDF, so the digest is both the cache key and the ETag.
+    """
+    raw = json.dumps([PDF_LAYOUT_VERSION, *parts], default=str, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _remove_stale(folder, base_name, keep):
+    prefix = f"{base_name}."
+    try:
+        entries = list(os.scandir(folder))
+    except OSError:
+        return
+    for e in entries:
+        name = e.name
+        if (
+            name != keep
+            and name.startswith(prefix)
+            and name.endswith(".pdf")
+            and _DIGEST.fullmatch(name[len(prefix):-4])
+        ):
+            try:
+                os.remove(e.path)
+            except OSError:
+                pass
+
+
+def _not_modified(digest):
+    rv = Response(status=304)
+    rv.set_etag(digest)
+    rv.cache_control.no_cache = True
+    return rv
+
+
+def cached_pdf_response(subfolder, base_name, download_name, digest, render):
+    """
+    Serves the PDF for digest from requested_pdf/<subfolder>, calling
+    render(path) to build it only when no file for that digest exists.
+    Answers 304 when the client's If-None-Match already holds the digest.
+    Older versions of the same base_name are removed once a new one is
+    written.
+    """
+    if request.if_none_match.contains(digest):
+        return _not_modified(digest)
+
+    folder = os.path.join(REQUESTED_PDF_FOLDER, subfolder)
+    filename = f"{base_name}.{digest}.pdf"
+    path = os.path.join(folder, filename)
+    hit = os.path.exists(path)
+    if not hit:
+        os.makedirs(folder, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            render(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        _remove_stale(folder, base_name, filename)
+
+    rv = send_file(path, as_attachment=True, download_name=download_name, etag=digest, conditional=True)
+    rv.cache_control.no_cache = True
+    rv.headers["X-PDF-Cache"] = "hit" if hit else "miss"
+    return rv
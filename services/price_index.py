@@ -0,0 +1,106 @@
+import threading
+
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+
+from database import SessionLocal
+from models import PriceListItem
+
+PRICE_LIST_CACHE = "price_list"
+
+_lock = threading.Lock()
+_index = None
+
+
+class PriceIndex:
+    """
+    Read-only lookup tables built from one scan of price_list.
+
+    mrp_by_pack:   (brand_number, pack_type, volume_ml) -> float mrp
+    mrp_by_volume: (brand_number, volume_ml) -> mrp as stored
+    brand_catalog: [(brand_number, brand_name)] ordered by product_name
+    """
+
+    def __init__(self, version, rows):
+        self.version = version
+        self.mrp_by_pack = {}
+        self.mrp_by_volume = {}
+        for r in rows:
+            brand_number = str(r.brand_number or "").strip()
+            volume_ml = int(r.volume_ml or 0)
+            pack_key = (brand_number, str(r.pack_type or "").strip(), volume_ml)
+            if pack_key not in self.mrp_by_pack:
+                self.mrp_by_pack[pack_key] = float(r.mrp or 0.0)
+            volume_key = (brand_number, volume_ml)
+            if volume_key not in self.mrp_by_volume:
+                self.mrp_by_volume[volume_key] = r.mrp
+
+        self.brand_catalog = []
+        self.brand_numbers = set()
+        by_name = sorted(rows, key=lambda r: (r.product_name is not None, r.product_name or ""))
+        for r in by_name:
+            brand_number = str(r.brand_number or "").strip()
+            if not brand_number or brand_number in self.brand_numbers:
+                continue
+            self.brand_numbers.add(brand_number)
+            brand_name = str(r.product_name or "").strip() or brand_number
+            self.brand_catalog.append((brand_number, brand_name))
+
+
+def _read_version(db):
+    # A missing row (or table) counts as version 0, which the first
+    # bump_price_list_version moves on from, so the index is still cached.
+    try:
+        version = db.execute(
+            text("SELECT version FROM cache_versions WHERE name = :name"),
+            {"name": PRICE_LIST_CACHE}
+        ).scalar()
+    except OperationalError:
+        return 0
+    return int(version or 0)
+
+
+def get_price_index(db):
+    """
+    Returns the process-wide price index, rebuilding it only when the
+    stored price_list version has moved since it was built.
+    """
+    global _index
+    version = _read_version(db)
+    current = _index
+    if current is not None and current.version == version:
+        return current
+
+    with _lock:
+        if _index is not None and _index.version == version:
+            return _index
+        try:
+            rows = db.query(
+                PriceListItem.brand_number,
+                PriceListItem.pack_type,
+                PriceListItem.volume_ml,
+                PriceListItem.mrp,
+                PriceListItem.product_name,
+            ).order_by(PriceListItem.id.asc()).all()
+        except OperationalError:
+            return PriceIndex(version, [])
+        _index = PriceIndex(version, rows)
+        return _index
+
+
+def bump_price_list_version(db):
+    db.execute(
+        text(
+            "INSERT INTO cache_versions (name, version) VALUES (:name, 1) "
+            "ON CONFLICT(name) DO UPDATE SET version = version + 1"
+        ),
+        {"name": PRICE_LIST_CACHE}
+    )
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _bump_on_price_list_write(session, flush_context, instances):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, PriceListItem):
+            bump_price_list_version(session)
+            return
@@ -0,0 +1,124 @@
+import re
+
+from sqlalchemy import text
+
+# (name, sql, params, index the plan is expected to use)
+HOT_QUERIES = (
+    (
+        "latest_sell_report",
+        "SELECT report_date FROM sell_reports ORDER BY created_at DESC LIMIT 1",
+        {},
+        "ix_sell_reports_created_at",
+    ),
+    (
+        "sell_report_by_date",
+        "SELECT id, stock_id, sell_amount FROM sell_reports WHERE report_date = :report_date",
+        {"report_date": "2025-01-01"},
+        "ix_sell_reports_report_date",
+    ),
+    (
+        "latest_report_per_stock",
+        "SELECT id, ROW_NUMBER() OVER (PARTITION BY stock_id ORDER BY created_at DESC, id DESC) "
+        "FROM sell_reports",
+        {},
+        "ix_sell_reports_stock_id_created_at",
+    ),
+    (
+        "invoice_additions_since",
+        "SELECT i.brand_number, i.pack_size_case, i.pack_size_quantity_ml, v.created_at, "
+        "SUM(i.cases_delivered), SUM(i.bottles_delivered) "
+        "FROM invoice_items i JOIN invoices v ON v.invoice_number = i.invoice_number "
+        "WHERE i.brand_number IN (:b1, :b2) AND v.created_at > :since "
+        "GROUP BY i.brand_number, i.pack_size_case, i.pack_size_quantity_ml, v.created_at",
+        {"b1": "0001", "b2": "0002", "since": "2025-01-01 00:00:00"},
+        "ix_invoice_items_sku",
+    ),
+    (
+        "invoice_items_by_sku",
+        "SELECT cases_delivered, bottles_delivered FROM invoice_items "
+        "WHERE brand_number = :brand_number AND pack_size_case = :pack_size_case "
+        "AND pack_size_quantity_ml = :pack_size_quantity_ml",
+        {"brand_number": "0001", "pack_size_case": 12, "pack_size_quantity_ml": 750},
+        "ix_invoice_items_sku",
+    ),
+    (
+        "price_by_pack",
+        "SELECT mrp FROM price_list "
+        "WHERE brand_number = :brand_number AND pack_type = :pack_type AND volume_ml = :volume_ml",
+        {"brand_number": "0001", "pack_type": "G", "volume_ml": 750},
+        "ix_price_list_brand_pack_volume",
+    ),
+    (
+        "latest_sell_finance",
+        "SELECT final_balance FROM sell_finance ORDER BY created_at DESC LIMIT 1",
+        {},
+        "ix_sell_finance_created_at",
+    ),
+    (
+        "recent_audit_logs",
+        "SELECT id, action FROM audit_logs ORDER BY created_at DESC LIMIT 200",
+        {},
+        "ix_audit_logs_created_at",
+    ),
+    (
+        "audit_logs_by_username_page",
+        "SELECT id FROM audit_logs WHERE username = :username "
+        "AND created_at <= :created_at AND (created_at < :created_at OR id < :id) "
+        "ORDER BY created_at DESC, id DESC LIMIT 201",
+        {"username": "owner", "created_at": "2025-01-01 00:00:00", "id": 1000},
+        "ix_audit_logs_username_created_at",
+    ),
+    (
+        "audit_logs_by_action_in_range",
+        "SELECT id FROM audit_logs WHERE action = :action "
+        "AND created_at >= :date_from AND created_at < :date_to "
+        "ORDER BY created_at DESC, id DESC LIMIT 201",
+        {"action": "LOGIN", "date_from": "2025-01-01", "date_to": "2025-02-01"},
+        "ix_audit_logs_action_created_at",
+    ),
+    (
+        "stock_snapshot_on_or_before",
+        "SELECT snapshot_date, last_movement_id FROM stock_snapshots "
+        "WHERE snapshot_date <= :as_of ORDER BY snapshot_date DESC LIMIT 1",
+        {"as_of": "2025-01-31"},
+        "ix_stock_snapshots_snapshot_date",
+    ),
+    (
+        "invoice_movements",
+        "SELECT brand_number, pack_size_case, pack_size_quantity_ml, SUM(cases_delta) FROM stock_movements "
+        "WHERE reference = :reference AND kind = :kind AND id > :after_id "
+        "GROUP BY brand_number, pack_size_case, pack_size_quantity_ml",
+        {"reference": "INV0001", "kind": "invoice", "after_id": 0},
+        "ix_stock_movements_reference_kind",
+    ),
+)
+
+_FULL_SCAN = re.compile(r"^SCAN \w+$")
+
+
+def explain(conn, sql, params):
+    return [row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}"), params)]
+
+
+def check_hot_query_plans(engine):
+    """
+    Runs EXPLAIN QUERY PLAN for every registered hot query. A query passes
+    when no step is a bare table scan or a temp b-tree sort for ORDER BY.
+    Returns one result dict per query.
+    """
+    results = []
+    with engine.connect() as conn:
+        for name, sql, params, expected_index in HOT_QUERIES:
+            plan = explain(conn, sql, params)
+            problems = [
+                step for step in plan
+                if _FULL_SCAN.match(step) or step == "USE TEMP B-TREE FOR ORDER BY"
+            ]
+            results.append({
+                "name": name,
+                "ok": not problems,
+                "expected_index": expected_index,
+                "uses_expected_index": any(expected_index in step for step in plan),
+                "plan": plan,
+            })
+    return results
@@ -1,12 +1,11 @@
 from datetime import datetime
 
-from sqlalchemy import func
+from sqlalchemy import String, and_, func, or_, type_coerce
 from sqlalchemy.exc import OperationalError
 
 from models import (
     Invoice,
     InvoiceItem,
-    PriceListItem,
     SellFinance,
     SellFinanceCash,
     SellFinanceExpense,
@@ -14,18 +13,30 @@ from models import (
     SellFinancePhonePay,
     SellReport,
 )
+from services.price_index import get_price_index
 
 
-def get_last_reports_by_stock(db):
-    last_reports = {}
+def get_last_reports_by_stock(db, stock_ids=None):
+    """
+    Latest sell report per stock_id, picked in SQL with ROW_NUMBER over
+    the (stock_id, created_at) index instead of loading the whole history.
+    Pass stock_ids to rank only those stocks' reports.
+    """
     try:
-        rows = db.query(SellReport).order_by(SellReport.created_at.desc()).all()
-        for r in rows:
-            if r.stock_id not in last_reports:
-                last_reports[r.stock_id] = r
+        ranked = db.query(
+            SellReport.id.label("id"),
+            func.row_number().over(
+                partition_by=SellReport.stock_id,
+                order_by=(SellReport.created_at.desc(), SellReport.id.desc())
+            ).label("rn")
+        )
+        if stock_ids is not None:
+            ranked = ranked.filter(SellReport.stock_id.in_(sorted(stock_ids)))
+        ranked = ranked.subquery()
+        rows = db.query(SellReport).join(ranked, ranked.c.id == SellReport.id).filter(ranked.c.rn == 1).all()
     except OperationalError:
         return {}
-    return last_reports
+    return {r.stock_id: r for r in rows}
 
 
 def get_previous_report(db, stock_id, before_dt):
@@ -56,20 +67,86 @@ def invoice_additions(db, stock, since_dt):
     return int(cases or 0), int(bottles or 0)
 
 
+def invoice_additions_by_stock(db, stocks, last_reports):
+    """
+    Invoice additions for many stock rows with one grouped query.
+
+    Items are summed per (brand_number, pack_size_case,
+    pack_size_quantity_ml, invoice created_at); each stock then keeps the
+    groups newer than its own last report. A NULL key part matches NULL,
+    as in invoice_additions. Returns {stock.id: (cases, bottles)}.
+    """
+    since_by_stock = {}
+    keys = set()
+    for stock in stocks:
+        keys.add((stock.brand_number, stock.pack_size_case, stock.pack_size_quantity_ml))
+        last_report = last_reports.get(stock.id)
+        since_by_stock[stock.id] = last_report.created_at if last_report else None
+
+    additions = {stock.id: (0, 0) for stock in stocks}
+    if not keys:
+        return additions
+
+    q = db.query(
+        InvoiceItem.brand_number,
+        InvoiceItem.pack_size_case,
+        InvoiceItem.pack_size_quantity_ml,
+        Invoice.created_at,
+        func.coalesce(func.sum(InvoiceItem.cases_delivered), 0),
+        func.coalesce(func.sum(InvoiceItem.bottles_delivered), 0)
+    ).join(Invoice, Invoice.invoice_number == InvoiceItem.invoice_number)
+    brand_numbers = {k[0] for k in keys}
+    brand_filter = InvoiceItem.brand_number.in_(sorted(b for b in brand_numbers if b is not None))
+    if None in brand_numbers:
+        brand_filter = or_(brand_filter, InvoiceItem.brand_number.is_(None))
+    q = q.filter(brand_filter)
+
+    since_values = list(since_by_stock.values())
+    if since_values and all(v is not None for v in since_values):
+        q = q.filter(Invoice.created_at > min(since_values))
+
+    q = q.group_by(
+        InvoiceItem.brand_number,
+        InvoiceItem.pack_size_case,
+        InvoiceItem.pack_size_quantity_ml,
+        Invoice.created_at,
+    )
+
+    groups = {}
+    for brand_number, pack_size_case, pack_size_quantity_ml, created_at, cases, bottles in q.all():
+        key = (brand_number, pack_size_case, pack_size_quantity_ml)
+        if key in keys:
+            groups.setdefault(key, []).append((created_at, int(cases or 0), int(bottles or 0)))
+
+    for stock in stocks:
+        since_dt = since_by_stock[stock.id]
+        cases_total = 0
+        bottles_total = 0
+        for created_at, cases, bottles in groups.get(
+            (stock.brand_number, stock.pack_size_case, stock.pack_size_quantity_ml), ()
+        ):
+            if since_dt is not None and (created_at is None or created_at <= since_dt):
+                continue
+            cases_total += cases
+            bottles_total += bottles
+        additions[stock.id] = (cases_total, bottles_total)
+    return additions
+
+
 def total_bottles(cases, loose_bottles, pack_size_case):
     return int(cases or 0) * int(pack_size_case or 0) + int(loose_bottles or 0)
 
 
-def compute_opening_and_additions(db, stock, last_report):
+def compute_opening_and_additions(db, stock, last_report, additions=None):
+    if additions is None:
+        additions = invoice_additions(db, stock, last_report.created_at if last_report else None)
+    added_cases, added_bottles = additions
     if last_report:
         opening_cases = last_report.closing_cases
         opening_bottles = last_report.closing_bottles
-        since_dt = last_report.created_at
-        added_cases, added_bottles = invoice_additions(db, stock, since_dt)
     else:
         opening_cases = 0
         opening_bottles = 0
-        added_cases, added_bottles = invoice_additions(db, stock, None)
 
     total_cases = int(opening_cases or 0) + int(added_cases or 0)
     opening_total_bottles = total_bottles(opening_cases, opening_bottles, stock.pack_size_case)
@@ -80,16 +157,7 @@ def compute_opening_and_additions(db, stock, last_report):
 
 
 def build_mrp_map(db):
-    mrp_map = {}
-    try:
-        rows = db.query(PriceListItem).all()
-    except OperationalError:
-        return {}
-    for r in rows:
-        key = (str(r.brand_number or "").strip(), int(r.volume_ml or 0))
-        if key not in mrp_map:
-            mrp_map[key] = r.mrp
-    return mrp_map
+    return get_price_index(db).mrp_by_volume
 
 
 def get_total_sell_amount(db, report_date):
@@ -102,6 +170,44 @@ def get_total_sell_amount(db, report_date):
         return 0.0
 
 
+def _last_created_at_raw():
+    return func.max(type_coerce(SellReport.created_at, String))
+
+
+def sell_report_batches_query(db, *columns):
+    """
+    One row per report_date, newest batch first: report_date, total_items,
+    total_sell_amount, last_created_at (as stored, for keyset cursors) and
+    the created_by / edit_count of the newest row in the batch. SQLite
+    fills those bare columns from the row holding MAX(created_at).
+    """
+    last_created_at = _last_created_at_raw()
+    return db.query(
+        SellReport.report_date,
+        func.count(SellReport.id).label("total_items"),
+        func.coalesce(func.sum(SellReport.sell_amount), 0.0).label("total_sell_amount"),
+        last_created_at.label("last_created_at"),
+        SellReport.created_by,
+        SellReport.edit_count,
+        *columns,
+    ).group_by(SellReport.report_date).order_by(
+        last_created_at.desc(), SellReport.report_date.desc()
+    )
+
+
+def sell_report_batches_after(query, last_created_at, report_date):
+    """Keyset filter for sell_report_batches_query: batches after the cursor row."""
+    expr = _last_created_at_raw()
+    return query.having(or_(
+        expr < last_created_at,
+        and_(expr == last_created_at, SellReport.report_date < report_date),
+    ))
+
+
+def stored_datetime_iso(raw):
+    return datetime.fromisoformat(raw).isoformat() if raw else None
+
+
 def get_last_finance_balance(db, exclude_finance_id=None):
     q = db.query(SellFinance)
     if exclude_finance_id is not None:
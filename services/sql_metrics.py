@@ -0,0 +1,31 @@
+import threading
+from contextlib import contextmanager
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_local = threading.local()
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    counter = getattr(_local, "counter", None)
+    if counter is not None:
+        counter["statements"] += 1
+
+
+@contextmanager
+def count_statements():
+    """
+    Counts SQL statements sent to any engine by the current thread while
+    the block runs. An executemany batch counts as one statement.
+    """
+    counter = {"statements": 0}
+    previous = getattr(_local, "counter", None)
+    _local.counter = counter
+    try:
+        yield counter
+    finally:
+        _local.counter = previous
+        if previous is not None:
+            previous["statements"] += counter["statements"]
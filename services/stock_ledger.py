@@ -0,0 +1,248 @@
+from datetime import date, datetime
+
+from sqlalchemy import func, text
+
+from models import PresentStockDetail, StockMovement, StockSnapshot
+
+OPENING = "opening"
+INVOICE = "invoice"
+INVOICE_DELETE = "invoice_delete"
+SALE = "sale"
+SALE_EDIT = "sale_edit"
+SALE_DELETE = "sale_delete"
+ADJUSTMENT = "adjustment"
+
+CONTEXT_KEY = "stock_movement_context"
+
+
+def set_movement_context(db, kind, reference=None, movement_date=None, username=None):
+    """
+    Describes the stock changes the caller is about to make in this
+    session. Movements recorded from ORM stock edits, and by bulk writers
+    that do not pass their own values, take kind, reference, date and user
+    from here. Without a context a change is a manual adjustment dated today.
+    """
+    db.info[CONTEXT_KEY] = {
+        "kind": kind,
+        "reference": None if reference is None else str(reference),
+        "movement_date": movement_date,
+        "created_by": username,
+    }
+
+
+def movement_row(db, sku, cases_delta, bottles_delta, amount_delta, **overrides):
+    """
+    One stock_movements mapping for a (brand_number, pack_size_case,
+    pack_size_quantity_ml) SKU. Unset fields come from the session's
+    movement context.
+    """
+    context = db.info.get(CONTEXT_KEY) or {}
+    row = {
+        "kind": context.get("kind") or ADJUSTMENT,
+        "reference": context.get("reference"),
+        "movement_date": context.get("movement_date"),
+        "created_by": context.get("created_by"),
+    }
+    row.update(overrides)
+    row["movement_date"] = row["movement_date"] or datetime.utcnow().date()
+    row.update({
+        "brand_number": sku[0],
+        "pack_size_case": sku[1],
+        "pack_size_quantity_ml": sku[2],
+        "cases_delta": cases_delta,
+        "bottles_delta": bottles_delta,
+        "amount_delta": amount_delta,
+    })
+    return row
+
+
+def record_movements(db, rows):
+    """Appends movement rows, skipping rows that change nothing. Does not commit."""
+    rows = [r for r in rows if r["cases_delta"] or r["bottles_delta"] or r["amount_delta"]]
+    if rows:
+        db.bulk_insert_mappings(StockMovement, rows)
+    return len(rows)
+
+
+def _sku_totals(rows):
+    return {
+        (r[0], r[1], r[2]): (int(r[3] or 0), int(r[4] or 0), float(r[5] or 0.0))
+        for r in rows
+    }
+
+
+def _movement_totals(db, *filters):
+    return _sku_totals(db.query(
+        StockMovement.brand_number,
+        StockMovement.pack_size_case,
+        StockMovement.pack_size_quantity_ml,
+        func.sum(StockMovement.cases_delta),
+        func.sum(StockMovement.bottles_delta),
+        func.sum(StockMovement.amount_delta),
+    ).filter(*filters).group_by(
+        StockMovement.brand_number,
+        StockMovement.pack_size_case,
+        StockMovement.pack_size_quantity_ml,
+    ))
+
+
+# The ledger tail since a snapshot is read by id range, and movements left
+# out of a snapshot by date range. Left alone, the planner prefers walking
+# the SKU index for the GROUP BY, which reads the whole ledger.
+_MOVEMENTS_AFTER_ID_SQL = text("""
+SELECT brand_number, pack_size_case, pack_size_quantity_ml,
+    SUM(cases_delta), SUM(bottles_delta), SUM(amount_delta)
+FROM stock_movements NOT INDEXED
+WHERE id > :last_movement_id AND movement_date <= :until
+GROUP BY brand_number, pack_size_case, pack_size_quantity_ml
+""")
+
+_MOVEMENTS_DATED_AFTER_SQL = text("""
+SELECT brand_number, pack_size_case, pack_size_quantity_ml,
+    SUM(cases_delta), SUM(bottles_delta), SUM(amount_delta)
+FROM stock_movements INDEXED BY ix_stock_movements_movement_date
+WHERE movement_date > :after AND movement_date <= :until AND id <= :last_movement_id
+GROUP BY brand_number, pack_size_case, pack_size_quantity_ml
+""")
+
+# Upper bound for "dated after" lookups that have no as_of date.
+_MAX_DATE = date.max.isoformat()
+
+
+def _present_totals(db):
+    return _sku_totals(db.query(
+        PresentStockDetail.brand_number,
+        PresentStockDetail.pack_size_case,
+        PresentStockDetail.pack_size_quantity_ml,
+        func.sum(PresentStockDetail.total_cases),
+        func.sum(PresentStockDetail.total_bottles),
+        func.sum(PresentStockDetail.total_amount),
+    ).group_by(
+        PresentStockDetail.brand_number,
+        PresentStockDetail.pack_size_case,
+        PresentStockDetail.pack_size_quantity_ml,
+    ))
+
+
+def _add_totals(target, totals, sign=1):
+    for sku, (cases, bottles, amount) in totals.items():
+        c, b, a = target.get(sku, (0, 0, 0.0))
+        target[sku] = (c + sign * cases, b + sign * bottles, a + sign * amount)
+    return target
+
+
+def write_stock_snapshot(db, snapshot_date):
+    """
+    Stores stock per SKU as of the end of snapshot_date, replacing any
+    snapshot already taken for that date. It is built from present stock
+    (the ledger's running sum), less the movements already recorded with a
+    later date, so it costs O(SKUs) rather than a replay of the ledger.
+    Flushes pending stock changes first. Does not commit.
+    """
+    db.flush()
+    last_movement_id = db.query(func.max(StockMovement.id)).scalar() or 0
+    totals = _present_totals(db)
+    later = _sku_totals(db.execute(_MOVEMENTS_DATED_AFTER_SQL, {
+        "after": snapshot_date.isoformat(),
+        "until": _MAX_DATE,
+        "last_movement_id": last_movement_id,
+    }))
+    _add_totals(totals, later, sign=-1)
+
+    db.query(StockSnapshot).filter(StockSnapshot.snapshot_date == snapshot_date).delete(synchronize_session=False)
+    db.bulk_insert_mappings(StockSnapshot, [
+        {
+            "snapshot_date": snapshot_date,
+            "last_movement_id": last_movement_id,
+            "brand_number": sku[0],
+            "pack_size_case": sku[1],
+            "pack_size_quantity_ml": sku[2],
+            "total_cases": cases,
+            "total_bottles": bottles,
+            "total_amount": amount,
+        }
+        for sku, (cases, bottles, amount) in totals.items()
+    ])
+    return len(totals)
+
+
+def ledger_start_date(db):
+    """
+    Date of the opening balance the ledger was backfilled with, or None
+    when it started empty. Earlier dates have no opening balance to count
+    from, so the ledger cannot say what stock was then.
+    """
+    row = db.query(StockMovement.movement_date).filter(
+        StockMovement.kind == OPENING
+    ).order_by(StockMovement.id.asc()).limit(1).first()
+    return row.movement_date if row else None
+
+
+def stock_as_of(db, as_of):
+    """
+    Stock per SKU at the end of the as_of date: {(brand_number,
+    pack_size_case, pack_size_quantity_ml): (cases, bottles, amount)}.
+    Returns (stock, snapshot_date). It starts from the newest snapshot on or
+    before as_of and adds only the movements that snapshot does not cover:
+    - movements recorded after it, dated up to as_of;
+    - movements it had left out because they were dated after the snapshot
+      and up to as_of.
+    With no snapshot yet, it sums the ledger from the start. Raises
+    ValueError for dates before ledger_start_date.
+    """
+    if isinstance(as_of, datetime):
+        as_of = as_of.date()
+    if not isinstance(as_of, date):
+        raise ValueError("as_of must be a date")
+    start = ledger_start_date(db)
+    if start is not None and as_of < start:
+        raise ValueError(f"stock history starts on {start.isoformat()}; as_of must not be earlier")
+
+    snapshot = db.query(StockSnapshot.snapshot_date, StockSnapshot.last_movement_id).filter(
+        StockSnapshot.snapshot_date <= as_of
+    ).order_by(StockSnapshot.snapshot_date.desc()).limit(1).first()
+    if snapshot is None:
+        return _movement_totals(db, StockMovement.movement_date <= as_of), None
+
+    stock = _sku_totals(db.query(
+        StockSnapshot.brand_number,
+        StockSnapshot.pack_size_case,
+        StockSnapshot.pack_size_quantity_ml,
+        StockSnapshot.total_cases,
+        StockSnapshot.total_bottles,
+        StockSnapshot.total_amount,
+    ).filter(StockSnapshot.snapshot_date == snapshot.snapshot_date))
+    _add_totals(stock, _sku_totals(db.execute(_MOVEMENTS_AFTER_ID_SQL, {
+        "last_movement_id": snapshot.last_movement_id,
+        "until": as_of.isoformat(),
+    })))
+    if as_of > snapshot.snapshot_date:
+        _add_totals(stock, _sku_totals(db.execute(_MOVEMENTS_DATED_AFTER_SQL, {
+            "after": snapshot.snapshot_date.isoformat(),
+            "until": as_of.isoformat(),
+            "last_movement_id": snapshot.last_movement_id,
+        })))
+    return stock, snapshot.snapshot_date
+
+
+def check_stock_ledger(db, amount_tolerance=0.01):
+    """
+    Compares present stock with the full ledger projection, per SKU.
+    Returns the SKUs where they differ, with both values.
+    """
+    projected = _movement_totals(db)
+    present = _present_totals(db)
+    zero = (0, 0, 0.0)
+    mismatches = []
+    for sku in sorted(set(projected) | set(present), key=lambda k: tuple(str(v) for v in k)):
+        p = projected.get(sku, zero)
+        s = present.get(sku, zero)
+        if p[0] != s[0] or p[1] != s[1] or abs(p[2] - s[2]) > amount_tolerance:
+            mismatches.append({
+                "brand_number": sku[0],
+                "pack_size_case": sku[1],
+                "pack_size_quantity_ml": sku[2],
+                "ledger": {"total_cases": p[0], "total_bottles": p[1], "total_amount": p[2]},
+                "present": {"total_cases": s[0], "total_bottles": s[1], "total_amount": s[2]},
+            })
+    return mismatches
@@ -1,4 +1,14 @@
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, text
+from sqlalchemy.sql import ClauseElement
+
+from config import STOCK_SUMMARY_AMOUNT_TOLERANCE, STOCK_SUMMARY_CHECK_INTERVAL_SECONDS
+from database import SessionLocal
 from models import PresentStockDetail, StockSummary
+from services.stock_ledger import movement_row, record_movements
 
 def recalc_stock_summary(db):
     rows = db.query(PresentStockDetail).all()
@@ -21,3 +31,437 @@ def recalc_stock_summary(db):
     summary.total_cases_all_items = total_cases
     summary.total_price_all_items = total_amount
     summary.last_updated_item_name = last_item_name
+
+
+def _get_stock_summary(db):
+    summary = db.query(StockSummary).first()
+    if not summary:
+        summary = StockSummary(
+            total_cases_all_items=0,
+            total_price_all_items=0.0
+        )
+        db.add(summary)
+    return summary
+
+
+def _plus(summary, field, delta, zero):
+    # A stored summary is moved with "column + delta" in the UPDATE itself,
+    # so the value read before the flush took the write lock never
+    # overwrites another writer's delta. Deltas added before the flush
+    # stack onto the pending expression.
+    state = inspect(summary)
+    if state.persistent and not state.attrs[field].history.has_changes():
+        return func.coalesce(getattr(StockSummary, field), zero) + delta
+    current = getattr(summary, field)
+    if isinstance(current, ClauseElement):
+        return current + delta
+    return (current or zero) + delta
+
+
+def adjust_stock_summary(db, cases_delta, amount_delta, item_name=None):
+    """
+    Moves the stock summary totals by the given deltas instead of summing
+    every stock row again. Stock changes made through ORM objects are
+    applied by the before_flush listener below; code that writes stock
+    rows in bulk (bulk mappings, raw SQL) calls this with its own deltas.
+    """
+    summary = _get_stock_summary(db)
+    summary.total_cases_all_items = _plus(summary, "total_cases_all_items", cases_delta, 0)
+    summary.total_price_all_items = _plus(summary, "total_price_all_items", amount_delta, 0.0)
+    if item_name is not None:
+        summary.last_updated_item_name = item_name
+    return summary
+
+
+def refresh_stock_summary_name(db):
+    """
+    Sets the summary's last item name from the newest stock row that has
+    one, as recalc_stock_summary does. Flushes pending stock changes first.
+    """
+    db.flush()
+    _get_stock_summary(db).last_updated_item_name = db.query(PresentStockDetail.last_updated_item_name).filter(
+        PresentStockDetail.last_updated_item_name.isnot(None),
+        PresentStockDetail.last_updated_item_name != "",
+    ).order_by(PresentStockDetail.id.desc()).limit(1).scalar()
+
+
+_TRACKED_FIELDS = (("total_cases", int), ("total_bottles", int), ("total_amount", float))
+
+
+def _as_number(value, cast):
+    try:
+        return cast(value or 0)
+    except (TypeError, ValueError):
+        return cast(0)
+
+
+def _stock_objects(objects):
+    return sorted((o for o in objects if isinstance(o, PresentStockDetail)), key=lambda o: o.id)
+
+
+def _stock_sku(obj):
+    return (obj.brand_number, obj.pack_size_case, obj.pack_size_quantity_ml)
+
+
+@event.listens_for(SessionLocal, "before_flush")
+def _track_stock_changes(session, flush_context, instances):
+    """
+    Turns every stock row inserted, changed or deleted through the ORM into
+    a stock movement and a stock summary delta.
+    """
+    changes = []
+    # Stock id -> (change, fields) whose stored value was never loaded; it
+    # is still in the database until this flush writes the new one.
+    unknown_old = {}
+
+    for obj in session.new:
+        if isinstance(obj, PresentStockDetail):
+            changes.append({
+                "sku": _stock_sku(obj),
+                **{field: _as_number(getattr(obj, field), cast) for field, cast in _TRACKED_FIELDS},
+            })
+
+    for obj in _stock_objects(session.dirty):
+        state = inspect(obj)
+        change = {"sku": _stock_sku(obj)}
+        for field, cast in _TRACKED_FIELDS:
+            change[field] = cast(0)
+            hist = state.attrs[field].history
+            if not hist.has_changes():
+                continue
+            change[field] += _as_number(hist.added[0] if hist.added else None, cast)
+            if hist.deleted:
+                change[field] -= _as_number(hist.deleted[0], cast)
+            else:
+                unknown_old.setdefault(obj.id, (change, set()))[1].add(field)
+        changes.append(change)
+
+    for obj in _stock_objects(session.deleted):
+        state = inspect(obj)
+        change = {"sku": _stock_sku(obj)}
+        for field, cast in _TRACKED_FIELDS:
+            change[field] = cast(0)
+            hist = state.attrs[field].history
+            stored = hist.deleted or hist.unchanged
+            if stored:
+                change[field] -= _as_number(stored[0], cast)
+            else:
+                unknown_old.setdefault(obj.id, (change, set()))[1].add(field)
+        changes.append(change)
+
+    if unknown_old:
+        rows = session.query(
+            PresentStockDetail.id,
+            PresentStockDetail.total_cases,
+            PresentStockDetail.total_bottles,
+            PresentStockDetail.total_amount,
+        ).filter(PresentStockDetail.id.in_(sorted(unknown_old))).all()
+        for row in rows:
+            change, fields = unknown_old[row.id]
+            for field, cast in _TRACKED_FIELDS:
+                if field in fields:
+                    change[field] -= _as_number(getattr(row, field), cast)
+
+    if not changes:
+        return
+    record_movements(session, [
+        movement_row(session, c["sku"], c["total_cases"], c["total_bottles"], c["total_amount"])
+        for c in changes
+    ])
+    cases_delta = sum(c["total_cases"] for c in changes)
+    amount_delta = sum(c["total_amount"] for c in changes)
+    if cases_delta or amount_delta:
+        adjust_stock_summary(session, cases_delta, amount_delta)
+
+
+# The repair recomputes the totals inside the UPDATE itself. The SUM read
+# by the drift check may already be stale (each SELECT runs in its own
+# snapshot), but SQLite evaluates the subqueries under the write lock, so a
+# stock change committed in between is never overwritten.
+_REPAIR_STOCK_SUMMARY_SQL = text("""
+UPDATE stock_summary SET
+    total_cases_all_items = (SELECT COALESCE(SUM(total_cases), 0) FROM present_stock_details),
+    total_price_all_items = (SELECT COALESCE(SUM(total_amount), 0.0) FROM present_stock_details)
+WHERE id = :summary_id
+""")
+
+
+def check_stock_summary(db, repair=False):
+    """
+    Compares the stock summary with a full SUM over present stock. With
+    repair, drifted totals are recomputed and written in one statement (the
+    caller commits). Returns the stored and recomputed values and whether
+    they differed.
+    """
+    cases, amount = db.execute(text(
+        "SELECT COALESCE(SUM(total_cases), 0), COALESCE(SUM(total_amount), 0.0) FROM present_stock_details"
+    )).one()
+    summary = db.query(StockSummary).first()
+    stored_cases = int(summary.total_cases_all_items or 0) if summary else 0
+    stored_amount = float(summary.total_price_all_items or 0.0) if summary else 0.0
+    drift = stored_cases != int(cases) or abs(stored_amount - float(amount)) > STOCK_SUMMARY_AMOUNT_TOLERANCE
+    if drift and repair:
+        summary = _get_stock_summary(db)
+        db.flush()
+        db.execute(_REPAIR_STOCK_SUMMARY_SQL, {"summary_id": summary.id})
+        db.expire(summary)
+    return {
+        "drift": drift,
+        "repaired": drift and repair,
+        "stored": {"total_cases": stored_cases, "total_amount": stored_amount},
+        "recomputed": {"total_cases": int(cases), "total_amount": float(amount)},
+    }
+
+
+_checker_thread = None
+_checker_lock = threading.Lock()
+_checker_last_run = {}
+
+
+def _run_stock_summary_checker():
+    while True:
+        started = time.time()
+        db = SessionLocal()
+        try:
+            status = check_stock_summary(db, repair=True)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            status = {"error": str(e)}
+        finally:
+            db.close()
+        status["finished_at"] = datetime.utcnow().isoformat()
+        status["duration_ms"] = round((time.time() - started) * 1000, 1)
+        with _checker_lock:
+            if status.get("repaired"):
+                _checker_last_run["repairs"] = _checker_last_run.get("repairs", 0) + 1
+            repairs = _checker_last_run.get("repairs", 0)
+            _checker_last_run.clear()
+            _checker_last_run.update(status, repairs=repairs)
+        time.sleep(STOCK_SUMMARY_CHECK_INTERVAL_SECONDS)
+
+
+def start_stock_summary_checker():
+    """Runs check_stock_summary with repair every STOCK_SUMMARY_CHECK_INTERVAL_SECONDS."""
+    global _checker_thread
+    if STOCK_SUMMARY_CHECK_INTERVAL_SECONDS <= 0:
+        return
+    if _checker_thread is not None:
+        return
+    _checker_thread = threading.Thread(target=_run_stock_summary_checker, name="stock-summary-check", daemon=True)
+    _checker_thread.start()
+
+
+def stock_summary_check_status():
+    with _checker_lock:
+        return dict(_checker_last_run) or None
+
+
+# Present stock is rebuilt from every remaining invoice item in two passes.
+# The items are first staged in a temp table, one row per item with its MRP
+# resolved (the first price_list row for brand_number, pack_type, volume_ml)
+# and its invoice looked up. Then a single INSERT ... SELECT ... GROUP BY
+# builds one row per SKU (brand_number, pack_size_case, pack_size_quantity_ml).
+# Within a SKU, in item id order:
+# - names and pack fields come from the first item;
+# - each rate comes from the last item with a non-zero rate, else the first
+#   item's;
+# - last_invoice_date comes from the last item whose invoice still exists,
+#   else "";
+# - last_updated_item_name comes from the last item.
+# The GROUP BY walks the (SKU, id) index, so totals are summed in item id
+# order. SKUs are inserted in order of first appearance.
+_STAGE_TABLE_SQL = text("""
+CREATE TEMP TABLE stock_rebuild_items (
+    id INTEGER PRIMARY KEY,
+    brand_number,
+    brand_name,
+    product_type,
+    pack_type,
+    pack_size_case,
+    pack_size_quantity_ml,
+    cases,
+    bottles,
+    unit_rate,
+    rate_per_case,
+    amount,
+    has_invoice,
+    invoice_date
+)
+""")
+
+_STAGE_ITEMS_SQL = text("""
+WITH price AS MATERIALIZED (
+    SELECT
+        trim(COALESCE(brand_number, '')) AS brand_key,
+        trim(COALESCE(pack_type, '')) AS pack_key,
+        CAST(COALESCE(volume_ml, 0) AS INTEGER) AS volume_key,
+        CAST(COALESCE(mrp, 0.0) AS REAL) AS mrp
+    FROM price_list
+    WHERE id IN (
+        SELECT MIN(id) FROM price_list
+        GROUP BY trim(COALESCE(brand_number, '')), trim(COALESCE(pack_type, '')),
+                 CAST(COALESCE(volume_ml, 0) AS INTEGER)
+    )
+),
+invoice_dates AS (
+    SELECT invoice_number, invoice_date, 1 AS found FROM invoices
+    WHERE id IN (SELECT MAX(id) FROM invoices GROUP BY invoice_number)
+),
+sized AS (
+    SELECT
+        i.*,
+        CAST(COALESCE(i.pack_size_case, 0) AS INTEGER) AS pack_size,
+        CAST(COALESCE(i.cases_delivered, 0) AS INTEGER) AS cases,
+        CAST(COALESCE(i.cases_delivered, 0) AS INTEGER) * CAST(COALESCE(i.pack_size_case, 0) AS INTEGER)
+            + CAST(COALESCE(i.bottles_delivered, 0) AS INTEGER) AS bottles
+    FROM invoice_items i
+)
+INSERT INTO stock_rebuild_items
+SELECT
+    s.id,
+    s.brand_number,
+    s.brand_name,
+    s.product_type,
+    s.pack_type,
+    s.pack_size_case,
+    s.pack_size_quantity_ml,
+    s.cases,
+    s.bottles,
+    p.mrp,
+    CASE WHEN p.mrp IS NOT NULL AND s.pack_size != 0 THEN p.mrp * s.pack_size END,
+    CASE WHEN p.mrp IS NOT NULL THEN p.mrp * s.bottles ELSE 0.0 END,
+    d.found IS NOT NULL,
+    d.invoice_date
+FROM sized s
+LEFT JOIN invoice_dates d ON d.invoice_number IS s.invoice_number
+LEFT JOIN price p
+    ON p.brand_key = trim(COALESCE(s.brand_number, ''))
+    AND p.pack_key = trim(COALESCE(s.pack_type, ''))
+    AND p.volume_key = CAST(COALESCE(s.pack_size_quantity_ml, 0) AS INTEGER)
+""")
+
+_STAGE_INDEX_SQL = text(
+    "CREATE INDEX temp.ix_stock_rebuild_items_sku "
+    "ON stock_rebuild_items (brand_number, pack_size_case, pack_size_quantity_ml, id)"
+)
+
+_INSERT_STOCK_SQL = text("""
+INSERT INTO present_stock_details (
+    brand_number, brand_name, product_type, pack_type, pack_size_case, pack_size_quantity_ml,
+    total_cases, total_bottles, rate_per_case, unit_rate_per_bottle, total_amount,
+    last_invoice_date, last_updated_item_name
+)
+SELECT
+    f.brand_number,
+    f.brand_name,
+    f.product_type,
+    f.pack_type,
+    f.pack_size_case,
+    f.pack_size_quantity_ml,
+    g.total_cases,
+    g.total_bottles,
+    COALESCE(r.rate_per_case, f.rate_per_case),
+    COALESCE(u.unit_rate, f.unit_rate),
+    g.total_amount,
+    CASE WHEN g.invoice_id IS NULL THEN '' ELSE v.invoice_date END,
+    COALESCE(l.brand_name, '') || ' ' || COALESCE(l.pack_size_quantity_ml, 0) || 'ml/'
+        || COALESCE(l.pack_size_case, 0)
+FROM (
+    SELECT
+        MIN(id) AS first_id,
+        MAX(id) AS last_id,
+        MAX(CASE WHEN rate_per_case != 0 THEN id END) AS rate_id,
+        MAX(CASE WHEN unit_rate != 0 THEN id END) AS unit_rate_id,
+        MAX(CASE WHEN has_invoice THEN id END) AS invoice_id,
+        SUM(cases) AS total_cases,
+        SUM(bottles) AS total_bottles,
+        SUM(amount) AS total_amount
+    FROM stock_rebuild_items INDEXED BY ix_stock_rebuild_items_sku
+    GROUP BY brand_number, pack_size_case, pack_size_quantity_ml
+) g
+JOIN stock_rebuild_items f ON f.id = g.first_id
+JOIN stock_rebuild_items l ON l.id = g.last_id
+LEFT JOIN stock_rebuild_items r ON r.id = g.rate_id
+LEFT JOIN stock_rebuild_items u ON u.id = g.unit_rate_id
+LEFT JOIN stock_rebuild_items v ON v.id = g.invoice_id
+ORDER BY g.first_id
+""")
+
+
+_SAVE_STOCK_SQL = text("""
+CREATE TEMP TABLE stock_rebuild_before AS
+SELECT brand_number, pack_size_case, pack_size_quantity_ml, total_cases, total_bottles, total_amount
+FROM present_stock_details
+""")
+
+# One ledger movement per SKU whose totals the rebuild changed.
+_REBUILD_MOVEMENTS_SQL = text("""
+INSERT INTO stock_movements (
+    movement_date, kind, reference, brand_number, pack_size_case, pack_size_quantity_ml,
+    cases_delta, bottles_delta, amount_delta, created_by
+)
+SELECT
+    :movement_date, :kind, :reference, brand_number, pack_size_case, pack_size_quantity_ml,
+    SUM(cases), SUM(bottles), SUM(amount), :created_by
+FROM (
+    SELECT brand_number, pack_size_case, pack_size_quantity_ml,
+        -COALESCE(total_cases, 0) AS cases, -COALESCE(total_bottles, 0) AS bottles,
+        -COALESCE(total_amount, 0.0) AS amount
+    FROM stock_rebuild_before
+    UNION ALL
+    SELECT brand_number, pack_size_case, pack_size_quantity_ml,
+        COALESCE(total_cases, 0), COALESCE(total_bottles, 0), COALESCE(total_amount, 0.0)
+    FROM present_stock_details
+)
+GROUP BY brand_number, pack_size_case, pack_size_quantity_ml
+HAVING SUM(cases) != 0 OR SUM(bottles) != 0 OR SUM(amount) != 0
+""")
+
+
+def rebuild_stock_from_invoices(db):
+    """
+    Replaces present stock with totals rebuilt from the remaining invoice
+    items, and resets the stock summary to match, all inside the caller's
+    transaction. Returns a row-count and timing report.
+    """
+    started = time.perf_counter()
+    db.execute(text("DROP TABLE IF EXISTS temp.stock_rebuild_items"))
+    db.execute(_STAGE_TABLE_SQL)
+    db.execute(_STAGE_ITEMS_SQL)
+    db.execute(_STAGE_INDEX_SQL)
+    db.execute(text("DROP TABLE IF EXISTS temp.stock_rebuild_before"))
+    db.execute(_SAVE_STOCK_SQL)
+    deleted = db.query(PresentStockDetail).delete()
+    inserted = db.execute(_INSERT_STOCK_SQL).rowcount
+    context = movement_row(db, (None, None, None), 0, 0, 0.0)
+    movements = db.execute(_REBUILD_MOVEMENTS_SQL, {
+        "movement_date": context["movement_date"].isoformat(),
+        "kind": context["kind"],
+        "reference": context["reference"],
+        "created_by": context["created_by"],
+    }).rowcount
+    db.execute(text("DROP TABLE temp.stock_rebuild_items"))
+    db.execute(text("DROP TABLE temp.stock_rebuild_before"))
+
+    totals = db.execute(text(
+        "SELECT COALESCE(SUM(total_cases), 0), COALESCE(SUM(total_amount), 0.0) FROM present_stock_details"
+    )).one()
+    last_item_name = db.execute(text(
+        "SELECT last_updated_item_name FROM present_stock_details ORDER BY id DESC LIMIT 1"
+    )).scalar()
+
+    summary = db.query(StockSummary).first()
+    if not summary:
+        summary = StockSummary()
+        db.add(summary)
+    summary.total_cases_all_items = int(totals[0])
+    summary.total_price_all_items = float(totals[1])
+    summary.last_updated_item_name = last_item_name or ""
+    db.flush()
+    return {
+        "deleted_rows": deleted,
+        "inserted_rows": inserted,
+        "movements": movements,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2),
+    }
@@ -0,0 +1,300 @@
+import json
+import os
+import socket
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from config import EXPECTED_RETAILER_CODE, UPLOAD_JOB_STALE_SECONDS, UPLOAD_JOB_WORKERS, UPLOAD_JOBS_FOLDER
+from database import SessionLocal
+from models import Invoice, UploadJob
+from services.audit import log_action
+from services.dashboard import INVOICE, STOCK, refresh_dashboard_snapshot
+from services.files import save_invoice_file
+from services.invoice_upload import get_parse_pool, retailer_code_matches, store_invoice
+from services.parse_cache import parse_invoice_cached
+from services.sql_metrics import count_statements
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=UPLOAD_JOB_WORKERS, thread_name_prefix="upload-job")
+    return _executor
+
+
+def _update_job(job_id, **fields):
+    db = SessionLocal()
+    try:
+        db.query(UploadJob).filter(UploadJob.id == job_id).update(fields, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _worker_id():
+    # Computed per call: forked server workers get their own pid.
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_alive(worker):
+    """
+    True/False when worker names a process on this host, None when it
+    cannot be checked here (another host, or a job from before workers
+    were recorded).
+    """
+    host, _, pid = (worker or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return None
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _claim_job(job_id):
+    db = SessionLocal()
+    try:
+        claimed = db.query(UploadJob).filter(
+            UploadJob.id == job_id,
+            UploadJob.status == JOB_QUEUED
+        ).update({"status": JOB_RUNNING, "stage": "parsing", "worker": _worker_id()}, synchronize_session=False)
+        db.commit()
+        if not claimed:
+            return None
+        return db.query(UploadJob).filter(UploadJob.id == job_id).first()
+    finally:
+        db.close()
+
+
+def submit_upload_job(file_storage, filename, user):
+    job_id = uuid.uuid4().hex
+    os.makedirs(UPLOAD_JOBS_FOLDER, exist_ok=True)
+    path = os.path.join(UPLOAD_JOBS_FOLDER, f"{job_id}.pdf")
+    file_storage.save(path)
+
+    db = SessionLocal()
+    try:
+        db.add(UploadJob(
+            id=job_id,
+            status=JOB_QUEUED,
+            stage="queued",
+            file_path=path,
+            original_filename=filename,
+            username=user.get("username"),
+            role=user.get("role"),
+            timings=json.dumps({"queued_at": time.time()}),
+        ))
+        db.commit()
+    finally:
+        db.close()
+
+    _get_executor().submit(run_upload_job, job_id)
+    return job_id
+
+
+class _JobFailed(Exception):
+    def __init__(self, error, http_status):
+        super().__init__(error)
+        self.http_status = http_status
+
+
+def run_upload_job(job_id):
+    """
+    Runs a queued job. Every path, unexpected errors included, ends with
+    the job succeeded or failed. A failed job's uploaded file is removed
+    unless its invoice had already been stored.
+    """
+    job = _claim_job(job_id)
+    if not job:
+        return
+
+    timings = json.loads(job.timings or "{}")
+    queued_at = timings.pop("queued_at", None)
+    if queued_at:
+        timings["queued_ms"] = round((time.time() - queued_at) * 1000, 2)
+    started = time.perf_counter()
+    progress = {"stage": "parsing"}
+
+    try:
+        _run_claimed_job(job, timings, started, progress)
+    except Exception as e:
+        if isinstance(e, _JobFailed):
+            error, http_status = str(e), e.http_status
+        else:
+            error, http_status = str(e) or e.__class__.__name__, 500
+        stored = progress["stage"] == "stored"
+        if stored:
+            error = f"invoice was stored, but finishing the job failed: {error}"
+        timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        try:
+            _update_job(
+                job_id,
+                status=JOB_FAILED,
+                stage=progress["stage"],
+                error=error,
+                http_status=http_status,
+                timings=json.dumps(timings),
+            )
+        finally:
+            # A stored invoice keeps its PDF.
+            if not stored and job.file_path and os.path.exists(job.file_path):
+                os.remove(job.file_path)
+
+
+def _set_stage(job_id, progress, stage, **fields):
+    progress["stage"] = stage
+    _update_job(job_id, stage=stage, **fields)
+
+
+def _run_claimed_job(job, timings, started, progress):
+    job_id = job.id
+    user = {"username": job.username, "role": job.role}
+    invoice_id = job.invoice_id
+    sql_statements = None
+
+    if invoice_id is not None:
+        # A previous run stored the invoice (the job's invoice_id commits
+        # with it) and stopped before finishing; only the wrap-up is left.
+        progress["stage"] = "stored"
+        data, parse_timings = {}, timings.get("parse", {})
+        if job.file_path and os.path.exists(job.file_path):
+            data, parse_timings, _ = parse_invoice_cached(job.file_path, pool=get_parse_pool())
+        invoice_number = job.invoice_number or data.get("invoice_meta", {}).get("invoice_number", "")
+    else:
+        try:
+            data, parse_timings, _ = parse_invoice_cached(job.file_path, pool=get_parse_pool())
+        except Exception as e:
+            raise _JobFailed(f"could not parse PDF: {e}", 400)
+        timings["parse"] = parse_timings
+
+        t0 = time.perf_counter()
+        invoice_number = data.get("invoice_meta", {}).get("invoice_number", "")
+        _set_stage(job_id, progress, "validating", invoice_number=invoice_number, timings=json.dumps(timings))
+        if not retailer_code_matches(data):
+            raise _JobFailed(f"Retailer code mismatch. Expected {EXPECTED_RETAILER_CODE}.", 400)
+
+        db = SessionLocal()
+        try:
+            exists = db.query(Invoice).filter(Invoice.invoice_number == invoice_number).first()
+            if exists:
+                raise _JobFailed(f"Invoice already exists: {invoice_number}", 409)
+            timings["validate_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+
+            _set_stage(job_id, progress, "storing", timings=json.dumps(timings))
+            t0 = time.perf_counter()
+            with count_statements() as sql_counter:
+                invoice = store_invoice(db, data, user.get("username"))
+                invoice_id = invoice.id
+                log_action(db, user, "upload_invoice", "invoice", invoice_number)
+                refresh_dashboard_snapshot(db, INVOICE, STOCK)
+                db.query(UploadJob).filter(UploadJob.id == job_id).update(
+                    {"invoice_id": invoice_id, "stage": "stored"}, synchronize_session=False
+                )
+                db.commit()
+            progress["stage"] = "stored"
+            timings["store_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+            timings["sql_statements"] = sql_statements = sql_counter["statements"]
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    if job.file_path and os.path.exists(job.file_path):
+        save_invoice_file(
+            upload_path=job.file_path,
+            invoice_date=data.get("invoice_meta", {}).get("invoice_date", ""),
+            invoice_number=invoice_number
+        )
+    timings["total_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    _update_job(
+        job_id,
+        status=JOB_SUCCEEDED,
+        stage="done",
+        invoice_id=invoice_id,
+        http_status=200,
+        timings=json.dumps(timings),
+        result=json.dumps({
+            "invoice_id": invoice_id,
+            "invoice": data,
+            "parse_timings": parse_timings,
+            "sql_statements": sql_statements,
+        }),
+    )
+
+
+def _resumable(job, stale_before):
+    if job.status == JOB_QUEUED:
+        # _claim_job lets only one process run it.
+        return True
+    alive = _worker_alive(job.worker)
+    if alive is None:
+        return job.updated_at is None or job.updated_at < stale_before
+    return not alive
+
+
+def resume_upload_jobs():
+    """
+    Re-queues queued jobs and running jobs whose process is gone: its pid
+    no longer exists on this host, or, when that cannot be checked, the job
+    has not moved for UPLOAD_JOB_STALE_SECONDS. Jobs still held by a live
+    process are left alone. A job whose invoice was already stored is only
+    finished off; one whose uploaded file is gone is marked failed.
+    """
+    stale_before = datetime.utcnow() - timedelta(seconds=UPLOAD_JOB_STALE_SECONDS)
+    db = SessionLocal()
+    try:
+        rows = db.query(UploadJob).filter(UploadJob.status.in_([JOB_QUEUED, JOB_RUNNING])).all()
+        resumed = []
+        for job in rows:
+            if not _resumable(job, stale_before):
+                continue
+            if job.invoice_id is not None or (job.file_path and os.path.exists(job.file_path)):
+                fields = {"status": JOB_QUEUED, "stage": "queued"}
+            else:
+                fields = {"status": JOB_FAILED, "error": "uploaded file missing after restart", "http_status": 500}
+            # Only if nobody claimed or finished it since it was read.
+            updated = db.query(UploadJob).filter(
+                UploadJob.id == job.id,
+                UploadJob.status == job.status,
+                UploadJob.worker == job.worker,
+            ).update(fields, synchronize_session=False)
+            if updated and fields["status"] == JOB_QUEUED:
+                resumed.append(job.id)
+        db.commit()
+    finally:
+        db.close()
+
+    for job_id in resumed:
+        _get_executor().submit(run_upload_job, job_id)
+    return resumed
+
+
+def upload_job_payload(job):
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "stage": job.stage,
+        "file": job.original_filename,
+        "invoice_number": job.invoice_number or "",
+        "invoice_id": job.invoice_id,
+        "uploaded_by": job.username,
+        "timings": json.loads(job.timings) if job.timings else {},
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "http_status": job.http_status,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+    }
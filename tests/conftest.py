@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+from sqlalchemy import create_engine
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+import models  # noqa: E402,F401  (registers every table on Base)
+import services.stock_service  # noqa: E402,F401  (registers the stock flush listener)
+from database import Base, SessionLocal  # noqa: E402
+from services import audit_archive, price_index  # noqa: E402
+from services.db_migrations import run_migrations  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    """
+    A fresh, fully migrated SQLite file in tmp_path. Process-wide caches
+    keyed on things a new database reuses (price list version, archive
+    day) start empty.
+    """
+    monkeypatch.setattr(price_index, "_index", None)
+    monkeypatch.setattr(audit_archive, "AUDIT_ARCHIVE_FOLDER", str(tmp_path / "audit_archive"))
+    audit_archive._manifest_cache.clear()
+    audit_archive.clear_day_cache()
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    run_migrations(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    """An app session (so the stock and price list flush listeners run) on the test database."""
+    session = SessionLocal(bind=engine)
+    yield session
+    session.rollback()
+    session.close()
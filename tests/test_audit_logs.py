@@ -0,0 +1,213 @@
+import random
+from datetime import date, datetime, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from services import audit_archive
+from services.audit_archive import (
+    FILES_LOCK,
+    RUN_LOCK,
+    archive_audit_logs,
+    archived_days,
+    day_manifest,
+    read_archived_day,
+)
+from services.audit_query import audit_log_page
+from services.pagination import decode_cursor, encode_cursor, get_page_args, split_page
+from services.sales_utils import stored_datetime_iso
+
+USERS = [("owner", "owner"), ("supervisor", "supervisor"), ("staff1", "staff"), ("staff2", "staff")]
+ACTIONS = ["login", "upload_invoice", "EDIT_INVOICE", "create_sell_report"]
+START = datetime(2026, 1, 1)
+NOW = START + timedelta(days=10)
+
+
+def seed(engine, rows, start, days, seed=1):
+    """Audit rows spread over days from start, with some sharing a created_at."""
+    rng = random.Random(seed)
+    step = days * 86400 / rows
+    batch = []
+    for n in range(rows):
+        username, role = rng.choice(USERS)
+        created_at = start + timedelta(seconds=int(n * step) // 2 * 2)
+        batch.append({
+            "username": username, "role": role, "action": rng.choice(ACTIONS),
+            "entity_type": "invoice", "entity_id": str(n), "details": f"row {n}",
+            "created_at": created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        })
+    with engine.begin() as conn:
+        conn.execute(text(
+            "INSERT INTO audit_logs (username, role, action, entity_type, entity_id, details, created_at) "
+            "VALUES (:username, :role, :action, :entity_type, :entity_id, :details, :created_at)"
+        ), batch)
+
+
+def all_rows(engine):
+    with engine.connect() as conn:
+        return [dict(r) for r in conn.execute(text(
+            "SELECT id, username, role, action, entity_type, entity_id, details, created_at FROM audit_logs"
+        )).mappings()]
+
+
+def expected(rows, filters):
+    keep = [
+        r for r in rows
+        if all(r[k] == v for k, v in filters.items() if k not in ("date_from", "date_to"))
+        and ("date_from" not in filters or r["created_at"][:10] >= filters["date_from"].isoformat())
+        and ("date_to" not in filters or r["created_at"][:10] <= filters["date_to"].isoformat())
+    ]
+    keep.sort(key=lambda r: (r["created_at"], r["id"]), reverse=True)
+    return [(stored_datetime_iso(r["created_at"]), r["entity_id"], r["details"]) for r in keep]
+
+
+def every_page(db, filters, limit):
+    seen, cursor = [], None
+    while True:
+        items, next_cursor = audit_log_page(db, filters, limit, decode_cursor(cursor, 2) if cursor else None)
+        assert len(items) <= limit
+        seen += [(i["created_at"], i["entity_id"], i["details"]) for i in items]
+        if not next_cursor:
+            return seen
+        assert len(items) == limit
+        cursor = next_cursor
+
+
+FILTERS = [
+    {},
+    {"username": "staff1"},
+    {"username": "owner", "action": "EDIT_INVOICE"},
+    {"role": "staff", "date_from": date(2026, 1, 3), "date_to": date(2026, 1, 5)},
+    {"action": "no_such_action"},
+]
+
+
+def test_cursor_round_trip_and_bad_cursors():
+    cursor = encode_cursor("2026-01-01 10:00:00", 42)
+    assert decode_cursor(cursor, 2) == ["2026-01-01 10:00:00", 42]
+    for bad in ("not base64!", encode_cursor("x"), encode_cursor({"a": 1}, 2), encode_cursor([1], 2)):
+        with pytest.raises(ValueError):
+            decode_cursor(bad, 2)
+    assert get_page_args({}) == (None, None)
+    assert get_page_args({"limit": "5", "cursor": cursor}, cursor_size=2) == (5, ["2026-01-01 10:00:00", 42])
+    for args in ({"cursor": cursor}, {"limit": "0"}, {"limit": "x"}):
+        with pytest.raises(ValueError):
+            get_page_args(args, cursor_size=2)
+
+
+def test_split_page():
+    rows = [{"k": n} for n in range(4)]
+    page, cursor = split_page(rows, 3, lambda r: (r["k"],))
+    assert page == rows[:3]
+    assert decode_cursor(cursor, 1) == [2]
+    assert split_page(rows[:3], 3, lambda r: (r["k"],)) == (rows[:3], None)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_pages_walk_the_table_in_order(engine, db, filters):
+    seed(engine, 1500, START, 8)
+    assert every_page(db, filters, 97) == expected(all_rows(engine), filters)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_pages_continue_into_the_archive(engine, db, filters):
+    seed(engine, 3000, START, 6)
+    rows = all_rows(engine)
+    result = archive_audit_logs(retention_days=4, chunk_size=700, now=NOW, bind=engine)
+    assert result["archived"] > 0
+    # Archiving can empty the table, after which SQLite hands out the
+    # archived rows' ids again.
+    seed(engine, 500, START + timedelta(days=6), 4, seed=2)
+    rows += [r for r in all_rows(engine) if r["created_at"] >= "2026-01-07"]
+
+    assert archived_days()
+    assert every_page(db, filters, 137) == expected(rows, filters)
+
+
+def test_rows_with_reused_ids_are_all_kept(engine, db):
+    seed(engine, 300, START, 2)
+    rows = all_rows(engine)
+    archive_audit_logs(retention_days=7, now=NOW, bind=engine)
+    seed(engine, 300, START + timedelta(days=5), 2, seed=2)
+    new_rows = all_rows(engine)
+    assert {r["id"] for r in new_rows} & {r["id"] for r in rows}
+
+    items, next_cursor = audit_log_page(db, {}, 1000)
+    assert next_cursor is None
+    assert [(i["created_at"], i["entity_id"], i["details"]) for i in items] == expected(rows + new_rows, {})
+
+
+def test_archive_moves_old_rows_and_writes_manifests(engine):
+    seed(engine, 2000, START, 6)
+    before = all_rows(engine)
+    result = archive_audit_logs(retention_days=7, chunk_size=300, now=NOW, bind=engine)
+
+    cutoff = result["cutoff"]
+    assert cutoff == "2026-01-04"
+    old = [r for r in before if r["created_at"] < cutoff]
+    assert result["archived"] == len(old)
+    assert [r["created_at"] for r in all_rows(engine)] == sorted(r["created_at"] for r in before if r["created_at"] >= cutoff)
+    assert [d.isoformat() for d in archived_days()] == result["days"] == ["2026-01-01", "2026-01-02", "2026-01-03"]
+
+    for day in archived_days():
+        rows = [r for r in old if r["created_at"][:10] == day.isoformat()]
+        assert sorted(r["id"] for r in read_archived_day(day)) == sorted(r["id"] for r in rows)
+        manifest = day_manifest(day)
+        assert manifest["rows"] == len(rows)
+        assert manifest["username"] == sorted({r["username"] for r in rows})
+        assert manifest["action"] == sorted({r["action"] for r in rows})
+        assert manifest["min_created_at"] == min(r["created_at"] for r in rows)
+        assert manifest["max_created_at"] == max(r["created_at"] for r in rows)
+
+
+def test_read_archived_day_filters_and_orders(engine):
+    seed(engine, 1000, START, 2)
+    old = all_rows(engine)
+    archive_audit_logs(retention_days=8, now=NOW, bind=engine)
+    day = date(2026, 1, 1)
+    rows = [r for r in old if r["created_at"] < "2026-01-02"]
+
+    staff1 = read_archived_day(day, {"username": "staff1"})
+    assert [r["id"] for r in staff1] == [
+        r["id"] for r in sorted(rows, key=lambda r: (r["created_at"], r["id"]), reverse=True)
+        if r["username"] == "staff1"
+    ]
+    before = (staff1[10]["created_at"], staff1[10]["id"])
+    assert read_archived_day(day, {"username": "staff1"}, before=before, limit=5) == staff1[11:16]
+
+
+def test_stale_manifest_is_rebuilt(engine):
+    seed(engine, 500, START, 1)
+    archive_audit_logs(retention_days=8, now=NOW, bind=engine)
+    day = date(2026, 1, 1)
+    manifest = day_manifest(day)
+    audit_archive._manifest_cache.clear()
+    with open(audit_archive._manifest_path(day), "w") as f:
+        f.write("{}")
+    assert day_manifest(day) == manifest
+
+
+def test_a_chunk_archived_twice_is_read_once(engine, db):
+    seed(engine, 800, START, 2)
+    rows = all_rows(engine)
+    old = [r for r in rows if r["created_at"] < "2026-01-02"]
+    # A crash after appending a chunk but before deleting it leaves the
+    # rows in the table and the file; the next run appends them again.
+    with audit_archive._archive_lock(FILES_LOCK):
+        audit_archive._append_day(date(2026, 1, 1), old[:200])
+    assert every_page(db, {}, 150) == expected(rows, {})
+
+    archive_audit_logs(retention_days=8, now=NOW, bind=engine)
+    assert day_manifest(date(2026, 1, 1))["rows"] == len(old) + 200
+    assert every_page(db, {}, 150) == expected(rows, {})
+
+
+def test_archiver_skips_while_another_run_holds_the_lock(engine):
+    seed(engine, 100, START, 1)
+    with audit_archive._archive_lock(RUN_LOCK, blocking=False) as acquired:
+        assert acquired
+        result = archive_audit_logs(retention_days=8, now=NOW, bind=engine)
+    assert result["archived"] == 0
+    assert result["skipped"]
+    assert len(all_rows(engine)) == 100
+    assert archive_audit_logs(retention_days=8, now=NOW, bind=engine)["archived"] == 100
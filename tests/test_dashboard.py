@@ -0,0 +1,61 @@
+import pytest
+from sqlalchemy import text
+
+from models import DashboardSnapshot, PresentStockDetail
+from services.dashboard import (
+    SNAPSHOT_FIELDS,
+    SNAPSHOT_ID,
+    compute_dashboard_values,
+    get_dashboard_snapshot,
+    refresh_dashboard_snapshot,
+    snapshot_drift,
+    store_dashboard_snapshot,
+)
+
+
+def add_stock(db, brand_number, cases, amount):
+    db.add(PresentStockDetail(
+        brand_number=brand_number, pack_size_case=12, pack_size_quantity_ml=750,
+        total_cases=cases, total_bottles=cases * 12, total_amount=amount,
+    ))
+
+
+def stored(db):
+    db.expire_all()
+    row = db.get(DashboardSnapshot, SNAPSHOT_ID)
+    return {f: getattr(row, f) for f in SNAPSHOT_FIELDS}
+
+
+def test_write_path_uses_the_stock_summary(db):
+    add_stock(db, "1001", 10, 1000.0)
+    add_stock(db, "1002", 2, 200.0)
+    refresh_dashboard_snapshot(db)
+    db.commit()
+
+    snapshot = stored(db)
+    assert snapshot["total_present_stock"] == 12
+    assert snapshot["stock_summary_value"] == pytest.approx(1200.0)
+    # Only the MRP value is left stale for the next read.
+    assert set(snapshot_drift(snapshot, compute_dashboard_values(db))) == {"present_stock_mrp_value", "price_list_version"}
+
+
+def test_fresh_values_report_summary_drift(db):
+    add_stock(db, "1001", 10, 1000.0)
+    db.commit()
+    # The summary falls out of step with the stock rows.
+    db.execute(text("UPDATE stock_summary SET total_cases_all_items = 4, total_price_all_items = 400.0"))
+    db.commit()
+    refresh_dashboard_snapshot(db)
+    db.commit()
+    snapshot = stored(db)
+    assert snapshot["total_present_stock"] == 4
+
+    fresh = compute_dashboard_values(db)
+    drift = snapshot_drift(snapshot, fresh)
+    assert drift["total_present_stock"] == {"stored": 4, "fresh": 10}
+    assert drift["stock_summary_value"] == {"stored": 400.0, "fresh": 1000.0}
+
+    store_dashboard_snapshot(db, fresh)
+    db.commit()
+    assert snapshot_drift(stored(db), compute_dashboard_values(db)) == {}
+    assert get_dashboard_snapshot(db)["total_present_stock"] == 10
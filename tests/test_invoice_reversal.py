@@ -0,0 +1,164 @@
+import pytest
+from sqlalchemy import text
+
+from models import Invoice, InvoiceItem, InvoiceTotals, PresentStockDetail, PriceListItem, StockMovement, StockSummary
+from services.invoice_upload import reverse_invoice, store_invoice
+from services.stock_ledger import INVOICE, INVOICE_DELETE, check_stock_ledger, set_movement_context
+from services.stock_service import check_stock_summary
+
+WHISKY = ("1001", 12, 750)
+BEER = ("2002", 24, 330)
+
+
+def item(sku, pack_type, cases, bottles=0):
+    return {
+        "brand_number": sku[0], "brand_name": f"BRAND {sku[0]}", "product_type": "IML",
+        "pack_type": pack_type, "pack_size_case": sku[1], "pack_size_quantity_ml": sku[2],
+        "cases_delivered": cases, "bottles_delivered": bottles,
+    }
+
+
+def upload(db, number, invoice_date, items):
+    set_movement_context(db, INVOICE, number, username="owner")
+    store_invoice(db, {
+        "invoice_meta": {"invoice_number": number, "invoice_date": invoice_date},
+        "retailer": {"name": "SHOP", "code": "R1"},
+        "licensee": {"pan": "PAN"},
+        "items": items,
+    }, "owner")
+    db.commit()
+
+
+def delete(db, number):
+    """What DELETE /admin/invoices/<invoice_number> does."""
+    set_movement_context(db, INVOICE_DELETE, number, username="admin")
+    report = reverse_invoice(db, number)
+    db.query(InvoiceItem).filter(InvoiceItem.invoice_number == number).delete()
+    db.query(InvoiceTotals).filter(InvoiceTotals.invoice_number == number).delete()
+    db.query(Invoice).filter(Invoice.invoice_number == number).delete()
+    db.commit()
+    return report
+
+
+def stock(db, sku):
+    db.expire_all()
+    row = db.query(PresentStockDetail).filter_by(
+        brand_number=sku[0], pack_size_case=sku[1], pack_size_quantity_ml=sku[2]
+    ).one()
+    return row.total_cases, row.total_bottles, row.total_amount, row.last_invoice_date
+
+
+def set_mrp(db, sku, mrp):
+    db.query(PriceListItem).filter_by(brand_number=sku[0]).update({"mrp": mrp})
+    db.commit()
+
+
+@pytest.fixture
+def prices(db):
+    db.add_all([
+        PriceListItem(brand_number=WHISKY[0], pack_type="G", volume_ml=WHISKY[2], mrp=500.0, size_code="W"),
+        PriceListItem(brand_number=BEER[0], pack_type="C", volume_ml=BEER[2], mrp=100.0, size_code="B"),
+    ])
+    db.commit()
+
+
+def assert_consistent(db):
+    assert check_stock_ledger(db) == []
+    assert not check_stock_summary(db)["drift"]
+
+
+def test_delete_takes_back_only_that_invoice(db, prices):
+    upload(db, "INV1", "01-Jan-2026", [item(WHISKY, "G", 2), item(BEER, "C", 1)])
+    upload(db, "INV2", "05-Jan-2026", [item(WHISKY, "G", 3, 4), item(WHISKY, "G", 1)])
+    assert stock(db, WHISKY) == (6, 4, 500.0 * (72 + 4), "05-Jan-2026")
+
+    report = delete(db, "INV2")
+
+    assert report["items"] == 2
+    assert report["stock_rows"] == 1
+    assert report["cases_removed"] == 4
+    assert report["amount_removed"] == pytest.approx(500.0 * 52)
+    assert report["clamped_stock_rows"] == 0
+    assert stock(db, WHISKY) == (2, 0, 500.0 * 24, "01-Jan-2026")
+    assert stock(db, BEER) == (1, 0, 100.0 * 24, "01-Jan-2026")
+    assert_consistent(db)
+
+
+def test_delete_reverses_the_amounts_stored_at_upload(db, prices):
+    upload(db, "INV1", "01-Jan-2026", [item(WHISKY, "G", 2)])
+    upload(db, "INV2", "05-Jan-2026", [item(WHISKY, "G", 1)])
+    set_mrp(db, WHISKY, 800.0)
+
+    report = delete(db, "INV2")
+
+    assert report["amount_removed"] == pytest.approx(500.0 * 12)
+    assert stock(db, WHISKY)[2] == pytest.approx(500.0 * 24)
+    assert_consistent(db)
+
+
+def test_invoice_from_before_the_ledger_falls_back_to_mrp(db, prices):
+    upload(db, "OLD", "01-Jan-2026", [item(WHISKY, "G", 2)])
+    upload(db, "INV2", "05-Jan-2026", [item(WHISKY, "G", 1)])
+    db.query(StockMovement).filter(StockMovement.reference == "OLD").delete()
+    db.commit()
+    set_mrp(db, WHISKY, 400.0)
+
+    report = delete(db, "OLD")
+
+    assert report["cases_removed"] == 2
+    assert report["amount_removed"] == pytest.approx(400.0 * 24)
+    assert stock(db, WHISKY)[:2] == (1, 0)
+    assert stock(db, WHISKY)[2] == pytest.approx(500.0 * 36 - 400.0 * 24)
+
+
+def test_reuploaded_invoice_is_reversed_once(db, prices):
+    upload(db, "INV1", "01-Jan-2026", [item(WHISKY, "G", 2)])
+    upload(db, "INV2", "05-Jan-2026", [item(WHISKY, "G", 1)])
+    delete(db, "INV2")
+    upload(db, "INV2", "06-Jan-2026", [item(WHISKY, "G", 1)])
+
+    report = delete(db, "INV2")
+
+    assert report["cases_removed"] == 1
+    assert stock(db, WHISKY) == (2, 0, 500.0 * 24, "01-Jan-2026")
+    assert_consistent(db)
+
+
+def test_last_invoice_date_comes_from_the_newest_other_invoice(db, prices):
+    upload(db, "INV1", "01-Jan-2026", [item(WHISKY, "G", 1)])
+    upload(db, "INV2", "03-Jan-2026", [item(WHISKY, "G", 1), item(BEER, "C", 1)])
+    upload(db, "INV3", "05-Jan-2026", [item(WHISKY, "G", 1), item(BEER, "C", 1)])
+
+    delete(db, "INV3")
+    assert stock(db, WHISKY)[3] == "03-Jan-2026"
+    assert stock(db, BEER)[3] == "03-Jan-2026"
+
+    delete(db, "INV2")
+    assert stock(db, WHISKY)[3] == "01-Jan-2026"
+    assert stock(db, BEER)[3] == ""
+
+
+def test_totals_are_clamped_at_zero(db, prices):
+    upload(db, "INV1", "01-Jan-2026", [item(WHISKY, "G", 3)])
+    # Sold down below what the invoice added, outside the ORM.
+    db.execute(text("UPDATE present_stock_details SET total_cases = 1, total_bottles = 0, total_amount = 6000.0"))
+    db.execute(text("UPDATE stock_summary SET total_cases_all_items = 1, total_price_all_items = 6000.0"))
+    db.commit()
+
+    report = delete(db, "INV1")
+
+    assert report["clamped_stock_rows"] == 1
+    assert report["cases_removed"] == 1
+    assert stock(db, WHISKY)[:3] == (0, 0, 0.0)
+    summary = db.query(StockSummary).one()
+    assert (summary.total_cases_all_items, summary.total_price_all_items) == (0, pytest.approx(0.0))
+
+
+def test_delete_of_stock_that_is_gone_is_reported_missing(db, prices):
+    upload(db, "INV1", "01-Jan-2026", [item(WHISKY, "G", 1), item(BEER, "C", 1)])
+    db.query(PresentStockDetail).filter_by(brand_number=BEER[0]).delete()
+    db.commit()
+
+    report = delete(db, "INV1")
+    assert report["missing_stock_rows"] == 1
+    assert report["stock_rows"] == 1
@@ -0,0 +1,38 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services import parse_cache
+from services.parse_cache import get_cached_parse, store_parsed
+
+DIGEST = "ab" * 32
+
+
+@pytest.fixture(autouse=True)
+def cache_folder(tmp_path, monkeypatch):
+    folder = tmp_path / "parse_cache"
+    monkeypatch.setattr(parse_cache, "PARSE_CACHE_FOLDER", str(folder))
+    return folder
+
+
+def test_threads_storing_the_same_digest_do_not_collide(cache_folder):
+    data = {"items": [{"brand_number": str(n)} for n in range(2000)]}
+    with ThreadPoolExecutor(8) as pool:
+        list(pool.map(lambda _: store_parsed(DIGEST, data), range(32)))
+
+    assert get_cached_parse(DIGEST) == data
+    assert [p.name for p in cache_folder.iterdir()] == [f"{DIGEST}.v{parse_cache.PARSER_VERSION}.json"]
+
+
+def test_parser_version_is_part_of_the_key(monkeypatch):
+    store_parsed(DIGEST, {"items": []})
+    monkeypatch.setattr(parse_cache, "PARSER_VERSION", parse_cache.PARSER_VERSION + 1)
+    assert get_cached_parse(DIGEST) is None
+
+
+def test_failed_write_is_not_an_error(cache_folder):
+    cache_folder.write_text("a file where the folder should be")
+    store_parsed(DIGEST, {"items": []})
+    assert get_cached_parse(DIGEST) is None
+    assert os.path.isfile(cache_folder)
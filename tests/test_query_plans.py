@@ -0,0 +1,16 @@
+import pytest
+
+from services.query_plans import HOT_QUERIES, check_hot_query_plans
+
+
+def test_every_hot_query_uses_an_index(engine):
+    results = check_hot_query_plans(engine)
+    assert [r["name"] for r in results] == [q[0] for q in HOT_QUERIES]
+    failed = {r["name"]: r["plan"] for r in results if not r["ok"]}
+    assert not failed
+
+
+@pytest.mark.parametrize("name", [q[0] for q in HOT_QUERIES])
+def test_hot_query_uses_its_expected_index(engine, name):
+    result = next(r for r in check_hot_query_plans(engine) if r["name"] == name)
+    assert result["uses_expected_index"], result["plan"]
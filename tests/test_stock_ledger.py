@@ -0,0 +1,144 @@
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy import text
+
+from models import PresentStockDetail, StockMovement
+from services.db_migrations import ensure_stock_movements_support
+from services.stock_ledger import (
+    INVOICE,
+    OPENING,
+    SALE,
+    check_stock_ledger,
+    ledger_start_date,
+    set_movement_context,
+    stock_as_of,
+    write_stock_snapshot,
+)
+
+DAY1 = date(2026, 1, 5)
+DAY2 = date(2026, 1, 6)
+DAY3 = date(2026, 1, 7)
+SKU = ("1001", 12, 750)
+NULL_SKU = (None, 24, 375)
+
+
+def stock_row(sku, cases, bottles, amount):
+    return PresentStockDetail(
+        brand_number=sku[0], pack_size_case=sku[1], pack_size_quantity_ml=sku[2],
+        total_cases=cases, total_bottles=bottles, total_amount=amount,
+    )
+
+
+def find(db, sku):
+    return db.query(PresentStockDetail).filter(
+        PresentStockDetail.brand_number.is_(sku[0]) if sku[0] is None
+        else PresentStockDetail.brand_number == sku[0],
+        PresentStockDetail.pack_size_case == sku[1],
+    ).one()
+
+
+def three_days(db):
+    """Invoice on DAY1, a sale on DAY2 and a second invoice on DAY3."""
+    set_movement_context(db, INVOICE, reference="INV1", movement_date=DAY1, username="owner")
+    db.add(stock_row(SKU, 10, 120, 1200.0))
+    db.add(stock_row(NULL_SKU, 2, 48, 96.0))
+    db.commit()
+
+    set_movement_context(db, SALE, reference="R1", movement_date=DAY2, username="owner")
+    row = find(db, SKU)
+    row.total_cases, row.total_bottles, row.total_amount = 7, 84, 840.0
+    db.commit()
+
+    set_movement_context(db, INVOICE, reference="INV2", movement_date=DAY3, username="owner")
+    row = find(db, NULL_SKU)
+    row.total_cases, row.total_bottles, row.total_amount = 5, 120, 240.0
+    db.commit()
+
+
+def test_orm_stock_changes_are_recorded_as_movements(db):
+    three_days(db)
+
+    movements = db.query(StockMovement).order_by(StockMovement.id).all()
+    assert [(m.kind, m.reference, m.movement_date, m.cases_delta, m.bottles_delta) for m in movements] == [
+        (INVOICE, "INV1", DAY1, 10, 120),
+        (INVOICE, "INV1", DAY1, 2, 48),
+        (SALE, "R1", DAY2, -3, -36),
+        (INVOICE, "INV2", DAY3, 3, 72),
+    ]
+    assert movements[-1].brand_number is None
+    assert check_stock_ledger(db) == []
+
+
+def test_deleting_stock_moves_the_ledger_to_zero(db):
+    three_days(db)
+    db.delete(find(db, SKU))
+    db.commit()
+
+    assert check_stock_ledger(db) == []
+    stock, _ = stock_as_of(db, DAY3 + timedelta(days=1))
+    assert stock[SKU] == (0, 0, 0.0)
+
+
+def test_check_reports_stock_written_around_the_ledger(db):
+    three_days(db)
+    db.execute(text("UPDATE present_stock_details SET total_cases = total_cases + 1 WHERE brand_number = '1001'"))
+
+    mismatches = check_stock_ledger(db)
+    assert len(mismatches) == 1
+    assert mismatches[0]["brand_number"] == "1001"
+    assert mismatches[0]["ledger"]["total_cases"] == 7
+    assert mismatches[0]["present"]["total_cases"] == 8
+
+
+def test_stock_as_of_replays_the_ledger(db):
+    three_days(db)
+
+    stock, snapshot_date = stock_as_of(db, DAY1)
+    assert snapshot_date is None
+    assert stock == {SKU: (10, 120, 1200.0), NULL_SKU: (2, 48, 96.0)}
+    assert stock_as_of(db, DAY2)[0][SKU] == (7, 84, 840.0)
+    assert stock_as_of(db, DAY3)[0] == {SKU: (7, 84, 840.0), NULL_SKU: (5, 120, 240.0)}
+
+
+def test_stock_as_of_matches_with_snapshots(db):
+    three_days(db)
+    expected = {day: stock_as_of(db, day)[0] for day in (DAY1, DAY2, DAY3)}
+
+    write_stock_snapshot(db, DAY1)
+    db.commit()
+    # A late movement dated before the snapshot's day, recorded after it.
+    set_movement_context(db, SALE, reference="R0", movement_date=DAY1)
+    row = find(db, NULL_SKU)
+    row.total_cases, row.total_amount = row.total_cases - 1, row.total_amount - 48.0
+    db.commit()
+    expected = {
+        day: {**stock, NULL_SKU: (stock[NULL_SKU][0] - 1, stock[NULL_SKU][1], stock[NULL_SKU][2] - 48.0)}
+        for day, stock in expected.items()
+    }
+
+    for day in (DAY1, DAY2, DAY3):
+        stock, snapshot_date = stock_as_of(db, day)
+        assert snapshot_date == DAY1
+        assert stock == expected[day]
+
+    write_stock_snapshot(db, DAY2)
+    db.commit()
+    assert stock_as_of(db, DAY3) == (expected[DAY3], DAY2)
+
+
+def test_stock_as_of_rejects_dates_before_the_opening_balance(engine, db):
+    db.execute(text("DELETE FROM stock_movements"))
+    db.execute(text(
+        "INSERT INTO present_stock_details (brand_number, pack_size_case, pack_size_quantity_ml, "
+        "total_cases, total_bottles, total_amount) VALUES ('1001', 12, 750, 4, 48, 480.0)"
+    ))
+    db.commit()
+    ensure_stock_movements_support(engine)
+
+    start = ledger_start_date(db)
+    assert start is not None
+    assert db.query(StockMovement.kind).distinct().all() == [(OPENING,)]
+    assert stock_as_of(db, start)[0] == {SKU: (4, 48, 480.0)}
+    with pytest.raises(ValueError):
+        stock_as_of(db, start - timedelta(days=1))
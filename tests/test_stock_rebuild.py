@@ -0,0 +1,218 @@
+import random
+import shutil
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from models import Invoice, InvoiceItem, PresentStockDetail, PriceListItem, StockSummary
+from services.price_index import PriceIndex
+from services.stock_ledger import check_stock_ledger
+from services.stock_service import rebuild_stock_from_invoices
+
+STOCK_COLUMNS = (
+    "id", "brand_number", "brand_name", "product_type", "pack_type", "pack_size_case",
+    "pack_size_quantity_ml", "total_cases", "total_bottles", "rate_per_case",
+    "unit_rate_per_bottle", "total_amount", "last_invoice_date", "last_updated_item_name",
+)
+SUMMARY_COLUMNS = ("id", "total_cases_all_items", "total_price_all_items", "last_updated_item_name")
+
+
+def reference_rebuild(db):
+    """The row-by-row ORM rebuild that the SQL rebuild replaced, kept as the oracle."""
+    db.query(PresentStockDetail).delete()
+    summary = db.query(StockSummary).first()
+    if not summary:
+        summary = StockSummary(total_cases_all_items=0, total_price_all_items=0.0)
+        db.add(summary)
+        db.flush()
+    summary.total_cases_all_items = 0
+    summary.total_price_all_items = 0.0
+    summary.last_updated_item_name = ""
+
+    price_rows = db.query(
+        PriceListItem.brand_number,
+        PriceListItem.pack_type,
+        PriceListItem.volume_ml,
+        PriceListItem.mrp,
+        PriceListItem.product_name,
+    ).order_by(PriceListItem.id.asc()).all()
+    mrp_map = PriceIndex(None, price_rows).mrp_by_pack
+
+    invoices = db.query(Invoice).order_by(Invoice.id.asc()).all()
+    invoice_date_map = {inv.invoice_number: inv.invoice_date for inv in invoices}
+
+    items = db.query(InvoiceItem).order_by(InvoiceItem.id.asc()).all()
+    stock_map = {}
+    for it in items:
+        key = (it.brand_number, it.pack_size_case, it.pack_size_quantity_ml)
+        pack_size = int(it.pack_size_case or 0)
+        cases = int(it.cases_delivered or 0)
+        bottles = int(it.bottles_delivered or 0)
+        total_bottles = cases * pack_size + bottles
+
+        mrp_key = (str(it.brand_number or "").strip(), str(it.pack_type or "").strip(), int(it.pack_size_quantity_ml or 0))
+        mrp = mrp_map.get(mrp_key)
+        unit_rate = float(mrp) if mrp is not None else None
+        rate_per_case = float(mrp) * float(pack_size) if (mrp is not None and pack_size) else None
+        total_amount = float(mrp) * float(total_bottles) if mrp is not None else 0.0
+
+        if key not in stock_map:
+            stock_map[key] = {
+                "brand_number": it.brand_number,
+                "brand_name": it.brand_name,
+                "product_type": it.product_type,
+                "pack_type": it.pack_type,
+                "pack_size_case": it.pack_size_case,
+                "pack_size_quantity_ml": it.pack_size_quantity_ml,
+                "total_cases": 0,
+                "total_bottles": 0,
+                "rate_per_case": rate_per_case,
+                "unit_rate_per_bottle": unit_rate,
+                "total_amount": 0.0,
+                "last_invoice_date": invoice_date_map.get(it.invoice_number, ""),
+            }
+
+        entry = stock_map[key]
+        entry["total_cases"] += cases
+        entry["total_bottles"] += total_bottles
+        entry["total_amount"] += total_amount
+        entry["rate_per_case"] = rate_per_case or entry.get("rate_per_case")
+        entry["unit_rate_per_bottle"] = unit_rate or entry.get("unit_rate_per_bottle")
+        entry["last_invoice_date"] = invoice_date_map.get(it.invoice_number, entry["last_invoice_date"])
+
+        item_display = f"{it.brand_name or ''} {it.pack_size_quantity_ml or 0}ml/{it.pack_size_case or 0}"
+        entry["last_updated_item_name"] = item_display
+
+    for entry in stock_map.values():
+        db.add(PresentStockDetail(**entry))
+        summary.total_cases_all_items += entry["total_cases"] or 0
+        summary.total_price_all_items += entry["total_amount"] or 0.0
+        summary.last_updated_item_name = entry.get("last_updated_item_name") or summary.last_updated_item_name
+
+
+def seed_invoices(engine, items, seed):
+    """
+    Adds a price list and random invoice items that hit the awkward paths:
+    missing MRPs, zero MRPs and pack sizes, NULL counts and brand numbers,
+    items whose invoice is gone and repeated SKUs across invoices.
+    """
+    rng = random.Random(seed)
+    db = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        prices = []
+        for n in range(60):
+            prices.append(PriceListItem(
+                brand_number=f"{1000 + n}",
+                pack_type=rng.choice(["G", "P", "C"]),
+                volume_ml=rng.choice([180, 375, 750, 1000]),
+                mrp=rng.choice([120.0, 250.5, 480.0, 999.99]),
+                product_name=f"PRODUCT {n}",
+                size_code=f"S{n}",
+            ))
+        # A second price for an existing pack: the first row must win.
+        prices.append(PriceListItem(
+            brand_number=prices[0].brand_number, pack_type=prices[0].pack_type,
+            volume_ml=prices[0].volume_ml, mrp=1.0, size_code="DUP",
+        ))
+        prices.append(PriceListItem(brand_number="ZERO", pack_type="G", volume_ml=750, mrp=0.0, size_code="Z"))
+        db.add_all(prices)
+
+        numbers = []
+        for n in range(5):
+            number = f"CHECK{seed}{n:03d}"
+            numbers.append(number)
+            db.add(Invoice(invoice_number=number, invoice_date=None if n == 3 else f"{n + 1:02d}-Jan-2026"))
+        numbers.append("GONE-INVOICE")
+        for _ in range(items):
+            roll = rng.random()
+            if roll < 0.7:
+                p = rng.choice(prices)
+                brand, pack_type, volume = p.brand_number, p.pack_type, p.volume_ml
+            elif roll < 0.8:
+                brand, pack_type, volume = "ZERO", "G", 750
+            elif roll < 0.85:
+                brand, pack_type, volume = None, "G", 750
+            else:
+                brand, pack_type, volume = f"NOPRICE{rng.randint(0, 5)}", rng.choice(["G", "P", None]), 375
+            db.add(InvoiceItem(
+                invoice_number=rng.choice(numbers),
+                brand_number=brand,
+                brand_name=rng.choice([f"BRAND {brand}", None, ""]),
+                product_type=rng.choice(["IML", "BEER", None]),
+                pack_type=pack_type,
+                pack_size_case=rng.choice([12, 24, 48, 0, None]),
+                pack_size_quantity_ml=volume,
+                cases_delivered=rng.choice([0, 1, 2, 5, None]),
+                bottles_delivered=rng.choice([0, 3, None]),
+            ))
+        db.commit()
+    finally:
+        db.close()
+
+
+def snapshot(engine):
+    # typeof() catches an integer stored where the reference stored a real.
+    with engine.connect() as conn:
+        stock = conn.execute(text(
+            "SELECT " + ", ".join(f"{c}, typeof({c})" for c in STOCK_COLUMNS)
+            + " FROM present_stock_details ORDER BY id"
+        )).all()
+        summary = conn.execute(text(
+            "SELECT " + ", ".join(f"{c}, typeof({c})" for c in SUMMARY_COLUMNS)
+            + " FROM stock_summary ORDER BY id"
+        )).all()
+    return [tuple(r) for r in stock], [tuple(r) for r in summary]
+
+
+def run_rebuild(db_path, rebuild):
+    engine = create_engine(f"sqlite:///{db_path}")
+    db = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        rebuild(db)
+        db.commit()
+    finally:
+        db.close()
+    result = snapshot(engine)
+    engine.dispose()
+    return result
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_sql_rebuild_matches_reference(engine, tmp_path, seed):
+    seed_invoices(engine, 1500, seed)
+    engine.dispose()
+    source = engine.url.database
+    ref_path = tmp_path / "reference.db"
+    sql_path = tmp_path / "sql.db"
+    shutil.copyfile(source, ref_path)
+    shutil.copyfile(source, sql_path)
+
+    ref_stock, ref_summary = run_rebuild(ref_path, reference_rebuild)
+    sql_stock, sql_summary = run_rebuild(sql_path, rebuild_stock_from_invoices)
+
+    assert ref_stock
+    assert len(sql_stock) == len(ref_stock)
+    assert [b for a, b in zip(ref_stock, sql_stock) if a != b] == []
+    assert sql_summary == ref_summary
+
+
+def test_sql_rebuild_replaces_existing_stock(engine, db):
+    seed_invoices(engine, 300, 7)
+    db.add(PresentStockDetail(brand_number="STALE", pack_size_case=12, pack_size_quantity_ml=750,
+                              total_cases=9, total_bottles=108, total_amount=900.0))
+    db.commit()
+
+    report = rebuild_stock_from_invoices(db)
+    db.commit()
+
+    assert report["deleted_rows"] == 1
+    assert report["inserted_rows"] == db.query(PresentStockDetail).count()
+    assert db.query(PresentStockDetail).filter(PresentStockDetail.brand_number == "STALE").count() == 0
+    summary = db.query(StockSummary).one()
+    cases, amount = db.execute(text(
+        "SELECT SUM(total_cases), SUM(total_amount) FROM present_stock_details"
+    )).one()
+    assert summary.total_cases_all_items == cases
+    assert summary.total_price_all_items == pytest.approx(amount)
+    assert check_stock_ledger(db) == []
@@ -0,0 +1,169 @@
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import sessionmaker
+
+from database import SessionLocal
+from models import PresentStockDetail, StockSummary
+from services.stock_service import adjust_stock_summary, check_stock_summary, recalc_stock_summary
+
+
+def add_stock(db, brand_number, cases, amount, name=None):
+    row = PresentStockDetail(
+        brand_number=brand_number, pack_size_case=12, pack_size_quantity_ml=750,
+        total_cases=cases, total_bottles=cases * 12, total_amount=amount,
+        last_updated_item_name=name,
+    )
+    db.add(row)
+    return row
+
+
+def summary_totals(db):
+    db.expire_all()
+    summary = db.query(StockSummary).one()
+    return summary.total_cases_all_items, summary.total_price_all_items
+
+
+def recalculated(engine):
+    # recalc_stock_summary is the full-scan oracle; run it on a plain
+    # session so no listener touches the result.
+    db = sessionmaker(bind=engine, autoflush=False)()
+    try:
+        recalc_stock_summary(db)
+        db.flush()
+        return summary_totals(db)
+    finally:
+        db.rollback()
+        db.close()
+
+
+def test_orm_inserts_updates_and_deletes_move_the_summary(engine, db):
+    a = add_stock(db, "1001", 10, 1000.0)
+    b = add_stock(db, "1002", 4, 250.5)
+    add_stock(db, None, 1, None)
+    db.commit()
+    assert summary_totals(db) == (15, pytest.approx(1250.5))
+
+    a.total_cases, a.total_amount = 7, 700.0
+    db.commit()
+    assert summary_totals(db) == (12, pytest.approx(950.5))
+
+    db.delete(b)
+    db.commit()
+    assert summary_totals(db) == (8, pytest.approx(700.0))
+    assert summary_totals(db) == pytest.approx(recalculated(engine))
+    assert not check_stock_summary(db)["drift"]
+
+
+def test_update_of_an_unloaded_value_reads_the_stored_one(db):
+    row = add_stock(db, "1001", 10, 1000.0)
+    db.commit()
+
+    # The commit expired row, so the listener has no old value in hand.
+    row.total_cases, row.total_amount = 3, 300.0
+    db.commit()
+    assert summary_totals(db) == (3, pytest.approx(300.0))
+
+
+def test_rolled_back_changes_leave_the_summary_alone(db):
+    add_stock(db, "1001", 10, 1000.0)
+    db.commit()
+
+    add_stock(db, "1002", 5, 500.0)
+    db.flush()
+    db.rollback()
+    assert summary_totals(db) == (10, pytest.approx(1000.0))
+
+
+def test_adjust_stock_summary_applies_bulk_deltas(db):
+    add_stock(db, "1001", 10, 1000.0, name="FIRST")
+    db.commit()
+    adjust_stock_summary(db, -2, -200.0, item_name="BULK")
+    db.commit()
+
+    summary = db.query(StockSummary).one()
+    assert (summary.total_cases_all_items, summary.total_price_all_items) == (8, pytest.approx(800.0))
+    assert summary.last_updated_item_name == "BULK"
+
+
+def test_check_finds_and_repairs_drift(db):
+    add_stock(db, "1001", 10, 1000.0)
+    add_stock(db, "1002", 2, 20.0)
+    db.commit()
+    db.execute(text("UPDATE present_stock_details SET total_cases = 20, total_amount = 2000.0 WHERE brand_number = '1001'"))
+    db.commit()
+
+    status = check_stock_summary(db)
+    assert status["drift"] and not status["repaired"]
+    assert status["stored"] == {"total_cases": 12, "total_amount": 1020.0}
+    assert status["recomputed"] == {"total_cases": 22, "total_amount": 2020.0}
+    assert summary_totals(db) == (12, pytest.approx(1020.0))
+
+    status = check_stock_summary(db, repair=True)
+    db.commit()
+    assert status["repaired"]
+    assert summary_totals(db) == (22, pytest.approx(2020.0))
+    assert not check_stock_summary(db)["drift"]
+
+
+def test_repair_keeps_a_change_committed_after_the_check(engine, db):
+    add_stock(db, "1001", 10, 1000.0)
+    db.commit()
+    db.execute(text("UPDATE stock_summary SET total_cases_all_items = 0, total_price_all_items = 0"))
+    db.commit()
+
+    committed = []
+
+    def commit_elsewhere(orm_execute_state):
+        # The check's first ORM select runs after it has read the SUM:
+        # another writer changes stock before the repair is written.
+        if committed or not orm_execute_state.is_select:
+            return
+        committed.append(True)
+        other = sessionmaker(bind=engine, autoflush=False)()
+        try:
+            other.execute(text("UPDATE present_stock_details SET total_cases = 11, total_amount = 1100.0"))
+            other.commit()
+        finally:
+            other.close()
+
+    event.listen(db, "do_orm_execute", commit_elsewhere)
+    status = check_stock_summary(db, repair=True)
+    db.commit()
+
+    assert committed
+    assert status["recomputed"]["total_cases"] == 10
+    assert summary_totals(db) == (11, pytest.approx(1100.0))
+
+
+def test_concurrent_writers_both_move_the_summary(engine, db):
+    add_stock(db, "1001", 10, 1000.0)
+    add_stock(db, "1002", 10, 1000.0)
+    db.commit()
+
+    other = SessionLocal(bind=engine)
+    try:
+        # Both sessions hold the summary at 20 cases before either writes.
+        held = [db.query(StockSummary).one(), other.query(StockSummary).one()]
+        assert [s.total_cases_all_items for s in held] == [20, 20]
+        mine = db.query(PresentStockDetail).filter_by(brand_number="1001").one()
+        theirs = other.query(PresentStockDetail).filter_by(brand_number="1002").one()
+        mine.total_cases, mine.total_amount = 15, 1500.0
+        theirs.total_cases, theirs.total_amount = 17, 1700.0
+        db.commit()
+        other.commit()
+    finally:
+        other.close()
+
+    assert summary_totals(db) == (32, pytest.approx(3200.0))
+    assert not check_stock_summary(db)["drift"]
+
+
+def test_deltas_before_one_flush_add_up(db):
+    add_stock(db, "1001", 10, 1000.0)
+    db.commit()
+
+    adjust_stock_summary(db, 1, 100.0)
+    adjust_stock_summary(db, 2, 200.0)
+    add_stock(db, "1002", 4, 400.0)
+    db.commit()
+    assert summary_totals(db) == (17, pytest.approx(1700.0))